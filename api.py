@@ -1,14 +1,16 @@
-import json
+import datetime
+import itertools
 import logging
 import time
 import sys
-import os
 
-from flask import Flask
+from flask import Flask, Response, stream_with_context
 from flask import request as frequest
 from flask_restful import Api, Resource
 
-from config.config import HOST, PORT
+from config.config import HOST, PORT, API_WORKERS, API_THREADS, API_PRELOAD, API_GRACEFUL_TIMEOUT, API_MAX_REQUESTS, \
+    API_DEV_SERVER, API_PAGE_SIZE, API_MAX_PAGE_SIZE, \
+    API_MAX_BULK_SIZE
 from app import db_worker
 
 
@@ -34,6 +36,100 @@ class AccessError(TypeError):
     """
 
 
+########################################################################################################################
+# field -> (min length, max length) | None for the integer ids
+BULK_FIELDS = {
+    'ex_id': None,
+    'word_id': None,
+    'example': (5, 400),
+    'word': (1, 135),
+    'description': (1, 400),
+}
+
+
+def stored_category(word: str) -> str:
+    """
+    The api never waits for the oxford api: the unknown categories are left '-' for the bot category worker
+    :param word: string word
+    :return: string word category from memory | the 'categories' table, '-' if it is not known yet
+    """
+    return db_worker.get_stored_words_categories([word]).get(word.strip().lower()) or '-'
+
+
+def bulk_item_error(item: dict, fields: tuple) -> str | None:
+    """
+    :param item: json object of the bulk request
+    :param fields: tuple of the required BULK_FIELDS names
+    :return: string error of the first wrong field | None if the item is right
+    """
+    for field in fields:
+        value = item.get(field)
+        if BULK_FIELDS[field] is None:
+            if not isinstance(value, int) or isinstance(value, bool):
+                return f'Field "{field}" must be integer'
+            continue
+        if not isinstance(value, str):
+            return f'Field "{field}" must be string'
+        min_len, max_len = BULK_FIELDS[field]
+        if not min_len <= len(value) <= max_len:
+            return f'Not right length for {field}. You have {len(value)}, min {min_len} - max {max_len}'
+    return None
+
+
+def bulk_request(token: str, action: str, get_fields, bulk_func):
+    """
+    Common part of the bulk handlers: one auth lookup, validation of all items in one pass,
+    one db transaction for all the right items
+    :param token: string user token from db table apikeys
+    :param action: string action name for logs
+    :param get_fields: func(item) -> tuple of the required BULK_FIELDS names
+    :param bulk_func: func(user_id, items) -> list of results (db_worker.bulk_...)
+    :return: {'results': [result | {'error'}, ...]} in the order of the request items
+    """
+    try:
+        sql_user = db_worker.get_api_user(token=token)
+    except Exception as e:
+        logger.warning(f'[{token}] Can`t find user id "{e}"')
+        return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
+    else:
+        logger.info(f'[{sql_user.nickname}] {action}')
+
+    try:
+        items = frequest.get_json(force=True, silent=True)
+        if not isinstance(items, list) or not all(isinstance(i, dict) for i in items):
+            raise TypeError('The body is not json list of objects')
+        if len(items) > API_MAX_BULK_SIZE or len(items) < 1:
+            raise LengthError(f"{len(items)}")
+    except LengthError as e:
+        logger.error(f'[{sql_user.nickname}] Can`t write data. Wrong count "{e}"')
+        return {'error': f'Not right count of objects. You have {e}, min 1 - max {API_MAX_BULK_SIZE}'}, 404
+    except Exception as e:
+        logger.error(f'[{sql_user.nickname}] Can`t write data "{e}"')
+        return {'error': 'Failed to process your objects - the body must be json list of objects'}, 404
+
+    results = [None] * len(items)
+    right_items, right_indexes = [], []
+    for index, item in enumerate(items):
+        error = bulk_item_error(item, get_fields(item))
+        if error:
+            results[index] = {'error': error}
+        else:
+            right_items.append(item)
+            right_indexes.append(index)
+    logger.info(f'[{sql_user.nickname}] {len(right_items)} OF {len(items)} OBJECTS ARE READY')
+
+    try:
+        if right_items:
+            for index, result in zip(right_indexes, bulk_func(sql_user.user_id, right_items)):
+                results[index] = result
+    except Exception as e:
+        logger.error(f'[{sql_user.nickname}] Can`t write data to sql "{e}"')
+        return {'error': 'There was a problem on our side, nothing is changed, please try again later'}, 500
+    else:
+        logger.info(f'[{sql_user.nickname}] SUCCESS {action}')
+        return {'results': results}, 200
+
+
 ########################################################################################################################
 class Words(Resource):     # Resource - restfull king
     """
@@ -46,39 +142,150 @@ class Words(Resource):     # Resource - restfull king
         :param token: string user token from db table apikeys
         """
         try:
-            db_worker.pending_rollback(token)
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
         else:
             logger.info(f'[{sql_user.nickname}] GET WORDS')
 
+        # The words of the user are not changed while his data version is the same
         try:
-            data_path = db_worker.create_file_with_user_words(
-                user_tg_id=str(sql_user.tg_id),
-                file_path='temporary',
-                file_type='json',
-                sql_filter_key='default',
-                sql_sort_key='all my words',
-            )
+            data_version = db_worker.get_user_data_version(user_tg_id=sql_user.tg_id)
+        except Exception as e:
+            logger.error(f'[{sql_user.nickname}] Can`t get data version "{e}"')
+            return {'error': 'Failed to collect words from data base for query'}, 500
+        export_params = dict(
+            user_tg_id=str(sql_user.tg_id),
+            file_type='json',
+            sql_filter_key='default',
+            sql_sort_key='all my words',
+        )
+        etag = db_worker.export_etag(data_version=data_version, **export_params)
+        if frequest.if_none_match.contains(etag):
+            logger.info(f'[{sql_user.nickname}] WORDS ARE NOT MODIFIED')
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        try:
+            chunks = db_worker.iter_user_words_export(data_version=data_version, **export_params)
+            first_chunk = next(chunks)    # the db errors are raised here, before the response is started
         except Exception as e:
             logger.error(f'[{sql_user.nickname}] Can`t made data file "{e}"')
             return {'error': 'Failed to collect words from data base for query'}, 500
+
+        logger.info(f'[{sql_user.nickname}] SUCCESS GET WORDS')
+        response = Response(
+            stream_with_context(itertools.chain([first_chunk], chunks)),
+            status=200,
+            mimetype='application/json'
+        )
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def post(self, token):
+        """
+        Posts words in one transaction, the example is given by its id or by its text (it is added if it is new)
+        :param token: string user token from db table apikeys
+        :body json: [{'word': '<word>', 'description': '<description>', 'ex_id': <id> | 'example': '<example>'}, ...]
+        """
+        return bulk_request(
+            token=token,
+            action='POST WORDS',
+            get_fields=lambda i: ('word', 'description', 'ex_id' if 'ex_id' in i else 'example'),
+            bulk_func=db_worker.bulk_add_words
+        )
+
+    def put(self, token):
+        """
+        Puts words in one transaction
+        :param token: string user token from db table apikeys
+        :body json: [{'word_id': <id>, 'word': '<word>', 'description': '<description>'}, ...]
+        """
+        return bulk_request(
+            token=token,
+            action='PUT WORDS',
+            get_fields=lambda i: ('word_id', 'word', 'description'),
+            bulk_func=db_worker.bulk_update_words
+        )
+
+    def delete(self, token):
+        """
+        Deletes words in one transaction (the examples left without words are deleted too)
+        :param token: string user token from db table apikeys
+        :body json: [{'word_id': <id>}, ...]
+        """
+        return bulk_request(
+            token=token,
+            action='DELETE WORDS',
+            get_fields=lambda i: ('word_id',),
+            bulk_func=lambda user_id, items: db_worker.bulk_delete_words(user_id, [i['word_id'] for i in items])
+        )
+
+
+class WordsPage(Resource):
+    """
+    Paginated words query handler class (for the clients that sync the words by parts)
+    """
+
+    def get(self, token):
+        """
+        Outputs one page of the user words ordered by word_id
+        :param token: string user token from db table apikeys
+        :query limit: integer count of words on the page (default API_PAGE_SIZE, max API_MAX_PAGE_SIZE)
+        :query since_word_id: integer next_since_word_id of the previous page (default 0 - the first page)
+        :query updated_since: string time 'YYYY-MM-DD HH:MM:SS.ffffff' - only the words added | changed since it,
+        the first page (since_word_id 0) has the ids of the words deleted since it too
+        (keep the time before the first page as updated_since of the next sync)
+        """
+        try:
+            sql_user = db_worker.get_api_user(token=token)
+        except Exception as e:
+            logger.warning(f'[{token}] Can`t find user id "{e}"')
+            return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
         else:
-            logger.info(f'[{sql_user.nickname}] WORDS DATA IN "{data_path}"')
+            logger.info(f'[{sql_user.nickname}] GET WORDS PAGE')
+
+        try:
+            limit = int(frequest.args.get('limit', API_PAGE_SIZE))
+            since_word_id = int(frequest.args.get('since_word_id', 0))
+            updated_since = frequest.args.get('updated_since')
+            if limit > API_MAX_PAGE_SIZE or limit < 1:
+                raise LengthError(f"{limit}")
+            if updated_since is not None:
+                updated_since = datetime.datetime.fromisoformat(updated_since).isoformat(
+                    sep=' ', timespec='microseconds')
+        except LengthError as e:
+            logger.error(f'[{sql_user.nickname}] Can`t get data. Wrong limit "{e}"')
+            return {'error': f'Not right limit for page. You have {e}, min 1 - max {API_MAX_PAGE_SIZE}'}, 404
+        except Exception as e:
+            logger.error(f'[{sql_user.nickname}] Can`t get data "{e}"')
+            return {'error': 'Failed to process your page query - check the limit, since_word_id and updated_since '
+                             '(YYYY-MM-DD HH:MM:SS.ffffff)'}, 404
 
         try:
-            file = open(data_path, 'r', encoding='utf-8')
-            data = json.load(file)
+            words = db_worker.get_user_words_page(
+                user_id=sql_user.user_id,
+                since_word_id=since_word_id,
+                limit=limit,
+                updated_since=updated_since
+            )
+            deleted_words_ids = db_worker.get_deleted_words_ids(
+                user_id=sql_user.user_id,
+                deleted_since=updated_since
+            ) if updated_since is not None and since_word_id == 0 else []
         except Exception as e:
-            logger.error(f'[{sql_user.nickname}] Can`t load json file "{e}"')
-            return {'error': 'Failed to collect words from temporary file for query'}, 500
+            logger.error(f'[{sql_user.nickname}] Can`t get data from sql "{e}"')
+            return {'error': 'Failed to collect words from data base for query'}, 500
         else:
-            file.close()
-            os.remove(data_path)
-            logger.info(f'[{sql_user.nickname}] SUCCESS GET WORDS')
-            return data, 200
+            logger.info(f'[{sql_user.nickname}] SUCCESS GET WORDS PAGE ({len(words)})')
+            return {
+                'words': words,
+                'deleted_word_ids': deleted_words_ids,
+                'next_since_word_id': words[-1]['word_id'] if len(words) == limit else None
+            }, 200
 
 
 class Lesson(Resource):
@@ -92,8 +299,7 @@ class Lesson(Resource):
         :param token: string user token from db table apikeys
         """
         try:
-            db_worker.pending_rollback(token)
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -114,6 +320,51 @@ class Lesson(Resource):
             return data, 200
 
 
+class Examples(Resource):
+    """
+    Bulk examples query handler class
+    """
+
+    def post(self, token):
+        """
+        Posts examples in one transaction
+        :param token: string user token from db table apikeys
+        :body json: [{'example': '<your_example>'}, ...]
+        """
+        return bulk_request(
+            token=token,
+            action='POST EXAMPLES',
+            get_fields=lambda i: ('example',),
+            bulk_func=lambda user_id, items: db_worker.bulk_add_examples(user_id, [i['example'] for i in items])
+        )
+
+    def put(self, token):
+        """
+        Puts examples in one transaction
+        :param token: string user token from db table apikeys
+        :body json: [{'ex_id': <id>, 'example': '<your_example>'}, ...]
+        """
+        return bulk_request(
+            token=token,
+            action='PUT EXAMPLES',
+            get_fields=lambda i: ('ex_id', 'example'),
+            bulk_func=db_worker.bulk_update_examples
+        )
+
+    def delete(self, token):
+        """
+        Deletes examples with all their words in one transaction
+        :param token: string user token from db table apikeys
+        :body json: [{'ex_id': <id>}, ...]
+        """
+        return bulk_request(
+            token=token,
+            action='DELETE EXAMPLES',
+            get_fields=lambda i: ('ex_id',),
+            bulk_func=lambda user_id, items: db_worker.bulk_delete_examples(user_id, [i['ex_id'] for i in items])
+        )
+
+
 class Example(Resource):
     """
     Example database query handler class
@@ -126,7 +377,7 @@ class Example(Resource):
         :param example_id: integer example id from db examples
         """
         try:
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -166,7 +417,7 @@ class Example(Resource):
         :body form-data: {'example': '<your_example>'}
         """
         try:
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -211,7 +462,7 @@ class Example(Resource):
         :form-data: {'example': '<your_example>'}
         """
         try:
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -267,7 +518,7 @@ class Example(Resource):
         :form-data: {'example': '<your_example>'}
         """
         try:
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -321,7 +572,7 @@ class Word(Resource):
         :param word_id: integer word id from db words
         """
         try:
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -362,7 +613,7 @@ class Word(Resource):
         :param token: string user token from db table apikeys
         """
         try:
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -400,7 +651,7 @@ class Word(Resource):
             sql_word = db_worker.add_word(
                 word=word,
                 description=description,
-                category=db_worker.get_word_category(word),
+                category=stored_category(word),
                 rating=0,
                 example=sql_example
             )
@@ -423,7 +674,7 @@ class Word(Resource):
         :param word_id: integer word id from db words
         """
         try:
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -464,7 +715,8 @@ class Word(Resource):
             db_worker.update_data(
                 data_type='word',
                 data_id=sql_word.word_id,
-                new_data=word
+                new_data=word,
+                category=stored_category(word)
             )
             db_worker.update_data(
                 data_type='description',
@@ -494,7 +746,7 @@ class Word(Resource):
         :param word_id: integer word id from db words
         """
         try:
-            sql_user = db_worker.get_user_by_api_key(token=token)
+            sql_user = db_worker.get_api_user(token=token)
         except Exception as e:
             logger.warning(f'[{token}] Can`t find user id "{e}"')
             return {'error': 'Could not find a user with this key, please check your key and try again'}, 404
@@ -538,9 +790,17 @@ class Word(Resource):
 
 
 ########################################################################################################################
-def main():
+def remove_db_session(exception=None):
     """
-    Assembly and launch of all functions of the part of the flask api
+    Gives the request thread session connection back to the pool when the request is over
+    """
+    db_worker.session.remove()
+
+
+def create_app() -> Flask:
+    """
+    Assembly of all functions of the part of the flask api
+    :return: ready flask wsgi application
     """
     # Create an api object
     app = Flask(__name__)
@@ -548,17 +808,71 @@ def main():
 
     # Add query interface
     api.add_resource(Words, '/api/words/<string:token>')
+    api.add_resource(WordsPage, '/api/words/<string:token>/page')
     api.add_resource(Lesson, '/api/lesson/<string:token>')
+    api.add_resource(Examples, '/api/examples/<string:token>')
     api.add_resource(Example, '/api/example/<string:token>/<int:example_id>')
     api.add_resource(Word, '/api/word/<string:token>/<int:word_id>')
 
-    # Initialize and run
+    # Each request thread works with its own db session
+    app.teardown_appcontext(remove_db_session)
+
+    # Initialize
     api.init_app(app)
-    app.run(
-        debug=True,
-        port=PORT,
-        host=HOST
-    )
+    return app
+
+
+def post_fork(server, worker):
+    """
+    Gunicorn hook: this module (and db_worker, which migrates the db at import) is imported once by the master
+    process before the fork, the worker drops the pool connections inherited from the master and opens its own ones
+    """
+    db_worker.engine.dispose(close=False)
+    logger.info(f'Api worker {worker.pid} is started')
+
+
+def serve():
+    """
+    Runs the api by the gunicorn server: API_WORKERS processes with API_THREADS threads each.
+    kill -HUP <master pid> - graceful reload: new workers are started, the old ones finish their requests
+    (the code is imported by the master, so the changed code is loaded only by restart | kill -USR2 <master pid>)
+    """
+    from gunicorn.app.base import BaseApplication    # unix only, the dev server is used on windows
+
+    class ApiApplication(BaseApplication):
+
+        def load_config(self):
+            for key, value in {
+                'bind': f'{HOST}:{PORT}',
+                'workers': API_WORKERS,
+                'threads': API_THREADS,
+                'worker_class': 'gthread',
+                'preload_app': API_PRELOAD,
+                'graceful_timeout': API_GRACEFUL_TIMEOUT,
+                'max_requests': API_MAX_REQUESTS,
+                'max_requests_jitter': API_MAX_REQUESTS // 10,
+                'post_fork': post_fork,
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return create_app()
+
+    ApiApplication().run()
+
+
+def main():
+    """
+    Launch of the part of the flask api: production server | flask single-process server (API_DEV_SERVER)
+    """
+    if API_DEV_SERVER or sys.platform == 'win32':
+        create_app().run(
+            debug=True,
+            port=PORT,
+            host=HOST
+        )
+    else:
+        serve()
 
 
 ########################################################################################################################
@@ -0,0 +1,128 @@
+import asyncio
+import functools
+import logging
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from config.config import SQL_POOL_SIZE
+
+from . import db_worker
+
+
+########################################################################################################################
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format='[%(asctime)s]:[%(levelname)s]:[%(filename)s]:[%(lineno)d]: %(message)s',
+    )
+
+
+########################################################################################################################
+# basic
+def _init_thread():
+    """
+    Every call in the thread ends its unit of work (_call_in_session), so the objects of the thread session
+    do not have to expire on commit - they are returned to the event loop detached and keep their loaded attributes
+    """
+    db_worker.session().expire_on_commit = False
+
+
+# one thread per pool connection - every thread works with its own db_worker.session (scoped_session)
+executor = ThreadPoolExecutor(max_workers=SQL_POOL_SIZE, thread_name_prefix='db_worker', initializer=_init_thread)
+
+
+def _call_in_session(func, *args, **kwargs):
+    """
+    Runs db_worker func in the current worker thread and finishes its unit of work:
+    commit | rollback - so the thread session never stays broken,
+    close - so the next call starts with an empty identity map and sees fresh data
+    """
+    try:
+        result = func(*args, **kwargs)
+        db_worker.session.commit()
+    except Exception:
+        db_worker.session.rollback()
+        raise
+    finally:
+        db_worker.session.close()
+    return result
+
+
+async def run(func, *args, **kwargs):
+    """
+    Awaits any blocking db_worker func without stopping the event loop
+    :param func: db_worker function
+    :return: func result
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(_call_in_session, func, *args, **kwargs))
+
+
+def to_async(func):
+    """
+    Makes an awaitable twin of the blocking db_worker func
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run(func, *args, **kwargs)
+    return wrapper
+
+
+########################################################################################################################
+# common.py
+is_user = to_async(db_worker.is_user)
+add_user = to_async(db_worker.add_user)
+change_user_last_using = to_async(db_worker.change_user_last_using)
+users_bl_list = to_async(db_worker.users_bl_list)
+change_user_bl_status = to_async(db_worker.change_user_bl_status)
+get_users = to_async(db_worker.get_users)
+add_broadcast = to_async(db_worker.add_broadcast)
+get_running_broadcasts = to_async(db_worker.get_running_broadcasts)
+save_broadcast_progress = to_async(db_worker.save_broadcast_progress)
+stop_broadcasts = to_async(db_worker.stop_broadcasts)
+count_users_after = to_async(db_worker.count_users_after)
+get_users_page = to_async(db_worker.get_users_page)
+
+# adding.py
+add_example = to_async(db_worker.add_example)
+add_word = to_async(db_worker.add_word)
+import_user_words = to_async(db_worker.import_user_words)
+
+# lessons.py
+get_user = to_async(db_worker.get_user)
+get_word = to_async(db_worker.get_word)
+change_rating = to_async(db_worker.change_rating)
+add_or_change_day_stat = to_async(db_worker.add_or_change_day_stat)
+finish_lesson = to_async(db_worker.finish_lesson)
+get_words_data = to_async(db_worker.get_words_data)
+get_lesson_data = to_async(db_worker.get_lesson_data)
+get_words_texts = to_async(db_worker.get_words_texts)
+add_init_words = to_async(db_worker.add_init_words)
+
+# statistic.py
+word_count = to_async(db_worker.word_count)
+get_user_stat = to_async(db_worker.get_user_stat)
+
+# checking.py
+get_user_words_file = to_async(db_worker.get_user_words_file)
+
+# updating.py
+get_user_example = to_async(db_worker.get_user_example)
+get_example = to_async(db_worker.get_example)
+get_user_word = to_async(db_worker.get_user_word)
+update_data = to_async(db_worker.update_data)
+delete_data = to_async(db_worker.delete_data)
+
+# category_worker.py
+get_stored_word_category = to_async(db_worker.get_stored_word_category)
+store_word_category = to_async(db_worker.store_word_category)
+set_word_category = to_async(db_worker.set_word_category)
+get_words_without_category = to_async(db_worker.get_words_without_category)
+get_stored_words_categories = to_async(db_worker.get_stored_words_categories)
+
+# api.py
+generate_api_keys = to_async(db_worker.generate_api_keys)
+is_api_keys = to_async(db_worker.is_api_keys)
+get_user_api_key = to_async(db_worker.get_user_api_key)
+get_user_by_api_key = to_async(db_worker.get_user_by_api_key)
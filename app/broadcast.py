@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import sys
+import time
+
+from aiogram import Bot
+from aiogram.utils.exceptions import RetryAfter, NetworkError, TelegramAPIError
+
+from config.config import BROADCAST_RATE, BROADCAST_BURST, BROADCAST_CONCURRENCY, BROADCAST_PAGE_SIZE, \
+    BROADCAST_RETRIES, BROADCAST_PROGRESS_INTERVAL
+
+from . import async_db_worker
+
+
+########################################################################################################################
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format='[%(asctime)s]:[%(levelname)s]:[%(filename)s]:[%(lineno)d]: %(message)s',
+    )
+
+
+########################################################################################################################
+# basic
+# /admintell only queues the broadcast, the messages are sent here in the background:
+# below the telegram global limit (token bucket), with a few requests in flight (semaphore),
+# page by page of users with the checkpoint in the 'broadcasts' table after every page,
+# so the broadcast interrupted by the bot restart is resumed from the last page
+# (the users of the interrupted page may get the message twice)
+# broadcast_id -> task
+jobs = {}
+
+
+class TokenBucket:
+    """
+    Gives `rate` tokens per second, keeps at most `burst` of them,
+    everybody waits when telegram asks to retry after a while
+    """
+
+    def __init__(self, rate: float = BROADCAST_RATE, burst: int = BROADCAST_BURST):
+        """
+        :param rate: float count of tokens per second
+        :param burst: integer maximum count of the saved tokens
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """
+        Waits for one token
+        """
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """
+        Nobody gets the token for `seconds` (telegram RetryAfter), the saved tokens are lost
+        """
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+
+# one bucket for all broadcasts, the telegram limit is global for the bot
+bucket = TokenBucket()
+
+
+def _mark_retrieved(task: asyncio.Task):
+    """
+    Nobody waits for the broadcast, so its error is logged here
+    """
+    for broadcast_id, job in list(jobs.items()):
+        if job is task:
+            del jobs[broadcast_id]
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f'Broadcast failed {task.exception()!r}')
+
+
+########################################################################################################################
+# work with
+async def send(bot: Bot, tg_id: str, text: str) -> bool:
+    """
+    Sends the message to one user, retries the flood | network errors
+    :return: True if the message is sent, False if the user can not get it (blocked the bot, deleted ...)
+    """
+    for attempt in range(BROADCAST_RETRIES):
+        await bucket.acquire()
+        try:
+            await bot.send_message(chat_id=tg_id, text=text)
+            return True
+        except RetryAfter as e:
+            logger.warning(f'[{tg_id}]: Flood control, retry after {e.timeout} seconds, attempt {attempt + 1}')
+            bucket.pause(e.timeout)
+        except NetworkError as e:
+            logger.warning(f'[{tg_id}]: Network error {e!r}, attempt {attempt + 1}')
+            await asyncio.sleep(attempt + 1)
+        except TelegramAPIError as e:
+            logger.info(f'[{tg_id}]: Message is not delivered {e!r}')
+            return False
+    logger.error(f'[{tg_id}]: Message is not delivered after {BROADCAST_RETRIES} attempts')
+    return False
+
+
+async def report(bot: Bot, admin_tg_id: str, message_id: int | None, txt: str) -> int | None:
+    """
+    Edits the progress message of the admin (sends a new one if there is no message yet)
+    :return: integer id of the progress message | None
+    """
+    try:
+        if message_id is None:
+            return (await bot.send_message(chat_id=admin_tg_id, text=txt)).message_id
+        await bot.edit_message_text(text=txt, chat_id=admin_tg_id, message_id=message_id)
+    except TelegramAPIError as e:
+        logger.warning(f'[{admin_tg_id}]: Failed to report the broadcast progress {e!r}')
+    return message_id
+
+
+async def run(bot: Bot, broadcast):
+    """
+    Sends the broadcast text to all users after the last checkpoint
+    :param broadcast: db_worker.Broadcasts object
+    """
+    broadcast_id, admin_tg_id = broadcast.broadcast_id, broadcast.admin_tg_id
+    last_user_id, sent, failed = broadcast.last_user_id, broadcast.sent, broadcast.failed
+    total = sent + failed + await async_db_worker.count_users_after(last_user_id)
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    logger.info(f'[{broadcast_id}]: Broadcast to {total} users from user {last_user_id}')
+
+    async def send_limited(tg_id: str) -> bool:
+        async with semaphore:
+            try:
+                return await send(bot, tg_id, broadcast.text)
+            except Exception as e:    # one user must not stop the whole broadcast
+                logger.error(f'[{tg_id}]: Message is not delivered \n\n{e!r}\n\n')
+                return False
+
+    message_id = await report(bot, admin_tg_id, None, f'Broadcast {broadcast_id}: {sent + failed}/{total}')
+    reported = time.monotonic()
+    while True:
+        users = await async_db_worker.get_users_page(last_user_id, BROADCAST_PAGE_SIZE)
+        if not users:
+            break
+        results = await asyncio.gather(*(send_limited(tg_id) for _, tg_id in users))
+        sent += sum(results)
+        failed += len(results) - sum(results)
+        last_user_id = users[-1][0]
+        await async_db_worker.save_broadcast_progress(broadcast_id, last_user_id, sent, failed)
+        if time.monotonic() - reported >= BROADCAST_PROGRESS_INTERVAL:
+            await report(bot, admin_tg_id, message_id, f'Broadcast {broadcast_id}: {sent + failed}/{total}')
+            reported = time.monotonic()
+
+    await async_db_worker.save_broadcast_progress(broadcast_id, last_user_id, sent, failed, status='done')
+    await report(bot, admin_tg_id, message_id, f'Broadcast {broadcast_id} is done: sent {sent}, failed {failed}')
+    logger.info(f'[{broadcast_id}]: Broadcast is done, sent {sent}, failed {failed}')
+
+
+def run_in_background(bot: Bot, broadcast):
+    task = asyncio.create_task(run(bot, broadcast))
+    jobs[broadcast.broadcast_id] = task
+    task.add_done_callback(_mark_retrieved)
+
+
+async def start(bot: Bot, admin_tg_id: str, text: str) -> int:
+    """
+    Saves the broadcast and starts sending it in the background (call it inside the running event loop)
+    :param admin_tg_id: string telegram id of the admin who gets the progress
+    :param text: string message to all users
+    :return: integer broadcast id
+    """
+    broadcast = await async_db_worker.add_broadcast(text=text, admin_tg_id=admin_tg_id)
+    run_in_background(bot, broadcast)
+    return broadcast.broadcast_id
+
+
+async def resume(bot: Bot):
+    """
+    Starts the broadcasts interrupted by the previous run from their last checkpoint
+    """
+    for broadcast in await async_db_worker.get_running_broadcasts():
+        if broadcast.broadcast_id not in jobs:
+            logger.info(f'[{broadcast.broadcast_id}]: Resume broadcast')
+            run_in_background(bot, broadcast)
+
+
+async def cancel_jobs():
+    tasks = list(jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    jobs.clear()
+
+
+async def stop_broadcasts() -> int:
+    """
+    Stops all broadcasts for good (they are not resumed by the next start)
+    :return: integer count of stopped broadcasts
+    """
+    count = await async_db_worker.stop_broadcasts()
+    await cancel_jobs()
+    return count
+
+
+async def stop():
+    """
+    Cancels the running broadcasts on the bot shutdown (they are resumed by the next start)
+    """
+    await cancel_jobs()
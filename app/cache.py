@@ -0,0 +1,53 @@
+import collections
+import threading
+
+
+########################################################################################################################
+class LruCache:
+    """
+    Thread-safe in-process cache that forgets the least recently used keys when it is full
+    (shared by the bot worker threads and the flask request threads)
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        :param maxsize: integer maximum count of keys
+        """
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        :return: value by key (and mark it as recently used) | default
+        """
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        """
+        Saves value by key, forgets the least recently used key if the cache is full
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """
+        Forgets the key
+        :return: forgotten value | default
+        """
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
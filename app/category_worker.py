@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import sys
+
+import aiohttp
+
+from config.config import APP_ID_OXF, APP_KEY_OXF, URL_OXF, OXF_TIMEOUT, OXF_POOL_SIZE, OXF_WORKERS, OXF_RETRIES, \
+    OXF_BACKOFF, OXF_RESCAN_INTERVAL
+
+from . import db_worker, async_db_worker
+from .db_worker import NOT_CACHED, categories_cache
+
+
+########################################################################################################################
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format='[%(asctime)s]:[%(levelname)s]:[%(filename)s]:[%(lineno)d]: %(message)s',
+    )
+
+
+########################################################################################################################
+# basic
+# words are added with the '-' category at once, the categories are resolved here and back-filled later,
+# so adding a word never waits for the oxford api
+# (the words added through the api process are found by the periodic rescan of the words table)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+queue: asyncio.Queue | None = None
+queued_ids = set()
+http_session: aiohttp.ClientSession | None = None
+workers = []
+
+
+def cached_category(word: str, default: str = '-') -> str:
+    """
+    :param word: string word
+    :param default: return it if the category is not known yet (or the word has no entry)
+    :return: string word category from memory, without waiting for the db or api
+    """
+    return categories_cache.get(word.strip().lower(), default)
+
+
+def resolve(word_id: int, word: str):
+    """
+    Queues the word for the background category lookup
+    :param word_id: integer id of word added with the '-' category
+    :param word: string word
+    """
+    if queue is None:
+        logger.warning(f'[{word_id}]: Category worker is not started, "{word}" stays without category')
+        return
+    if word_id in queued_ids:
+        return
+    queued_ids.add(word_id)
+    queue.put_nowait((word_id, word))
+
+
+########################################################################################################################
+# work with
+async def request_word_category(word: str, url: str = URL_OXF):
+    """
+    Asks the oxford api, retries the request errors with exponential backoff
+    :param word: string lower word
+    :param url: api oxford url
+    :return: string category | None (no entry) | NOT_CACHED (all attempts failed)
+    """
+    for attempt in range(OXF_RETRIES):
+        if attempt:
+            await asyncio.sleep(OXF_BACKOFF * 2 ** (attempt - 1))
+        try:
+            async with http_session.get(url + word) as r:
+                if r.status in RETRY_STATUSES:
+                    logger.warning(f'[{word}]: Requests error {r.status}, attempt {attempt + 1}')
+                    continue
+                word_data = await r.json(content_type=None) if r.status == 200 else None
+                return db_worker.word_category_from_answer(word, r.status, word_data, url=url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f'[{word}]: Requests error {e!r}, attempt {attempt + 1}')
+    return NOT_CACHED
+
+
+async def fill_category(word_id: int, word: str):
+    """
+    Resolves the word category (memory -> 'categories' table -> oxford api) and back-fills it to the word
+    """
+    key = word.strip().lower()
+    category = categories_cache.get(key, NOT_CACHED)
+    if category is NOT_CACHED:
+        category = await async_db_worker.get_stored_word_category(key)
+        if category is NOT_CACHED:
+            category = await request_word_category(key)
+            if category is NOT_CACHED:
+                logger.error(f'[{word_id}]: Failed to resolve category of "{word}"')
+                return
+            await async_db_worker.store_word_category(key, category)
+        if category is not None:
+            categories_cache.put(key, category)
+
+    if category is not None:
+        await async_db_worker.set_word_category(word_id=word_id, word=word, category=category)
+        logger.info(f'[{word_id}]: Category of "{word}" is {category}')
+
+
+async def worker(name: str):
+    while True:
+        word_id, word = await queue.get()
+        try:
+            await fill_category(word_id, word)
+        except Exception as e:
+            logger.error(f'[{name}]: Failed to fill category of {word_id} \n\n{e}\n\n')
+        finally:
+            queued_ids.discard(word_id)
+            queue.task_done()
+
+
+async def queue_words_without_category():
+    """
+    Queues the words left with the '-' category (by the previous run | the api process | the import),
+    except the words with the fresh no entry answer
+    """
+    after_word_id = 0
+    while words := await async_db_worker.get_words_without_category(after_word_id=after_word_id):
+        categories = await async_db_worker.get_stored_words_categories([word for _, word in words])
+        for word_id, word in words:
+            key = word.strip().lower()
+            if key not in categories or categories[key] is not None:
+                resolve(word_id, word)
+        after_word_id = words[-1][0]
+
+
+async def rescan():
+    """
+    Queues the words left without category every OXF_RESCAN_INTERVAL
+    """
+    while True:
+        try:
+            await queue_words_without_category()
+        except Exception as e:
+            logger.error(f'Failed to find words without category \n\n{e}\n\n')
+        await asyncio.sleep(OXF_RESCAN_INTERVAL)
+
+
+async def start(workers_count: int = OXF_WORKERS):
+    """
+    Starts the background workers (call it inside the running event loop)
+    and queues the words left without category by the previous run
+    :param workers_count: integer maximum count of the simultaneous api requests
+    """
+    global queue, http_session
+    queue = asyncio.Queue()
+    http_session = aiohttp.ClientSession(
+        headers={
+            'app_id': APP_ID_OXF,
+            'app_key': APP_KEY_OXF
+        },
+        timeout=aiohttp.ClientTimeout(sock_connect=OXF_TIMEOUT[0], sock_read=OXF_TIMEOUT[1]),
+        connector=aiohttp.TCPConnector(limit=OXF_POOL_SIZE),
+    )
+    workers.extend(asyncio.create_task(worker(f'category_worker_{i}')) for i in range(workers_count))
+    workers.append(asyncio.create_task(rescan()))
+    logger.info('Category worker started')
+
+
+async def stop():
+    """
+    Cancels the background workers and closes the api connections
+    (the words still in queue are queued again by the next start)
+    """
+    global queue, http_session
+    for task in workers:
+        task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    workers.clear()
+    queued_ids.clear()
+    if http_session is not None:
+        await http_session.close()
+    queue, http_session = None, None
@@ -1,5 +1,10 @@
 import collections
+import contextlib
 import datetime
+import functools
+import hashlib
+import io
+import itertools
 import logging
 import random
 import sys
@@ -11,19 +16,24 @@ import openpyxl
 import sqlalchemy
 import secrets
 import requests
-import copy
-import os
 
 import mysql.connector
 from xml.etree import ElementTree
-from openpyxl.styles import PatternFill, Border, Side, Alignment, Font
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import PatternFill, Border, Side, Alignment, Font, NamedStyle
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session, selectinload
+from sqlalchemy.pool import QueuePool
 import sqlalchemy.exc
 from sqlalchemy.exc import PendingRollbackError
 
-from config.config import MY_SQL, APP_KEY_OXF, APP_ID_OXF, URL_OXF, ADMIN_ID_TG
+from config.config import MY_SQL, APP_KEY_OXF, APP_ID_OXF, URL_OXF, ADMIN_ID_TG, SQL_POOL_SIZE, SQL_MAX_OVERFLOW, \
+    SQL_POOL_TIMEOUT, SQL_POOL_RECYCLE, SQL_POOL_PRE_PING, SQL_QUERY_CACHE_SIZE, OXF_TIMEOUT, OXF_POOL_SIZE, \
+    OXF_CACHE_SIZE, OXF_MISS_TTL_DAYS, EXPORT_CHUNK_SIZE, EXPORT_CHUNK_BYTES, EXPORT_CACHE_SIZE, \
+    EXPORT_CACHE_MAX_BYTES, API_KEYS_CACHE_SIZE, API_KEYS_CACHE_TTL, IMPORT_BATCH_SIZE, BROADCAST_FETCH_SIZE
+
+from .cache import LruCache
 
 
 ########################################################################################################################
@@ -38,18 +48,38 @@ logging.basicConfig(
 ########################################################################################################################
 ########################################################################################################################
 # basic
-engine = sqlalchemy.create_engine(MY_SQL, pool_recycle=3600, echo=True)
+engine = sqlalchemy.create_engine(
+    MY_SQL,
+    poolclass=QueuePool,
+    pool_size=SQL_POOL_SIZE,
+    max_overflow=SQL_MAX_OVERFLOW,
+    pool_timeout=SQL_POOL_TIMEOUT,
+    pool_recycle=SQL_POOL_RECYCLE,
+    pool_pre_ping=SQL_POOL_PRE_PING,
+    query_cache_size=SQL_QUERY_CACHE_SIZE,    # compiled statements cache
+    echo=True
+)
 Base = declarative_base()    # this guy will set the trend :)
 # SET @@GLOBAL.wait_timeout=31536000
 
 
 ########################################################################################################################
 # python classes
+def now_time() -> str:
+    """
+    :return: string current time with microseconds - it has always the same length, so it can be compared as string
+    """
+    return datetime.datetime.now().isoformat(sep=' ', timespec='microseconds')
+
+
 class Users(Base):
     """
     Table for storing data of teleword users
     """
     __tablename__ = 'users'
+    __table_args__ = (
+        sqlalchemy.Index('ux_users_tg_id', 'tg_id', unique=True),
+    )
 
     user_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True, nullable=False)
     tg_id = sqlalchemy.Column(sqlalchemy.String(20))
@@ -62,6 +92,8 @@ class Users(Base):
     creation_time = sqlalchemy.Column(sqlalchemy.String(20), nullable=False)
     last_use_time = sqlalchemy.Column(sqlalchemy.String(20), nullable=False)
     current_use_time = sqlalchemy.Column(sqlalchemy.String(20), nullable=False)
+    # bumped on every change of the user words (the cached exports of the old version are not used)
+    data_version = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0, server_default='0')
 
     exxs = relationship('UsersExamples', backref='user_examples')    # class not table name
     stats = relationship('UsersStatistics', backref='user_statistics')
@@ -73,6 +105,9 @@ class UsersExamples(Base):
     Table for storing data of user examples
     """
     __tablename__ = 'examples'
+    __table_args__ = (
+        sqlalchemy.Index('ix_examples_user_id', 'user_id'),
+    )
 
     ex_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True, nullable=False)
     example = sqlalchemy.Column(sqlalchemy.String(400), nullable=False)
@@ -86,6 +121,12 @@ class UsersExamplesWords(Base):
     Table for storing data of example words
     """
     __tablename__ = 'words'
+    __table_args__ = (
+        # lesson candidates: the user word ids by rating | category from the index only (get_lesson_words_data)
+        sqlalchemy.Index('ix_words_example_id_category_rating', 'example_id', 'category', 'rating'),
+        # the words waiting for the background category lookup (get_words_without_category)
+        sqlalchemy.Index('ix_words_category', 'category'),
+    )
     # word_id - sqlalchemy.Integer -> max 350000 users with 6000 words
     word_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True, nullable=False)
     word = sqlalchemy.Column(sqlalchemy.String(135), nullable=False)
@@ -93,6 +134,8 @@ class UsersExamplesWords(Base):
     category = sqlalchemy.Column(sqlalchemy.String(20))
     rating = sqlalchemy.Column(sqlalchemy.Integer, default=0)
     example_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('examples.ex_id'))
+    # set by every orm | core insert and update (not by the raw sql) - for the api clients delta sync
+    update_time = sqlalchemy.Column(sqlalchemy.String(30), default=now_time, onupdate=now_time)
 
 
 class UsersStatistics(Base):
@@ -100,6 +143,9 @@ class UsersStatistics(Base):
     Table for storing data of user statistic
     """
     __tablename__ = 'statistics'
+    __table_args__ = (
+        sqlalchemy.Index('ux_statistics_user_id_day', 'user_id', 'day', unique=True),
+    )
 
     day_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True)
     day = sqlalchemy.Column(sqlalchemy.String(10), nullable=False)
@@ -114,21 +160,305 @@ class UsersApiKeys(Base):
     Table for storing data of user api-keys
     """
     __tablename__ = 'apikeys'
+    __table_args__ = (
+        sqlalchemy.Index('ux_apikeys_key', 'key', unique=True),
+        sqlalchemy.Index('ix_apikeys_user_id', 'user_id'),
+    )
 
     key_id = sqlalchemy.Column(sqlalchemy.Integer, autoincrement=True, primary_key=True)
     key = sqlalchemy.Column(sqlalchemy.String(130), nullable=False)
     user_id = sqlalchemy.Column(sqlalchemy.Integer, sqlalchemy.ForeignKey('users.user_id'))
 
 
+class DeletedWords(Base):
+    """
+    Table for storing the ids of the deleted words (for the api clients delta sync)
+    """
+    __tablename__ = 'deleted_words'
+    __table_args__ = (
+        sqlalchemy.Index('ix_deleted_words_user_id_delete_time', 'user_id', 'delete_time'),
+    )
+
+    word_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=False)
+    user_id = sqlalchemy.Column(sqlalchemy.Integer, nullable=False)
+    delete_time = sqlalchemy.Column(sqlalchemy.String(30), nullable=False)
+
+
+class WordsCategories(Base):
+    """
+    Table for storing the oxford dictionary answers shared by all users
+    (category NULL - the dictionary has no entry for the word)
+    """
+    __tablename__ = 'categories'
+
+    word = sqlalchemy.Column(sqlalchemy.String(135), primary_key=True)
+    category = sqlalchemy.Column(sqlalchemy.String(20))
+    update_time = sqlalchemy.Column(sqlalchemy.String(30), nullable=False)
+
+
+class Broadcasts(Base):
+    """
+    Table for storing the /admintell broadcasts and their progress (to resume them after the bot restart)
+    """
+    __tablename__ = 'broadcasts'
+
+    broadcast_id = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=True, nullable=False)
+    text = sqlalchemy.Column(sqlalchemy.String(4096), nullable=False)
+    admin_tg_id = sqlalchemy.Column(sqlalchemy.String(20), nullable=False)
+    # all users with user_id <= last_user_id are already processed
+    last_user_id = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    sent = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    failed = sqlalchemy.Column(sqlalchemy.Integer, nullable=False, default=0)
+    status = sqlalchemy.Column(sqlalchemy.String(10), nullable=False, default='running')    # running | done | stopped
+    creation_time = sqlalchemy.Column(sqlalchemy.String(30), nullable=False)
+
+
+class SchemaMigrations(Base):
+    """
+    Table for storing versions of the applied database migrations
+    """
+    __tablename__ = 'schema_migrations'
+
+    version = sqlalchemy.Column(sqlalchemy.Integer, primary_key=True, autoincrement=False)
+    description = sqlalchemy.Column(sqlalchemy.String(250), nullable=False)
+    applied_time = sqlalchemy.Column(sqlalchemy.String(30), nullable=False)
+
+
+########################################################################################################################
+# migrations
+def create_missing_indexes(connection: sqlalchemy.engine.Connection):
+    """
+    Creates the indexes declared in the python classes that the existing tables do not have yet
+    (an index is also considered existing if the table already has one on the same leading columns,
+    for example the mysql index of a foreign key)
+    :param connection: sqlalchemy connection
+    """
+    inspector = sqlalchemy.inspect(connection)
+    for table in Base.metadata.sorted_tables:
+        existing_indexes = inspector.get_indexes(table.name)
+        for index in table.indexes:
+            columns = [column.name for column in index.columns]
+            is_existing = any(
+                existing['name'] == index.name
+                or (
+                    existing['column_names'][:len(columns)] == columns
+                    and (not index.unique or (existing['unique'] and existing['column_names'] == columns))
+                )
+                for existing in existing_indexes
+            )
+            if is_existing:
+                continue
+            logger.info(f'[{table.name}]: Create index {index.name} {columns}')
+            index.create(connection)
+
+
+def add_missing_columns(connection: sqlalchemy.engine.Connection):
+    """
+    Adds the columns declared in the python classes that the existing tables do not have yet
+    (a new not nullable column must have a server_default)
+    :param connection: sqlalchemy connection
+    """
+    inspector = sqlalchemy.inspect(connection)
+    preparer = connection.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            ddl = f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} ' \
+                  f'{column.type.compile(dialect=connection.dialect)}'
+            if column.server_default is not None:
+                ddl += f' DEFAULT {column.server_default.arg}'
+            if not column.nullable:
+                ddl += ' NOT NULL'
+            logger.info(f'[{table.name}]: Add column {column.name}')
+            connection.execute(sqlalchemy.text(ddl))
+
+
+def merge_duplicate_day_stats(connection: sqlalchemy.engine.Connection):
+    """
+    Merges the duplicated daily logs of one user into the first one, so (user_id, day) can be unique
+    :param connection: sqlalchemy connection
+    """
+    duplicates = connection.execute(
+        sqlalchemy.select(
+            UsersStatistics.user_id,
+            UsersStatistics.day,
+            sqlalchemy.func.min(UsersStatistics.day_id).label('day_id'),
+            sqlalchemy.func.sum(UsersStatistics.firs_try_success).label('firs_try_success'),
+            sqlalchemy.func.sum(UsersStatistics.mistake).label('mistake'),
+            sqlalchemy.func.sum(UsersStatistics.total).label('total'),
+        ).group_by(UsersStatistics.user_id, UsersStatistics.day).having(sqlalchemy.func.count() > 1)
+    ).all()
+    for i in duplicates:
+        logger.warning(f'[{i.user_id}]: Merge duplicated daily logs {i.day}')
+        connection.execute(
+            sqlalchemy.update(UsersStatistics).where(UsersStatistics.day_id == i.day_id).values(
+                firs_try_success=i.firs_try_success, mistake=i.mistake, total=i.total)
+        )
+        connection.execute(
+            sqlalchemy.delete(UsersStatistics).where(sqlalchemy.and_(
+                UsersStatistics.user_id == i.user_id,
+                UsersStatistics.day == i.day,
+                UsersStatistics.day_id != i.day_id
+            ))
+        )
+
+
+def merge_duplicate_users(connection: sqlalchemy.engine.Connection):
+    """
+    Merges the users with the same telegram id into the first one (examples, statistics, api keys and points),
+    so tg_id can be unique
+    :param connection: sqlalchemy connection
+    """
+    duplicates = connection.execute(
+        sqlalchemy.select(
+            Users.tg_id,
+            sqlalchemy.func.min(Users.user_id).label('user_id'),
+        ).where(Users.tg_id.is_not(None)).group_by(Users.tg_id).having(sqlalchemy.func.count() > 1)
+    ).all()
+    for i in duplicates:
+        users = connection.execute(
+            sqlalchemy.select(Users.user_id, Users.points).where(sqlalchemy.and_(
+                Users.tg_id == i.tg_id,
+                Users.user_id != i.user_id
+            ))
+        ).all()
+        users_ids = [user.user_id for user in users]
+        logger.warning(f'[{i.tg_id}]: Merge duplicated users {users_ids} into {i.user_id}')
+        for model in (UsersExamples, UsersStatistics, UsersApiKeys):
+            connection.execute(
+                sqlalchemy.update(model).where(model.user_id.in_(users_ids)).values(user_id=i.user_id)
+            )
+        connection.execute(
+            sqlalchemy.update(Users).where(Users.user_id == i.user_id).values(
+                points=sqlalchemy.func.coalesce(Users.points, 0) + sum(user.points or 0 for user in users))
+        )
+        connection.execute(sqlalchemy.delete(Users).where(Users.user_id.in_(users_ids)))
+
+
+def delete_duplicate_api_keys(connection: sqlalchemy.engine.Connection):
+    """
+    Keeps only the first of the same api keys, so the key can be unique
+    :param connection: sqlalchemy connection
+    """
+    duplicates = connection.execute(
+        sqlalchemy.select(
+            UsersApiKeys.key,
+            sqlalchemy.func.min(UsersApiKeys.key_id).label('key_id'),
+        ).group_by(UsersApiKeys.key).having(sqlalchemy.func.count() > 1)
+    ).all()
+    for i in duplicates:
+        logger.warning(f'[{i.key_id}]: Delete duplicated api keys')
+        connection.execute(
+            sqlalchemy.delete(UsersApiKeys).where(sqlalchemy.and_(
+                UsersApiKeys.key == i.key,
+                UsersApiKeys.key_id != i.key_id
+            ))
+        )
+
+
+def migration_1(connection: sqlalchemy.engine.Connection):
+    # the duplicates are merged first, otherwise the unique indexes can not be created
+    # (the merged users may get duplicated daily logs, so they go before the daily logs)
+    merge_duplicate_users(connection)
+    delete_duplicate_api_keys(connection)
+    merge_duplicate_day_stats(connection)
+    create_missing_indexes(connection)
+
+
+def migration_2(connection: sqlalchemy.engine.Connection):
+    add_missing_columns(connection)
+
+
+def migration_3(connection: sqlalchemy.engine.Connection):
+    add_missing_columns(connection)
+    connection.execute(
+        sqlalchemy.update(UsersExamplesWords).where(UsersExamplesWords.update_time.is_(None)).values(
+            update_time=now_time())
+    )
+
+
+def migration_4(connection: sqlalchemy.engine.Connection):
+    create_missing_indexes(connection)
+    # the new index leads with example_id too, so mysql keeps the words.example_id foreign key
+    words = sqlalchemy.Table(UsersExamplesWords.__tablename__, sqlalchemy.MetaData(), autoload_with=connection)
+    for index in words.indexes:
+        if index.name in ('ix_words_example_id_rating', 'ix_words_example_id_category'):
+            logger.info(f'[{words.name}]: Drop index {index.name}')
+            index.drop(connection)
+
+
+def migration_5(connection: sqlalchemy.engine.Connection):
+    create_missing_indexes(connection)
+
+
+# (version, description, func(connection)) - only append new migrations to the end
+MIGRATIONS = [
+    (1, 'indexes and unique constraints for the hot lookup columns', migration_1),
+    (2, 'users.data_version for the export cache', migration_2),
+    (3, 'words.update_time for the api delta sync', migration_3),
+    (4, 'covering index of the lesson candidates', migration_4),
+    (5, 'index of the words waiting for the category', migration_5),
+]
+
+
+def migrate():
+    """
+    Creates the missing tables and upgrades the existing database in place
+    by applying the migrations that are not yet in the 'schema_migrations' table
+    """
+    Base.metadata.create_all(engine)
+    with engine.connect() as connection:
+        applied_versions = set(connection.execute(sqlalchemy.select(SchemaMigrations.version)).scalars())
+
+    for version, description, upgrade in MIGRATIONS:
+        if version in applied_versions:
+            continue
+        logger.info(f'[{version}]: Apply migration "{description}"')
+        with engine.begin() as connection:    # mysql commits ddl at once, so every migration has to be idempotent
+            upgrade(connection)
+            connection.execute(sqlalchemy.insert(SchemaMigrations).values(
+                version=version,
+                description=description,
+                applied_time=str(datetime.datetime.now())
+            ))
+        logger.info(f'[{version}]: Migration applied')
+
+
 ########################################################################################################################
 # create
-Base.metadata.create_all(engine)
+migrate()
 
 
 ########################################################################################################################
 # work with
 DbSession = sessionmaker(bind=engine)
-session = DbSession()
+# thread-local registry: every bot worker thread and every flask request thread gets its own session
+# (call session.remove() when the thread finishes its work to give the connection back to the pool),
+# its objects expire on every commit, so they never keep the data of the previous unit of work
+session = scoped_session(DbSession)
+
+
+@contextlib.contextmanager
+def session_scope():
+    """
+    Unit of work with its own session and connection from the pool.
+    Commits on success, rolls back on any error and always closes the session
+    (expire_on_commit=False - returned objects stay readable after the unit of work is over)
+
+        with session_scope() as s:
+            s.add(...)
+    """
+    work_session = DbSession(expire_on_commit=False)
+    try:
+        yield work_session
+        work_session.commit()
+    except Exception:
+        work_session.rollback()
+        raise
+    finally:
+        work_session.close()
 
 
 ########################################################################################################################
@@ -179,10 +509,6 @@ def change_user_last_using(user_tg_id: str, flag: str = 'change'):
     """
 
     user = get_user(tg_id=user_tg_id)
-    user.current_use_time = str(datetime.date.today())
-
-    difference = datetime.date.fromisoformat(user.current_use_time) - datetime.date.fromisoformat(user.last_use_time)
-    difference = int(difference.days)
 
     add_or_change_day_stat(
         tg_id=str(user_tg_id),
@@ -192,32 +518,47 @@ def change_user_last_using(user_tg_id: str, flag: str = 'change'):
     )
 
     today_user_stat: UsersStatistics = user.stats[-1]
+    update_shock_mode(user=user, today_total=today_user_stat.total, flag=flag)
+
+    session.add(user)
+    session.commit()
+
+
+def update_shock_mode(user: Users, today_total: int, flag: str = 'change'):
+    """
+    Increments / Resets the user shock mode depending on the last time the user used the application
+    (changes only the python object, the caller commits it)
+    :param user: user Users object
+    :param today_total: integer today total points of the user
+    :param flag: string 'change' / 'check'
+    """
+    user.current_use_time = str(datetime.date.today())
+
+    difference = datetime.date.fromisoformat(user.current_use_time) - datetime.date.fromisoformat(user.last_use_time)
+    difference = int(difference.days)
 
     if difference:
-        if difference == 1 and today_user_stat.total:
-            logger.info(f'[{user_tg_id}]: Shock_mode +1 day')
+        if difference == 1 and today_total:
+            logger.info(f'[{user.tg_id}]: Shock_mode +1 day')
             user.shock_mode += 1
             user.last_use_time = user.current_use_time
-        elif difference == 1 and not today_user_stat.total:
+        elif difference == 1 and not today_total:
             pass
         else:
             if flag == 'change':
-                logger.info(f'[{user_tg_id}]: Shock_mode first day')
+                logger.info(f'[{user.tg_id}]: Shock_mode first day')
                 user.shock_mode = 1
                 user.last_use_time = user.current_use_time
             else:
-                logger.info(f'[{user_tg_id}]: Shock_mode finish')
+                logger.info(f'[{user.tg_id}]: Shock_mode finish')
                 user.shock_mode = 0
                 user.last_use_time = user.current_use_time
     else:
-        if today_user_stat.total and not user.shock_mode:
-            logger.info(f'[{user_tg_id}]: Shock_mode first day')
+        if today_total and not user.shock_mode:
+            logger.info(f'[{user.tg_id}]: Shock_mode first day')
             user.shock_mode = 1
             user.last_use_time = user.current_use_time
 
-    session.add(user)
-    session.commit()
-
 
 def users_bl_list() -> list:
     """
@@ -249,8 +590,96 @@ def get_users() -> list:
     return list(session.query(Users).all())
 
 
+def add_broadcast(text: str, admin_tg_id: str) -> Broadcasts:
+    """
+    :param text: string message to all users
+    :param admin_tg_id: string telegram id of the admin who gets the progress
+    :return: new running Broadcasts object
+    """
+    with session_scope() as s:
+        broadcast = Broadcasts(
+            text=text,
+            admin_tg_id=str(admin_tg_id),
+            last_user_id=0,
+            sent=0,
+            failed=0,
+            status='running',
+            creation_time=str(datetime.datetime.now())
+        )
+        s.add(broadcast)
+    return broadcast
+
+
+def get_running_broadcasts() -> list:
+    """
+    :return: list of Broadcasts objects that are not finished (to resume them)
+    """
+    with session_scope() as s:
+        return s.query(Broadcasts).filter_by(status='running').order_by(Broadcasts.broadcast_id).all()
+
+
+def save_broadcast_progress(broadcast_id: int, last_user_id: int, sent: int, failed: int, status: str = 'running'):
+    """
+    Saves the checkpoint of the broadcast (a stopped broadcast stays stopped)
+    """
+    with session_scope() as s:
+        s.execute(
+            sqlalchemy.update(Broadcasts).where(sqlalchemy.and_(
+                Broadcasts.broadcast_id == broadcast_id,
+                Broadcasts.status == 'running'
+            )).values(last_user_id=last_user_id, sent=sent, failed=failed, status=status)
+        )
+
+
+def stop_broadcasts() -> int:
+    """
+    Marks all running broadcasts as stopped
+    :return: integer count of stopped broadcasts
+    """
+    with session_scope() as s:
+        return s.execute(
+            sqlalchemy.update(Broadcasts).where(Broadcasts.status == 'running').values(status='stopped')
+        ).rowcount
+
+
+def count_users_after(user_id: int) -> int:
+    """
+    :param user_id: integer user id
+    :return: integer count of users with bigger user id
+    """
+    with session_scope() as s:
+        return s.query(sqlalchemy.func.count(Users.user_id)).filter(Users.user_id > user_id).scalar()
+
+
+def get_users_page(after_user_id: int, limit: int) -> list:
+    """
+    Keyset page of users for the broadcast: the query is streamed by yield_per,
+    and the next page starts after the last user id of the previous one, so the connection is not held between pages
+    :param after_user_id: integer user id of the previous page end
+    :param limit: integer maximum count of users
+    :return: list of (user_id, tg_id) ordered by user_id
+    """
+    with session_scope() as s:
+        return [
+            (i.user_id, i.tg_id)
+            for i in s.query(Users.user_id, Users.tg_id).filter(Users.user_id > after_user_id).order_by(
+                Users.user_id).limit(limit).yield_per(BROADCAST_FETCH_SIZE)
+        ]
+
+
 ########################################################################################################################
 # adding.py
+def bump_data_version(user_id: int, work_session=None):
+    """
+    Marks the user words as changed (in the current transaction)
+    :param user_id: integer user id
+    :param work_session: sqlalchemy session of the transaction (db_worker.session by default)
+    """
+    (work_session or session).execute(
+        sqlalchemy.update(Users).where(Users.user_id == user_id).values(data_version=Users.data_version + 1)
+    )
+
+
 def add_example(example_text: str, user_tg_id: str) -> UsersExamples:
     """
     Adding new example to 'examples' table, return UsersExamples obj
@@ -272,6 +701,7 @@ def add_example(example_text: str, user_tg_id: str) -> UsersExamples:
         user_id=user_id
     )
     session.add(example_to_add)
+    bump_data_version(user_id)
     session.commit()
     logger.info(f'[{user_tg_id}]: Example successfully added return value')
     return example_to_add
@@ -300,11 +730,49 @@ def add_word(word: str, description: str, category: str, rating: int, example: U
         example_id=example.ex_id    # or "example_words=example"
     )
     session.add(word_to_add)
+    bump_data_version(example.user_id)
     session.commit()
     logger.info(f'[{word, example.ex_id}]: Word successfully added')
     return word_to_add
 
 
+def add_init_words(user_tg_id: str, init_words: list) -> int:
+    """
+    Adds the starter words in one transaction: one multi-row insert of the examples and one of the words
+    (the words the user already has are skipped, so the repeated call adds nothing)
+    :param user_tg_id: string representation of telegram user id
+    :param init_words: list of dicts with example, word, description, category (config.INIT_WORDS)
+    :return: integer count of added words
+    """
+    with session_scope() as s:
+        user_id = s.query(Users.user_id).filter_by(tg_id=str(user_tg_id)).scalar()
+        examples_ids = get_user_examples_ids(s, user_id, [i['example'] for i in init_words])
+        new_examples = list(dict.fromkeys(i['example'] for i in init_words if i['example'] not in examples_ids))
+        if new_examples:
+            s.execute(sqlalchemy.insert(UsersExamples).values([
+                {'example': i, 'user_id': user_id} for i in new_examples
+            ]))
+            examples_ids.update(get_user_examples_ids(s, user_id, new_examples))
+
+        existing_words = set(s.query(
+            UsersExamplesWords.word, UsersExamplesWords.description, UsersExamplesWords.example_id
+        ).filter(UsersExamplesWords.example_id.in_(set(examples_ids.values()))))
+        new_words = {}
+        for i in init_words:
+            key = (i['word'], i['description'], examples_ids[i['example']])
+            if key not in existing_words:
+                new_words[key] = {
+                    'word': i['word'], 'description': i['description'], 'category': i['category'], 'rating': 0,
+                    'example_id': examples_ids[i['example']]
+                }
+        if new_words:
+            s.execute(sqlalchemy.insert(UsersExamplesWords).values(list(new_words.values())))
+        if new_examples or new_words:
+            bump_data_version(user_id, s)
+    logger.info(f'[{user_tg_id}]: {len(new_words)} init words successfully added')
+    return len(new_words)
+
+
 ########################################################################################################################
 # lessons.py
 def get_user(tg_id: str) -> Users | None:
@@ -338,6 +806,7 @@ def change_rating(word_id: int, new_rating: int):
     old_rating = word.rating
     word.rating = new_rating
     session.add(word)
+    bump_data_version(get_example(example_id=word.example_id).user_id)    # ratings change the export order
     session.commit()
     logger.info(f'[{word_id}]: Changed word rating {old_rating} >>> {new_rating}')
 
@@ -350,52 +819,104 @@ def add_or_change_day_stat(tg_id: str, first_try: int, mistakes: int, points: in
     :param mistakes: integer count of mistakes
     :param points: integer count of points
     """
-    today = str(datetime.date.today())
     user = get_user(tg_id=tg_id)
-    user_id = user.user_id
-
-    day_stat_log = session.query(UsersStatistics).filter(sqlalchemy.and_(
-        UsersStatistics.user_id == user_id,
-        UsersStatistics.day == today
-    )).first()
-
-    if day_stat_log:
-        day_stat_log.firs_try_success += first_try
-        day_stat_log.mistake += mistakes
-        day_stat_log.total += points
-        logger.info(f'[{tg_id}]: Change day stat f_try {first_try}, mistakes {mistakes}, total {points}...')
-    else:
-        day_stat_log = UsersStatistics(
-            day=today,
-            firs_try_success=first_try,
-            mistake=mistakes,
-            total=points,
-            user_id=user_id
-        )
-        logger.info(f'[{tg_id}]: Add day stat f_try {first_try}, mistakes {mistakes}, total {points}...')
+    logger.info(f'[{tg_id}]: Change day stat f_try {first_try}, mistakes {mistakes}, total {points}...')
+    add_to_day_stat(session, user.user_id, first_try=first_try, mistakes=mistakes, points=points)
 
     user.points += points
 
-    session.add(day_stat_log)
     session.add(user)
     session.commit()
     logger.info(f'[{tg_id}]: Successes add_or_change_day_stat and changing total user points')
 
 
+def add_to_day_stat(work_session, user_id: int, first_try: int, mistakes: int, points: int) -> UsersStatistics:
+    """
+    Adds the lesson results to the today log of the user (the log is created by the first lesson of the day).
+    Two lessons finished at once may both create the log: the second insert breaks ux_statistics_user_id_day,
+    is rolled back to the savepoint and the results are added to the log of the first one
+    :param work_session: sqlalchemy session of the transaction
+    :param user_id: integer user id
+    :param first_try: integer count of first attempts success
+    :param mistakes: integer count of mistakes
+    :param points: integer count of points
+    :return: UsersStatistics object of the today log (locked till the end of the transaction)
+    """
+    today = str(datetime.date.today())
+    query = work_session.query(UsersStatistics).filter(sqlalchemy.and_(
+        UsersStatistics.user_id == user_id,
+        UsersStatistics.day == today
+    )).with_for_update().populate_existing()
+
+    day_stat_log = query.first()
+    if day_stat_log is None:
+        try:
+            with work_session.begin_nested():
+                work_session.add(UsersStatistics(day=today, firs_try_success=0, mistake=0, total=0, user_id=user_id))
+        except sqlalchemy.exc.IntegrityError:
+            logger.info(f'[{user_id}]: Day stat {today} is added by the concurrent lesson')
+        day_stat_log = query.one()
+    day_stat_log.firs_try_success += first_try
+    day_stat_log.mistake += mistakes
+    day_stat_log.total += points
+    return day_stat_log
+
+
+def finish_lesson(tg_id: str, lesson_stats: list, points: int = 15) -> dict:
+    """
+    Saves all the results of the lesson in one transaction:
+    new ratings of the lesson words (one UPDATE ... CASE), the daily log, the user points and shock mode
+    :param tg_id: string representation of telegram user id
+    :param lesson_stats: list of dicts {'sql_id', 'current_rating', 'attempts', 'mistakes'}
+    :param points: integer count of points for the lesson
+    :return: dict with integer counts 'first_try' and 'mistakes'
+    """
+    first_try = sum(1 for word_stat_data in lesson_stats if word_stat_data['attempts'] == 1)
+    mistakes = sum(word_stat_data['mistakes'] for word_stat_data in lesson_stats)
+    new_ratings = {word_stat_data['sql_id']: word_stat_data['current_rating'] for word_stat_data in lesson_stats}
+
+    with session_scope() as work_session:
+        user = work_session.query(Users).filter_by(tg_id=tg_id).with_for_update().one()
+
+        if new_ratings:
+            work_session.execute(
+                sqlalchemy.update(UsersExamplesWords)
+                .where(UsersExamplesWords.word_id.in_(new_ratings))
+                .values(rating=sqlalchemy.case(new_ratings, value=UsersExamplesWords.word_id))
+                .execution_options(synchronize_session=False)
+            )
+
+        day_stat_log = add_to_day_stat(work_session, user.user_id, first_try=first_try, mistakes=mistakes,
+                                       points=points)
+
+        user.points += points
+        if new_ratings:
+            user.data_version += 1    # ratings change the export order and filter
+        update_shock_mode(user=user, today_total=day_stat_log.total, flag='change')
+
+    logger.info(f'[{tg_id}]: Lesson finished: {len(new_ratings)} ratings, f_try {first_try}, mistakes {mistakes}, '
+                f'total {points}')
+    return {'first_try': first_try, 'mistakes': mistakes}
+
+
+# precompiled statements with bound parameters - the compiled form is taken from the engine cache on every call
+WORDS_DATA_SQL = sqlalchemy.text(
+    "SELECT "
+    "examples.user_id, words.word, words.description, examples.example, words.category, words.rating, words.word_id"
+    " FROM users"
+    " LEFT JOIN examples ON examples.user_id = users.user_id"
+    " LEFT JOIN words ON words.example_id = examples.ex_id"
+    " WHERE users.tg_id = :tg_id"
+)
+
+
 def get_words_data(user_tg_id: str) -> list:
     """
     :param user_tg_id: string representation of telegram user id
     :return: the data of the user's words by list with json-words with keys:
      'tg_id': 'word', 'description', 'example', 'category', 'rating', 'word_id', 'is_main'
     """
-    sql_query = engine.execute(
-        " SELECT "
-        "examples.user_id, words.word, words.description, examples.example, words.category, words.rating, words.word_id"
-        " FROM users"
-        " LEFT JOIN examples ON examples.user_id = users.user_id"
-        " LEFT JOIN words ON words.example_id = examples.ex_id"
-        " WHERE users.tg_id = '{}'".format(user_tg_id)
-    )
+    sql_query = engine.execute(WORDS_DATA_SQL, {'tg_id': str(user_tg_id)})
     words = [
         {
             'tg_id': i.user_id,
@@ -413,6 +934,82 @@ def get_words_data(user_tg_id: str) -> list:
     return words
 
 
+def get_lesson_words_data(user_tg_id: str, difficult_limit: int = 5, easy_limit: int = 10,
+                          pool_limit: int = 10) -> tuple:
+    """
+    Selects only the lesson candidates in sql instead of the whole user vocabulary:
+    the word ids are sorted | sampled from ix_words_example_id_category_rating only (narrow index entries,
+    without the texts), then the texts are loaded only for the chosen word ids
+    :param user_tg_id: string representation of telegram user id
+    :param difficult_limit: integer count of words with the highest rating
+    :param easy_limit: integer count of random words
+    :param pool_limit: integer count of random wrong answer candidates for each lesson word category
+    :return: integer user word count,
+     list of lesson words (first difficult_limit words sorted by rating, then random ones),
+     list of wrong answer candidates
+     with json-words with keys: 'tg_id': 'word', 'description', 'example', 'category', 'rating', 'word_id', 'is_main'
+    """
+    user_id = session.query(Users.user_id).filter_by(tg_id=str(user_tg_id)).scalar()
+
+    def user_words(*columns):
+        return sqlalchemy.select(*columns).join_from(
+            UsersExamplesWords, UsersExamples, UsersExamplesWords.example_id == UsersExamples.ex_id
+        ).where(UsersExamples.user_id == user_id)
+
+    words_count = session.execute(user_words(sqlalchemy.func.count(UsersExamplesWords.word_id))).scalar()
+    if words_count < difficult_limit + easy_limit:
+        logger.info(f'[{user_tg_id}]: Not enough words for lesson candidates {words_count}')
+        return words_count, [], []
+
+    word_key = user_words(UsersExamplesWords.word_id, UsersExamplesWords.category)
+    difficult_keys = session.execute(
+        word_key.order_by(UsersExamplesWords.rating.desc(), UsersExamplesWords.word_id).limit(difficult_limit)
+    ).all()
+    easy_keys = session.execute(
+        word_key.where(
+            UsersExamplesWords.word_id.not_in([i.word_id for i in difficult_keys])
+        ).order_by(sqlalchemy.func.rand()).limit(easy_limit)
+    ).all()
+    lesson_ids = [i.word_id for i in difficult_keys + easy_keys]
+
+    # the wrong answers are better from the same part of speech - a small random pool for each lesson category
+    pools = [
+        user_words(UsersExamplesWords.word_id).where(sqlalchemy.and_(
+            UsersExamplesWords.category == category,
+            UsersExamplesWords.word_id.not_in(lesson_ids)
+        )).order_by(sqlalchemy.func.rand()).limit(pool_limit).subquery()
+        for category in {i.category for i in difficult_keys + easy_keys}
+    ]
+    pool_ids = session.execute(sqlalchemy.union_all(*[sqlalchemy.select(pool) for pool in pools])).scalars().all()
+
+    rows = session.execute(
+        sqlalchemy.select(
+            UsersExamples.user_id, UsersExamplesWords.word, UsersExamplesWords.description, UsersExamples.example,
+            UsersExamplesWords.category, UsersExamplesWords.rating, UsersExamplesWords.word_id
+        ).join_from(
+            UsersExamplesWords, UsersExamples, UsersExamplesWords.example_id == UsersExamples.ex_id
+        ).where(UsersExamplesWords.word_id.in_(lesson_ids + pool_ids))
+    ).all()
+    rows = {i.word_id: i for i in rows}
+    lesson_rows = [rows[word_id] for word_id in lesson_ids if word_id in rows]    # deleted in between
+    pool_rows = [rows[word_id] for word_id in pool_ids if word_id in rows]
+
+    def to_json_word(i) -> dict:
+        return {
+            'tg_id': i.user_id,
+            'word': i.word,
+            'description': i.description,
+            'example': i.example,
+            'category': i.category,
+            'rating': i.rating,
+            'word_id': i.word_id,
+            'is_main': False
+        }
+
+    logger.info(f'[{user_tg_id}]: Successes return lesson words data {len(lesson_rows)} + {len(pool_rows)}')
+    return words_count, [to_json_word(i) for i in lesson_rows], [to_json_word(i) for i in pool_rows]
+
+
 class MinLenError(TypeError):
     """
     It occurs when a lesson requests when the user does not have enough words
@@ -423,7 +1020,7 @@ def get_lesson_data(tg_id: str) -> list:
     """
     independent action
         accepts a db_worker.Users instance (further "user")
-        collects the user's words
+        collects only the lesson candidates of the user's words (get_lesson_words_data)
         if there are less than 15 words - raises an exception
         makes a sequence of tests depending on the rating of the word
         Adds wrong answers depending on the speech type of the word
@@ -431,98 +1028,105 @@ def get_lesson_data(tg_id: str) -> list:
         of dict {'tg_id', 'word', 'description', 'example', 'category', 'rating', 'word_id', 'is_main'}
     """
     logger.info(f'[{tg_id}]: Start get_lesson_data')
-    words = get_words_data(user_tg_id=tg_id)
-    words_len = len(words)
+    words_len, lesson_words, wrong_words = get_lesson_words_data(user_tg_id=tg_id)
     if words_len < 15:
         raise MinLenError(f"{words_len}")
-    logger.info(f'[{tg_id}]: Start sort words {words_len}')
-    words.sort(key=lambda word: word['rating'], reverse=True)
-    logger.info(f'[{tg_id}]: Sorted success')
+    if len(lesson_words) < 15:
+        # the words deleted between the ids and the texts queries - the lesson is refilled by the wrong answers
+        logger.warning(f'[{tg_id}]: Only {len(lesson_words)} lesson words are left, refill them')
+        missing = 15 - len(lesson_words)
+        lesson_words, wrong_words = lesson_words + wrong_words[:missing], wrong_words[missing:]
+        if len(lesson_words) < 15:
+            raise MinLenError(f"{len(lesson_words)}")
+    logger.info(f'[{tg_id}]: Start choose lesson words {words_len}')
     # the most difficult words are better learned 1/3(5):
     # 1 - 3 when repeated at the beginning (as a work on mistakes)
     # 14 - 15 and as the last tasks (like a boss in a video game,
     # so that the player has fun after passing)
-    difficult_words = words[:5]
-    random.shuffle(difficult_words)
-    remaining_words = words[5:]
-    random.shuffle(remaining_words)
-    easy_words = remaining_words[:10]
-    words_for_lesson = collections.deque(
-        iterable=difficult_words[:3] + easy_words + difficult_words[3:],
-        maxlen=15
-    )
-    data_for_lesson = []
-    # data for the test 15 tests (1 correct and 3 wrong answers)
-    for i in range(len(words_for_lesson)):
-        random.shuffle(words)  # i mix each time, to improve accident
-        test_words = []  # 4 words, in the first place is always correct
-
-        right_word = words_for_lesson.popleft()
-        test_words.append(right_word)
+    # (sql returns 5 words with the highest rating first and then 10 random words)
+    words = lesson_words + wrong_words
+    candidates_len = len(words)
+    difficult_ids = list(range(5))
+    random.shuffle(difficult_ids)
+    easy_ids = list(range(5, 15))
+    lesson_ids = difficult_ids[:3] + easy_ids + difficult_ids[3:]
+    logger.info(f'[{tg_id}]: Choose success')
+
+    # category -> word indexes, so wrong answers are sampled without rescanning all user words for each task
+    category_index = collections.defaultdict(list)
+    for i, word in enumerate(words):
+        category_index[word['category']].append(i)
 
-        for word in words:
-            if len(test_words) == 4:  # 4 words
-                break
-            if word not in test_words and word["category"] == right_word["category"]:
-                # the best learning effect is when the words are not just random,
-                # but belong to the same part of speech ...
-                wrong_word = word
-                test_words.append(wrong_word)
-
-        if len(test_words) != 4:  # ... but the user does not always have enough words ...
-            for word in words:
-                if len(test_words) == 4:
-                    break
-                if word not in test_words:
-                    # ... therefore, fill in the missing ones in order,
-                    # random.shuffle at the beginning will prevent repetitions
-                    wrong_word = word
-                    test_words.append(wrong_word)
-
-        data_for_lesson.append(test_words)
-
-    # [[{w}, {w}, {w}, {w}], ...]
-
-    # It may be that the user has added the same word with different examples,
-    # in this case there will be several correct answers.
-    # This approach is quite good because the word will be remembered in several contexts
+    # data for the test 15 tests (1 correct and 3 wrong answers)
     ready_tasks = []
-    for task in data_for_lesson:
-        task = copy.deepcopy(task)     # Each test should not affect the state of all words in general
-        main_correct_word = task[0]
-        main_correct_word["is_main"] = True
-        correct_pattern = main_correct_word["word"].lower().strip()
-        for w in task:
-            w_pattern = w["word"].lower().strip()
-            if w_pattern == correct_pattern:
-                w["is_correct"] = True
-            else:
-                w["is_correct"] = False
-
-        current_lesson_data = {'a': None, 'b': None, 'c': None, 'd': None}
+    for right_id in lesson_ids:
+        task_ids = [right_id]  # 4 words, in the first place is always correct
+
+        # the best learning effect is when the words are not just random,
+        # but belong to the same part of speech ...
+        same_category_ids = category_index[words[right_id]['category']]
+        for i in random.sample(same_category_ids, min(4, len(same_category_ids))):
+            if i != right_id and len(task_ids) < 4:
+                task_ids.append(i)
+
+        # ... but the user does not always have enough words ...
+        while len(task_ids) < 4:
+            i = random.randrange(candidates_len)
+            if i not in task_ids:    # ... therefore, fill in the missing ones with random words
+                task_ids.append(i)
+
+        # It may be that the user has added the same word with different examples,
+        # in this case there will be several correct answers.
+        # This approach is quite good because the word will be remembered in several contexts
+        # (each task gets its own flat copies - tests should not affect the state of all words in general)
+        correct_pattern = words[right_id]['word'].lower().strip()
+        task = [
+            dict(
+                words[i],
+                is_main=i == right_id,
+                is_correct=words[i]['word'].lower().strip() == correct_pattern
+            )
+            for i in task_ids
+        ]
         random.shuffle(task)  # answer options mixed
-        for n, k in enumerate(current_lesson_data.keys()):
-            current_lesson_data[k] = task[n]
-
-        ready_tasks.append(current_lesson_data)
+        ready_tasks.append(dict(zip(('a', 'b', 'c', 'd'), task)))
 
     # [{aw, bw, cw, dw}, {}, {}, {}, ...]
     logger.info(f'[{tg_id}]: Return data for lesson')
     return ready_tasks
 
 
+def get_words_texts(word_ids: list) -> list:
+    """
+    :param word_ids: list of integer word ids
+    :return: list of dict {'word_id', 'word', 'description', 'example'} (deleted words are skipped)
+    """
+    rows = session.execute(
+        sqlalchemy.select(
+            UsersExamplesWords.word_id, UsersExamplesWords.word, UsersExamplesWords.description, UsersExamples.example
+        ).join_from(
+            UsersExamplesWords, UsersExamples, UsersExamplesWords.example_id == UsersExamples.ex_id
+        ).where(UsersExamplesWords.word_id.in_(word_ids))
+    ).all()
+    return [dict(i._mapping) for i in rows]
+
+
 ########################################################################################################################
 # statistic.py
+WORD_COUNT_SQL = sqlalchemy.text(
+    "SELECT count(w.word_id) count FROM users u "
+    "LEFT JOIN examples e ON e.user_id = u.user_id "
+    "LEFT JOIN words w ON w.example_id = e.ex_id "
+    "WHERE u.tg_id = :tg_id"
+)
+
+
 def word_count(user_tg_id: str) -> int:
     """
     :param user_tg_id: string representation of telegram user id
     :return: integer value user's word count
     """
-    return list(engine.execute(
-        "SELECT count(w.word_id) count FROM users u "
-        "LEFT JOIN examples e ON e.user_id = u.user_id "
-        "LEFT JOIN words w ON w.example_id = e.ex_id "
-        "WHERE u.tg_id = '{}';".format(user_tg_id)))[0][0]
+    return engine.execute(WORD_COUNT_SQL, {'tg_id': str(user_tg_id)}).scalar()
 
 
 def get_user_stat(user_tg_id: str, limit: int = 7) -> list:
@@ -532,7 +1136,7 @@ def get_user_stat(user_tg_id: str, limit: int = 7) -> list:
     :return: list of UsersStatistics objects
     """
     return session.query(UsersStatistics).filter_by(user_id=get_user(user_tg_id).user_id).order_by(
-                                                                            UsersStatistics.day_id.desc()).limit(limit)
+                                                                        UsersStatistics.day_id.desc()).limit(limit).all()
 
 
 def build_total_mistakes_firsttry_data_for_graph(user_sql_logs: list, future_length: int = 7) -> dict:
@@ -565,172 +1169,448 @@ def build_total_mistakes_firsttry_data_for_graph(user_sql_logs: list, future_len
 
 ########################################################################################################################
 # checking.py
-def create_file_with_user_words(user_tg_id: str, file_path: str, file_type: str,
-                                sql_filter_key: str, sql_sort_key: str) -> str:
+USER_WORDS_SQL = """
+    SELECT words.word_id, words.word, words.description, examples.ex_id, examples.example, {sort_key} AS sort_key
+    FROM users
+    JOIN examples ON examples.user_id = users.user_id
+    JOIN words ON words.example_id = examples.ex_id
+"""
+USER_WORDS_WHERE_SQL = """
+    WHERE users.tg_id = :tg_id
+"""
+# filter key -> (join, condition), the join is placed before the WHERE and the condition after it
+USER_WORDS_FILTER_SQL = {
+    # '...': ...    # * space for expansion
+    'most important words': (
+        # the average rating of the user own words, aggregated once into the one-row table
+        """
+        JOIN (
+            SELECT AVG(avg_words.rating) AS rating
+            FROM users AS avg_users
+            JOIN examples AS avg_examples ON avg_examples.user_id = avg_users.user_id
+            JOIN words AS avg_words ON avg_words.example_id = avg_examples.ex_id
+            WHERE avg_users.tg_id = :tg_id
+        ) AS user_average
+        """,
+        """
+        AND words.rating > user_average.rating
+        """
+    ),
+}
+# sort key -> sort expression, the ties (and the 'default' sort) are ordered by words.word_id
+USER_WORDS_ORDER_SQL = {
+    'by importance': 'COALESCE(words.rating, 0)',
+    'in alphabetical order': 'words.word',
+}
+# the page after the last row (:last_key, :last_id) of the previous page
+USER_WORDS_AFTER_SQL = """
+    AND ({sort_key} > :last_key OR ({sort_key} = :last_key AND words.word_id > :last_id))
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def user_words_statement(sql_filter_key: str, sql_sort_key: str,
+                         after: bool = False) -> sqlalchemy.sql.expression.TextClause:
+    """
+    Builds once and then reuses the statement for the filter / sort pair, so the engine compiles it only once
+    :param sql_filter_key: 'most important words' / 'default'
+    :param sql_sort_key: 'by importance' / 'in alphabetical order' / 'default'
+    :param after: boolean - the statement of the next page (with the bound parameters :last_key and :last_id)
+    :return: text statement with the bound parameters :tg_id and :limit
+    """
+    filter_join, filter_condition = USER_WORDS_FILTER_SQL.get(sql_filter_key, ('', ''))
+    sort_key = USER_WORDS_ORDER_SQL.get(sql_sort_key, 'words.word_id')
+    return sqlalchemy.text(
+        USER_WORDS_SQL.format(sort_key=sort_key)
+        + filter_join
+        + USER_WORDS_WHERE_SQL
+        + filter_condition
+        + (USER_WORDS_AFTER_SQL.format(sort_key=sort_key) if after else '')
+        + f' ORDER BY {sort_key} ASC, words.word_id ASC LIMIT :limit'
+    )
+
+
+def iter_user_words(user_tg_id: str, sql_filter_key: str, sql_sort_key: str):
     """
-    Creates a file in the specified format with user data
+    Reads the user words page by page (EXPORT_CHUNK_SIZE rows each, one short query after the last row
+    of the previous page), so only one page is in the memory and the connection is not held between the pages
+    (a word changed during the export may be missed or repeated)
     :param user_tg_id: string representation of telegram user id
-    :param file_path: string place where file will be safe
-    :param file_type: 'xlsx' / 'json' / 'xml' / 'csv'
     :param sql_filter_key: 'most important words' / 'default'
     :param sql_sort_key: 'by importance' / 'in alphabetical order' / 'default'
-    :return: path with name of created file
-    """
-    # sql_filter_key:
-    logger.info(f'[{user_tg_id}]: Sql query {sql_filter_key}...')
-
-    sql_cmd = """ 
-        SELECT words.word_id, words.word, words.description, examples.ex_id, examples.example
-        FROM users
-        LEFT JOIN examples ON examples.user_id = users.user_id
-        LEFT JOIN words ON words.example_id = examples.ex_id
-        WHERE users.tg_id = '{0}'
-    """.format(user_tg_id)
-
-    # elif sql_filter_key == '...':    # * space for expansion
-    if sql_filter_key == 'most important words':
-        sql_miw = """
-            AND words.rating > (SELECT AVG(rating) FROM words WHERE users.tg_id = '{0}')
-        """.format(user_tg_id)
-        sql_main = sql_cmd + sql_miw
-    else:
-        sql_main = sql_cmd
+    :return: generator of rows with word_id, word, description, ex_id, example, sort_key
+    """
+    logger.info(f'[{user_tg_id}]: Sql query {sql_filter_key, sql_sort_key}...')
+    statement = user_words_statement(sql_filter_key=sql_filter_key, sql_sort_key=sql_sort_key)
+    params = {'tg_id': str(user_tg_id), 'limit': EXPORT_CHUNK_SIZE}
+    while True:
+        with engine.connect() as connection:
+            rows = connection.execute(statement, params).fetchall()
+        yield from rows
+        if len(rows) < EXPORT_CHUNK_SIZE:
+            return
+        statement = user_words_statement(sql_filter_key=sql_filter_key, sql_sort_key=sql_sort_key, after=True)
+        params.update(last_key=rows[-1].sort_key, last_id=rows[-1].word_id)
 
-    # sql_sort_key:
-    if sql_sort_key == 'by importance':
-        sql_query = engine.execute(sql_main + ' ORDER BY words.rating ASC')
-    elif sql_sort_key == 'in alphabetical order':
-        sql_query = engine.execute(sql_main + ' ORDER BY words.word ASC')
-    else:
-        sql_query = engine.execute(sql_main + ' ORDER BY words.word_id ASC')
-
-    logger.info(f'[{user_tg_id}]: Sql query success >>> {type(sql_query)}')
-    # file_type:
-    file_path += '/'
-    if not os.path.isdir(file_path):
-        os.mkdir(file_path)
-    file_name = str(file_path + 'words' + user_tg_id + '.' + file_type)
-    logger.info(f'[{user_tg_id}]: Create file {file_name}')
-    file = open(file_name, 'w', encoding='utf-8')
-    # xlsx
-    if file_name.endswith('xlsx'):
-        workbook = openpyxl.Workbook()
-        new_sheet = workbook.active
-        sheet = workbook.create_sheet(f"words")
-        sheet.column_dimensions['A'].width = 8.43
-        sheet.column_dimensions['B'].width = 11
-        sheet.column_dimensions['C'].width = 20
-        sheet.column_dimensions['D'].width = 50
-        sheet.column_dimensions['E'].width = 11
-        sheet.column_dimensions['F'].width = 50
-        sheet.column_dimensions['G'].width = 150
-        workbook.remove(new_sheet)
-        # write data
-        number = 2
-        for number, i in enumerate(sql_query, start=2):
-            if number == 2:
-                sheet[f'B{number}'] = "word id"
-                sheet[f'C{number}'] = "word"
-                sheet[f'D{number}'] = "description"
-                sheet[f'E{number}'] = "ex id"
-                sheet[f'F{number}'] = "example"
-            # body
-            sheet[f'B{number + 1}'] = i.word_id
-            sheet[f'C{number + 1}'] = i.word
-            sheet[f'D{number + 1}'] = i.description
-            sheet[f'E{number + 1}'] = i.ex_id
-            sheet[f'F{number + 1}'] = i.example
-        # for design and fun
-        sheet[f'V{number + 150}'] = 'you found the easter egg:)'
-        # design
-        my_font = Font(
-            name='Segoe UI',
-            size=14,
-            color='B3BAC0'
-        )
-        my_font_blue = Font(
-            name='Segoe UI',
-            size=14,
-            color='62ACBE'
-        )
-        my_fill = PatternFill(
-            "solid",
-            fgColor="1E252B")
-        my_border = Border(
-            left=Side(border_style='thin', color='0D0D0D'),
-            right=Side(border_style='thin', color='0D0D0D'),
-            top=Side(border_style='thin', color='0D0D0D'),
-            bottom=Side(border_style='thin', color='0D0D0D')
-        )
-        my_alignment = Alignment(
-            horizontal='center',
-            vertical='center',
-            wrap_text=True,
-        )
-        for row in sheet.iter_rows():
-            for cell in row:
-                cell.fill = my_fill
-                cell.font = my_font
-                cell.alignment = my_alignment
-                # table-only borders:
-                if (
-                    cell.coordinate[0] in 'B C D E F'.split()
-                    and cell.coordinate[1].isdigit()
-                ):
-                    if 2 <= int(cell.coordinate[1:]) <= number + 1:
-                        cell.border = my_border
-                # blue color for indices and header:
-                if (
-                    (cell.coordinate[0] in 'B C D E F'.split()
-                     and cell.coordinate[1:] == '2')
-                    or
-                    (cell.coordinate[0] in 'B E'.split())
-                ):
-                    cell.font = my_font_blue
-        workbook.save(file_name)
-    # json
-    elif file_name.endswith('json'):
-        json_data = {}
-        for i in sql_query:
-            json_data[i.word_id] = {
+
+def iter_json_export(rows):
+    """
+    :return: generator of json text parts - {word_id: {"word", "description", "example_id", "example"}, ...}
+    """
+    separator = '\n'
+    yield '{'
+    for i in rows:
+        item = json.dumps({
+            i.word_id: {
                 "word": i.word,
                 "description": i.description,
                 "example_id": str(i.ex_id),
                 "example": i.example
             }
-        json.dump(json_data, file, indent=4, ensure_ascii=False)
-    # xml
-    elif file_name.endswith('xml'):
-        root = ElementTree.Element('words')
-        for i in sql_query:
-            w = ElementTree.SubElement(root, 'w')
-            word_id = ElementTree.SubElement(w, 'word_id')
-            word_id.text = str(i.word_id)
-            word = ElementTree.SubElement(w, 'word')
-            word.text = i.word
-            description = ElementTree.SubElement(w, 'description')
-            description.text = i.description
-            example_id = ElementTree.SubElement(w, 'example_id')
-            example_id.text = str(i.ex_id)
-            example = ElementTree.SubElement(w, 'example')
-            example.text = i.example
-        tree = ElementTree.ElementTree(root)
-        tree.write(file_name)
-    # сsv
-    elif file_name.endswith('csv'):
-        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
-        word_data = [(i.word_id, i.word, i.description, i.ex_id, i.example) for i in sql_query]
-        if not word_data:
-            word_data = [('', '', '', '', '')]
-        writer.writerows(word_data)
-    # unknown
+        }, indent=4, ensure_ascii=False)
+        yield separator + item[2:-2]    # without the braces of the one-item dict
+        separator = ',\n'
+    yield '}' if separator == '\n' else '\n}'
+
+
+def iter_xml_export(rows):
+    """
+    :return: generator of xml text parts - <words><w><word_id/><word/><description/><example_id/><example/></w>...
+    """
+    yield '<words>'
+    for i in rows:
+        w = ElementTree.Element('w')
+        ElementTree.SubElement(w, 'word_id').text = str(i.word_id)
+        ElementTree.SubElement(w, 'word').text = i.word
+        ElementTree.SubElement(w, 'description').text = i.description
+        ElementTree.SubElement(w, 'example_id').text = str(i.ex_id)
+        ElementTree.SubElement(w, 'example').text = i.example
+        yield ElementTree.tostring(w, encoding='unicode')
+    yield '</words>'
+
+
+def iter_csv_export(rows):
+    """
+    :return: generator of csv text parts - "word_id","word","description","ex_id","example"
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+    is_empty = True
+    for i in rows:
+        writer.writerow((i.word_id, i.word, i.description, i.ex_id, i.example))
+        is_empty = False
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if is_empty:
+        writer.writerow(('', '', '', '', ''))
+        yield buffer.getvalue()
+
+
+def xlsx_named_styles() -> dict:
+    """
+    :return: dict of the shared workbook styles:
+     'background' - dark page, 'index' - blue text on dark page,
+     'table' - table cell with borders, 'table_index' - blue table cell (header, word id, ex id)
+    """
+    fill = PatternFill("solid", fgColor="1E252B")
+    side = Side(border_style='thin', color='0D0D0D')
+    border = Border(left=side, right=side, top=side, bottom=side)
+    alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+    font = Font(name='Segoe UI', size=14, color='B3BAC0')
+    font_blue = Font(name='Segoe UI', size=14, color='62ACBE')
+    return {
+        'background': NamedStyle('background', font=font, fill=fill, alignment=alignment),
+        'index': NamedStyle('index', font=font_blue, fill=fill, alignment=alignment),
+        'table': NamedStyle('table', font=font, fill=fill, alignment=alignment, border=border),
+        'table_index': NamedStyle('table_index', font=font_blue, fill=fill, alignment=alignment, border=border),
+    }
+
+
+XLSX_WIDTHS = {'A': 8.43, 'B': 11, 'C': 20, 'D': 50, 'E': 11, 'F': 50, 'G': 150}
+XLSX_COLUMNS = 22    # A...V - the page is painted up to the easter egg column
+# styles of the columns A...F (the rest columns are 'background')
+XLSX_HEADER_ROW = ('background', 'table_index', 'table_index', 'table_index', 'table_index', 'table_index')
+XLSX_TABLE_ROW = ('background', 'table_index', 'table', 'table', 'table_index', 'table')
+XLSX_PAGE_ROW = ('background', 'index', 'background', 'background', 'index', 'background')
+
+
+def write_xlsx_export(rows, file):
+    """
+    Writes the styled workbook with the user words row by row (write-only workbook - bounded memory)
+    :param rows: iterable of rows with word_id, word, description, ex_id, example
+    :param file: binary file-like object
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    for style in xlsx_named_styles().values():
+        workbook.add_named_style(style)
+    sheet = workbook.create_sheet("words")
+    for column, width in XLSX_WIDTHS.items():
+        sheet.column_dimensions[column].width = width
+
+    # the write-only sheet serializes every appended row at once,
+    # so one styled empty cell of each style is shared by all the rows
+    empty_cells = {}
+    for name in xlsx_named_styles():
+        empty_cells[name] = WriteOnlyCell(sheet)
+        empty_cells[name].style = name
+
+    def write_row(values: tuple, styles: tuple):
+        cells = []
+        for column in range(XLSX_COLUMNS):
+            style = styles[column] if column < len(styles) else 'background'
+            if column < len(values) and values[column] is not None:
+                cell = WriteOnlyCell(sheet, value=values[column])
+                cell.style = style
+                cells.append(cell)
+            else:
+                cells.append(empty_cells[style])
+        sheet.append(cells)
+
+    write_row((), XLSX_PAGE_ROW)
+    rows = iter(rows)
+    first = next(rows, None)
+    write_row((None, "word id", "word", "description", "ex id", "example") if first else (), XLSX_HEADER_ROW)
+    if first:
+        for i in itertools.chain([first], rows):
+            write_row((None, i.word_id, i.word, i.description, i.ex_id, i.example), XLSX_TABLE_ROW)
+    else:    # the empty table has the header row and one empty row
+        write_row((), XLSX_TABLE_ROW)
+    # for design and fun
+    for _ in range(148):
+        write_row((), XLSX_PAGE_ROW)
+    write_row((None,) * (XLSX_COLUMNS - 1) + ('you found the easter egg:)',), XLSX_PAGE_ROW)
+    workbook.save(file)
+
+
+# file_type -> generator of text parts (xlsx is a zip archive and is written by write_xlsx_export)
+EXPORT_WRITERS = {
+    'json': iter_json_export,
+    'xml': iter_xml_export,
+    'csv': iter_csv_export,
+}
+
+
+# (tg_id, data_version, file_type, sql_filter_key, sql_sort_key) -> bytes of the ready export
+exports_cache = LruCache(maxsize=EXPORT_CACHE_SIZE)
+
+
+def get_user_data_version(user_tg_id: str) -> int:
+    """
+    :param user_tg_id: string representation of telegram user id
+    :return: integer version of the user words (0 if there is no user)
+    """
+    return session.query(Users.data_version).filter_by(tg_id=str(user_tg_id)).scalar() or 0
+
+
+def export_etag(user_tg_id: str, data_version: int, file_type: str, sql_filter_key: str, sql_sort_key: str) -> str:
+    """
+    :return: string entity tag of the export - it changes only with the user words
+    """
+    key = (str(user_tg_id), data_version, file_type, sql_filter_key, sql_sort_key)
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+def iter_user_words_export(user_tg_id: str, file_type: str, sql_filter_key: str, sql_sort_key: str,
+                           data_version: int = None):
+    """
+    Streams the user words export without the intermediate file (for the chunked responses)
+    :param user_tg_id: string representation of telegram user id
+    :param file_type: 'json' / 'xml' / 'csv'
+    :param sql_filter_key: 'most important words' / 'default'
+    :param sql_sort_key: 'by importance' / 'in alphabetical order' / 'default'
+    :param data_version: integer user data version - the export is taken from | saved to the exports cache
+    :return: generator of utf-8 bytes chunks (about EXPORT_CHUNK_BYTES each)
+    """
+    if file_type not in EXPORT_WRITERS:
+        raise NameError(f'fyle type "{file_type}" is not defined')
+    key = (str(user_tg_id), data_version, file_type, sql_filter_key, sql_sort_key)
+    if data_version is not None:
+        cached = exports_cache.get(key)
+        if cached is not None:
+            logger.info(f'[{user_tg_id}]: Export {key} is taken from cache')
+            return iter([cached])
+    parts = EXPORT_WRITERS[file_type](iter_user_words(user_tg_id, sql_filter_key, sql_sort_key))
+
+    def chunks():
+        chunk, chunk_length = [], 0
+        export = [] if data_version is not None else None    # saved only when the whole export is streamed
+        for part in parts:
+            chunk.append(part)
+            chunk_length += len(part)
+            if chunk_length >= EXPORT_CHUNK_BYTES:
+                data = ''.join(chunk).encode('utf-8')
+                if export is not None:
+                    export.append(data)
+                yield data
+                chunk, chunk_length = [], 0
+        if chunk:
+            data = ''.join(chunk).encode('utf-8')
+            if export is not None:
+                export.append(data)
+            yield data
+        if export is not None:
+            cache_export(key, b''.join(export))
+
+    return chunks()
+
+
+def cache_export(key: tuple, data: bytes):
+    """
+    Saves the ready export if it is not too big for the memory
+    """
+    if len(data) <= EXPORT_CACHE_MAX_BYTES:
+        exports_cache.put(key, data)
+
+
+def get_user_words_file(user_tg_id: str, file_type: str, sql_filter_key: str, sql_sort_key: str) -> io.BytesIO:
+    """
+    Creates an in-memory file in the specified format with user data (for the telegram upload)
+    :param user_tg_id: string representation of telegram user id
+    :param file_type: 'xlsx' / 'json' / 'xml' / 'csv'
+    :param sql_filter_key: 'most important words' / 'default'
+    :param sql_sort_key: 'by importance' / 'in alphabetical order' / 'default'
+    :return: io.BytesIO at the start position, with name 'words{user_tg_id}.{file_type}'
+    """
+    data_version = get_user_data_version(user_tg_id)
+    key = (str(user_tg_id), data_version, file_type, sql_filter_key, sql_sort_key)
+    cached = exports_cache.get(key)
+    if cached is not None:
+        logger.info(f'[{user_tg_id}]: Export {key} is taken from cache')
+        file = io.BytesIO(cached)
+    elif file_type == 'xlsx':
+        file = io.BytesIO()
+        write_xlsx_export(iter_user_words(user_tg_id, sql_filter_key, sql_sort_key), file)
+        cache_export(key, file.getvalue())
     else:
-        file.close()
-        raise NameError(f'fyle type "{file_name}" is not defined')
-    file.close()
+        file = io.BytesIO()
+        for chunk in iter_user_words_export(user_tg_id, file_type, sql_filter_key, sql_sort_key, data_version):
+            file.write(chunk)
+    file.seek(0)
+    file.name = f'words{user_tg_id}.{file_type}'
+    logger.info(f'[{user_tg_id}]: Successes return user file {file.name} ({file.getbuffer().nbytes} bytes)')
+    return file
+
 
-    logger.info(f'[{user_tg_id}]: Successes return new temporary user file path')
-    return file_name
+########################################################################################################################
+# adding.py (import of the files made by /data)
+# field -> (min length, max length) as in the /add dialog
+IMPORT_LENGTHS = {'word': (1, 135), 'description': (1, 400), 'example': (5, 400)}
+
+
+def iter_json_import(file):
+    """
+    The json module has no streaming parser, so the file is loaded at once (telegram gives the bot up to 20 MB)
+    :param file: binary file-like object - {word_id: {"word", "description", "example", ...}, ...} | [{...}, ...]
+    :return: generator of dicts with word, description, example
+    """
+    data = json.load(file)
+    yield from data.values() if isinstance(data, dict) else data
+
+
+def iter_xml_import(file):
+    """
+    :param file: binary file-like object - <words><w><word/><description/><example/>...</w>...</words>
+    :return: generator of dicts with word, description, example
+    """
+    for event, element in ElementTree.iterparse(file, events=('end',)):
+        if element.tag == 'w':
+            yield {child.tag: child.text for child in element}
+            element.clear()    # the parsed words are not kept in memory
+
+
+def iter_csv_import(file):
+    """
+    :param file: binary file-like object - "word_id","word","description","ex_id","example"
+     | "word","description","example"
+    :return: generator of dicts with word, description, example
+    """
+    for row in csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline='')):
+        if [i.strip().lower() for i in row[-3:]] == ['word', 'description', 'example'] or \
+                [i.strip().lower() for i in row] == ['word_id', 'word', 'description', 'ex_id', 'example']:
+            continue    # header row of the file written by hand
+        if len(row) == 5:
+            yield {'word': row[1], 'description': row[2], 'example': row[4]}
+        elif len(row) == 3:
+            yield {'word': row[0], 'description': row[1], 'example': row[2]}
+
+
+def iter_xlsx_import(file):
+    """
+    Reads the first sheet row by row (read-only workbook - bounded memory),
+    the columns are found by the header row with "word", "description" and "example" cells
+    :param file: binary file-like object
+    :return: generator of dicts with word, description, example
+    """
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        sheet.reset_dimensions()    # the dimensions written by other programs may be wrong
+        columns = None
+        for row in sheet.iter_rows(values_only=True):
+            if columns is None:
+                header = [str(i).strip().lower() if i is not None else None for i in row]
+                if all(name in header for name in IMPORT_LENGTHS):
+                    columns = {name: header.index(name) for name in IMPORT_LENGTHS}
+                continue
+            yield {name: row[column] if column < len(row) else None for name, column in columns.items()}
+    finally:
+        workbook.close()
+
+
+# file_type -> generator of dicts with word, description, example
+IMPORT_READERS = {
+    'xlsx': iter_xlsx_import,
+    'json': iter_json_import,
+    'xml': iter_xml_import,
+    'csv': iter_csv_import,
+}
+
+
+def import_user_words(user_tg_id: str, file_type: str, file) -> dict:
+    """
+    Adds the words from the file made by /data (or written by hand in the same form).
+    The wrong and repeated words are skipped, the rest are added by IMPORT_BATCH_SIZE words in one transaction
+    :param user_tg_id: string representation of telegram user id
+    :param file_type: 'xlsx' / 'json' / 'xml' / 'csv'
+    :param file: binary file-like object
+    :return: dict with integer counts 'read', 'wrong', 'repeated', 'added'
+    and 'without_category' - list of (word_id, word) of the added words left with '-' (for the category worker)
+    """
+    if file_type not in IMPORT_READERS:
+        raise NameError(f'fyle type "{file_type}" is not defined')
+    user_id = get_user(tg_id=str(user_tg_id)).user_id
+    words_before = word_count(user_tg_id=str(user_tg_id))
+    result = {'read': 0, 'wrong': 0, 'repeated': 0, 'added': 0}
+    seen, batch, without_category = set(), [], []
+    for item in IMPORT_READERS[file_type](file):
+        if isinstance(item, dict) and not any(item.get(name) for name in IMPORT_LENGTHS):
+            continue    # empty row
+        result['read'] += 1
+        if not isinstance(item, dict):
+            result['wrong'] += 1
+            continue
+        word = {name: str(item.get(name) or '').strip() for name in IMPORT_LENGTHS}
+        if not all(min_len <= len(word[name]) <= max_len for name, (min_len, max_len) in IMPORT_LENGTHS.items()):
+            result['wrong'] += 1
+            continue
+        key = (word['word'], word['description'], word['example'])
+        if key in seen:
+            result['repeated'] += 1
+            continue
+        seen.add(key)
+        batch.append(word)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            bulk_add_words(user_id=user_id, words=batch, without_category=without_category)
+            batch = []
+    if batch:
+        bulk_add_words(user_id=user_id, words=batch, without_category=without_category)
+
+    result['added'] = word_count(user_tg_id=str(user_tg_id)) - words_before
+    result['repeated'] += result['read'] - result['wrong'] - result['repeated'] - result['added']    # already added
+    logger.info(f'[{user_tg_id}]: Import {file_type} {result}')
+    result['without_category'] = without_category
+    return result
 
 
 ########################################################################################################################
@@ -742,13 +1622,14 @@ def get_user_example(user: Users, example_id: int = None, example: str = None) -
     :param example: string user example
     :return: first example user by the available parameters by UsersExamles object
     """
-    user_examples_id = list(map(lambda ex: ex.ex_id, user.exxs))
+    # filter by owner id instead of lazy loading user.exxs - the user object may belong to another thread session
+    query = session.query(UsersExamples).options(selectinload(UsersExamples.words))
     if example:
-        return session.query(UsersExamples).filter(sqlalchemy.and_(
-            UsersExamples.example == example, UsersExamples.ex_id.in_(user_examples_id))).first()
+        return query.filter(sqlalchemy.and_(
+            UsersExamples.example == example, UsersExamples.user_id == user.user_id)).first()
     else:
-        return session.query(UsersExamples).filter(sqlalchemy.and_(
-            UsersExamples.ex_id == example_id, UsersExamples.ex_id.in_(user_examples_id))).first()
+        return query.filter(sqlalchemy.and_(
+            UsersExamples.ex_id == example_id, UsersExamples.user_id == user.user_id)).first()
 
 
 def get_example(example_id: int) -> UsersExamples | None:
@@ -768,68 +1649,203 @@ def get_user_word(user: Users, word_id: int = None,
     :param description: string user description
     :return: first user word by the available parameters in UsersExamles object form
     """
-    user_examples_id = list(map(lambda example: example.ex_id, user.exxs))
+    query = session.query(UsersExamplesWords).join(
+        UsersExamples, UsersExamples.ex_id == UsersExamplesWords.example_id).filter(
+        UsersExamples.user_id == user.user_id)
     if word:
-        return session.query(UsersExamplesWords).filter(sqlalchemy.and_(
-            UsersExamplesWords.word == word, UsersExamplesWords.example_id.in_(user_examples_id))).first()
+        return query.filter(UsersExamplesWords.word == word).first()
     elif description:
-        return session.query(UsersExamplesWords).filter(sqlalchemy.and_(
-            UsersExamplesWords.description == description, UsersExamplesWords.example_id.in_(user_examples_id))).first()
+        return query.filter(UsersExamplesWords.description == description).first()
     else:
-        return session.query(UsersExamplesWords).filter(sqlalchemy.and_(
-            UsersExamplesWords.word_id == word_id, UsersExamplesWords.example_id.in_(user_examples_id))).first()
+        return query.filter(UsersExamplesWords.word_id == word_id).first()
 
 
-def get_word_category(word: str, default='-', url=URL_OXF) -> str:
+# one keep-alive connection pool for all the dictionary requests (instead of a new tls handshake per word)
+oxf_session = requests.Session()
+oxf_session.headers.update({
+    'app_id': APP_ID_OXF,
+    'app_key': APP_KEY_OXF
+})
+oxf_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=OXF_POOL_SIZE))
+# word -> category, in front of the 'categories' table
+# (the no entry answers are kept only in the table, so they expire by OXF_MISS_TTL_DAYS in every process)
+categories_cache = LruCache(maxsize=OXF_CACHE_SIZE)
+NOT_CACHED = object()
+
+
+def get_stored_word_category(word: str):
     """
-    :param word: string word
-    :param default: return it if no find result
+    :param word: string lower word
+    :return: string category | None (no entry) | NOT_CACHED (never asked or the no entry answer is too old)
+    """
+    with session_scope() as s:
+        stored = s.query(WordsCategories).filter(WordsCategories.word == word).first()
+    if not stored:
+        return NOT_CACHED
+    if stored.category is None:
+        miss_age = datetime.date.today() - datetime.date.fromisoformat(stored.update_time[:10])
+        if miss_age.days >= OXF_MISS_TTL_DAYS:
+            return NOT_CACHED
+    return stored.category
+
+
+def store_word_category(word: str, category: str | None):
+    """
+    Saves the dictionary answer for all users
+    :param word: string lower word
+    :param category: string category | None (no entry)
+    """
+    try:
+        with session_scope() as s:
+            s.merge(WordsCategories(word=word, category=category, update_time=str(datetime.datetime.now())))
+    except sqlalchemy.exc.IntegrityError:    # the same word was saved by another thread at the same moment
+        logger.info(f'[{word}]: Category already stored')
+
+
+def word_category_from_answer(word: str, status_code: int, word_data: dict | None, url: str = URL_OXF):
+    """
+    :param word: string lower word
+    :param status_code: integer http status of the oxford api answer
+    :param word_data: json dict of the answer (None if status is not 200)
     :param url: api oxford url
-    :return: string word category by the available parameters
+    :return: string category | None (no entry) | NOT_CACHED (the answer is unknown because of the request error)
     """
-    url += word.lower()
-    headers = {
-        'app_id': APP_ID_OXF,
-        'app_key': APP_KEY_OXF
-    }
-    r = requests.get(url, headers=headers)
-    if r.status_code != 200:
-        logger.warning(f'[{word}]: Requests error '
-                       f'{r.status_code, headers, url} \n {r.text} \n ')
-        return default
-
-    word_data = r.json()
-    if "error" in word_data.keys():
-        logger.warning(f'[{word}]: No entry found that matches the provided data'
-                       f'{r.status_code, headers, url} \n {r.text} \n ')
-        return default
+    if status_code == 404 or (word_data is not None and "error" in word_data.keys()):
+        logger.warning(f'[{word}]: No entry found that matches the provided data {status_code, url}')
+        return None
+    if status_code != 200:
+        logger.warning(f'[{word}]: Requests error {status_code, url}')
+        return NOT_CACHED
 
     # Noun | Verb ... (Part of speech)
-    return word_data["results"][0]["lexicalEntries"][0]["lexicalCategory"]["text"]
+    return word_data["results"][0]["lexicalEntries"][0]["lexicalCategory"]["text"][:20]
 
 
-def update_data(data_type: str, data_id: int, new_data: str):
+def request_word_category(word: str, url: str = URL_OXF):
+    """
+    :param word: string lower word
+    :param url: api oxford url
+    :return: string category | None (no entry) | NOT_CACHED (the answer is unknown because of the request error)
+    """
+    try:
+        r = oxf_session.get(url + word, timeout=OXF_TIMEOUT)
+    except requests.RequestException as e:
+        logger.warning(f'[{word}]: Requests error {e}')
+        return NOT_CACHED
+    return word_category_from_answer(word, r.status_code, r.json() if r.status_code == 200 else None, url=url)
+
+
+def set_word_category(word_id: int, word: str, category: str):
+    """
+    Back-fills the category of the word added with the '-' one
+    (nothing changes if the user has already changed the word)
+    :param word_id: integer id of word
+    :param word: string word as it was added
+    :param category: string category
+    """
+    with session_scope() as s:
+        s.execute(
+            sqlalchemy.update(UsersExamplesWords).where(sqlalchemy.and_(
+                UsersExamplesWords.word_id == word_id,
+                UsersExamplesWords.word == word,
+                UsersExamplesWords.category == '-'
+            )).values(category=category)
+        )
+
+
+def get_words_without_category(after_word_id: int = 0, limit: int = 1000) -> list:
+    """
+    Keyset page of the words with the '-' category, read by ix_words_category only
+    (whether the category is already known is checked by get_stored_words_categories)
+    :param after_word_id: integer word id of the previous page end
+    :param limit: integer maximum count of words
+    :return: list of (word_id, word) ordered by word_id
+    """
+    with session_scope() as s:
+        return s.query(UsersExamplesWords.word_id, UsersExamplesWords.word).filter(
+            UsersExamplesWords.category == '-',
+            UsersExamplesWords.word_id > after_word_id
+        ).order_by(UsersExamplesWords.word_id).limit(limit).all()
+
+
+def get_word_category(word: str, default='-', url=URL_OXF) -> str:
+    """
+    Looks the word up in memory, then in the 'categories' table and only then asks the oxford api
+    (the no entry answers are cached too, the request errors are not)
+    :param word: string word
+    :param default: return it if no find result
+    :param url: api oxford url
+    :return: string word category by the available parameters
+    """
+    word = word.strip().lower()
+    category = categories_cache.get(word, NOT_CACHED)
+    if category is NOT_CACHED:
+        category = get_stored_word_category(word)
+        if category is NOT_CACHED:
+            category = request_word_category(word, url=url)
+            if category is NOT_CACHED:
+                return default
+            store_word_category(word, category)
+        if category is not None:
+            categories_cache.put(word, category)
+    return category if category is not None else default
+
+
+def get_stored_words_categories(words: list) -> dict:
+    """
+    Bulk variant of the category lookup without the oxford api: memory, then one query to the 'categories' table
+    :param words: list of string words
+    :return: dict {lower word: string category | None (no entry)} of the known words only
+    """
+    known, missing = {}, set()
+    for word in {w.strip().lower() for w in words}:
+        category = categories_cache.get(word, NOT_CACHED)
+        if category is NOT_CACHED:
+            missing.add(word)
+        else:
+            known[word] = category
+    if missing:
+        with session_scope() as s:
+            stored_categories = s.query(WordsCategories).filter(WordsCategories.word.in_(missing)).all()
+        for stored in stored_categories:
+            if stored.category is None:
+                miss_age = datetime.date.today() - datetime.date.fromisoformat(stored.update_time[:10])
+                if miss_age.days >= OXF_MISS_TTL_DAYS:
+                    continue
+            known[stored.word] = stored.category
+            if stored.category is not None:
+                categories_cache.put(stored.word, stored.category)
+    return known
+
+
+def update_data(data_type: str, data_id: int, new_data: str, category: str = None):
     """
     Update data to new values
     :param data_type: 'word' / 'description' / 'example'
     :param data_id: integer id of data
     :param new_data: string new data
+    :param category: string new word category (None - look it up now)
     """
     if data_type == 'word':
         word = get_word(word_id=data_id)
         word.word = new_data
-        word.category = get_word_category(word=new_data)
+        word.category = get_word_category(word=new_data) if category is None else category
         session.add(word)
+        user_id = get_example(example_id=word.example_id).user_id
     elif data_type == 'description':
         word = get_word(word_id=data_id)
         word.description = new_data
         session.add(word)
+        user_id = get_example(example_id=word.example_id).user_id
     elif data_type == 'example':
         example = get_example(example_id=data_id)
         example.example = new_data
         session.add(example)
+        user_id = example.user_id
+        touch_examples_words(session, [data_id])
     else:
         raise ValueError(f'TypeError can only work with "word", "description", "example" (not "{data_type}")')
+    bump_data_version(user_id)
     session.commit()
 
 
@@ -842,22 +1858,390 @@ def delete_data(data_type: str, data_id: int):
     if data_type in ('word', 'description'):
         word = get_word(word_id=data_id)
         word_example = get_example(example_id=word.example_id)
+        user_id = word_example.user_id
+        words_ids = [word.word_id]
         session.delete(word)
         if len(word_example.words) == 0:
             session.delete(word_example)
     elif data_type == 'example':
         example = get_example(example_id=data_id)
+        user_id = example.user_id
         words = example.words
+        words_ids = [word.word_id for word in words]
         for word in words:
             session.delete(word)
         session.delete(example)
     else:
         raise ValueError(f'TypeError can only work with "word", "description", "example" (not "{data_type}")')
+    add_deleted_words(session, user_id, words_ids)
+    bump_data_version(user_id)
     session.commit()
 
 
 ########################################################################################################################
 # api.py
+class ApiUser:
+    """
+    Owner of the api key kept in the api keys cache (it is not bound to any db session)
+    """
+    __slots__ = ('user_id', 'tg_id', 'nickname')
+
+    def __init__(self, user_id: int, tg_id: str, nickname: str):
+        self.user_id = user_id
+        self.tg_id = tg_id
+        self.nickname = nickname
+
+
+# token -> (expiration time, ApiUser)
+# the api and the bot are different processes, so the keys changed by the bot reach the api cache after the ttl
+api_keys_cache = LruCache(maxsize=API_KEYS_CACHE_SIZE)
+
+
+def get_api_user(token: str) -> ApiUser:
+    """
+    Takes the key owner from the cache, from the db (one query) only on the cache miss | expiration
+    (the cache lives in every api process and expires only by API_KEYS_CACHE_TTL: keys are never deleted by the bot,
+    the unknown keys are not cached, so a key deleted from the table by hand works until its cache entry expires)
+    :param token: string user api key
+    :return: ApiUser object
+    :raise: LookupError if there is no such key
+    """
+    cached = api_keys_cache.get(token)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    row = session.query(Users.user_id, Users.tg_id, Users.nickname).join(
+        UsersApiKeys, UsersApiKeys.user_id == Users.user_id
+    ).filter(UsersApiKeys.key == token).first()
+    if not row:
+        api_keys_cache.pop(token)
+        raise LookupError('There is no user with this api key')
+    api_user = ApiUser(user_id=row.user_id, tg_id=row.tg_id, nickname=row.nickname)
+    api_keys_cache.put(token, (time.monotonic() + API_KEYS_CACHE_TTL, api_user))
+    return api_user
+
+
+def get_user_words_page(user_id: int, since_word_id: int = 0, limit: int = 100, updated_since: str = None) -> list:
+    """
+    Keyset page of the user words: the next page starts after the last word_id of the previous one,
+    so every page costs the same (the user examples by ix_examples_user_id -> their words by example_id)
+    :param user_id: integer user id
+    :param since_word_id: integer word id - only the words after it are returned
+    :param limit: integer maximum count of words
+    :param updated_since: string time (now_time format) - only the words added | changed since it are returned
+    (the change of the example changes its words too)
+    :return: list of dicts with word_id, word, description, category, rating, example_id, example, update_time
+    """
+    query = session.query(
+        UsersExamplesWords.word_id,
+        UsersExamplesWords.word,
+        UsersExamplesWords.description,
+        UsersExamplesWords.category,
+        UsersExamplesWords.rating,
+        UsersExamplesWords.example_id,
+        UsersExamples.example,
+        UsersExamplesWords.update_time,
+    ).join(UsersExamples, UsersExamples.ex_id == UsersExamplesWords.example_id).filter(
+        UsersExamples.user_id == user_id,
+        UsersExamplesWords.word_id > since_word_id
+    )
+    if updated_since is not None:
+        query = query.filter(UsersExamplesWords.update_time >= updated_since)
+    return [dict(i._mapping) for i in query.order_by(UsersExamplesWords.word_id).limit(limit)]
+
+
+def get_deleted_words_ids(user_id: int, deleted_since: str) -> list:
+    """
+    :param user_id: integer user id
+    :param deleted_since: string time (now_time format)
+    :return: list of integer ids of the user words deleted since the time
+    """
+    return [i for i, in session.query(DeletedWords.word_id).filter(
+        DeletedWords.user_id == user_id,
+        DeletedWords.delete_time >= deleted_since
+    ).order_by(DeletedWords.word_id)]
+
+
+def add_deleted_words(work_session, user_id: int, words_ids: list):
+    """
+    Remembers the deleted words for the api delta sync (in the transaction of the deletion)
+    :param work_session: sqlalchemy session of the transaction
+    :param user_id: integer user id
+    :param words_ids: list of integer ids of the deleted words
+    """
+    if not words_ids:
+        return
+    # mysql may give the id of the deleted last word again after the restart, so the old record is replaced
+    work_session.execute(sqlalchemy.delete(DeletedWords).where(
+        DeletedWords.word_id.in_(words_ids)).execution_options(synchronize_session=False))
+    delete_time = now_time()
+    work_session.execute(sqlalchemy.insert(DeletedWords), [
+        {'word_id': i, 'user_id': user_id, 'delete_time': delete_time} for i in words_ids
+    ])
+
+
+def touch_examples_words(work_session, examples_ids: list):
+    """
+    Sets the new update_time of the words of the changed examples (every word carries its example text)
+    :param work_session: sqlalchemy session of the transaction
+    :param examples_ids: list of integer ex_id
+    """
+    if examples_ids:
+        work_session.execute(
+            sqlalchemy.update(UsersExamplesWords).where(UsersExamplesWords.example_id.in_(examples_ids)).values(
+                update_time=now_time()).execution_options(synchronize_session=False)
+        )
+
+
+def get_user_examples_ids(work_session, user_id: int, examples: list) -> dict:
+    """
+    :param work_session: sqlalchemy session of the transaction
+    :param user_id: integer user id
+    :param examples: list of string examples
+    :return: dict {string example: integer ex_id} of the user examples among them
+    """
+    if not examples:
+        return {}
+    return dict(work_session.query(UsersExamples.example, UsersExamples.ex_id).filter(
+        UsersExamples.user_id == user_id,
+        UsersExamples.example.in_(set(examples))
+    ).all())
+
+
+def get_user_ids(work_session, user_id: int, model, ids: list) -> dict:
+    """
+    :param work_session: sqlalchemy session of the transaction
+    :param user_id: integer user id
+    :param model: UsersExamples | UsersExamplesWords
+    :param ids: list of integer ex_id | word_id
+    :return: dict {integer id: integer ex_id} of the ids that belong to the user
+    """
+    if not ids:
+        return {}
+    if model is UsersExamples:
+        return {i: i for i, in work_session.query(UsersExamples.ex_id).filter(
+            UsersExamples.user_id == user_id,
+            UsersExamples.ex_id.in_(set(ids))
+        )}
+    return dict(work_session.query(UsersExamplesWords.word_id, UsersExamplesWords.example_id).join(
+        UsersExamples, UsersExamples.ex_id == UsersExamplesWords.example_id
+    ).filter(
+        UsersExamples.user_id == user_id,
+        UsersExamplesWords.word_id.in_(set(ids))
+    ).all())
+
+
+def delete_empty_examples(work_session, examples_ids: set):
+    """
+    Deletes the examples left without words (as delete_data does)
+    """
+    if examples_ids:
+        work_session.execute(
+            sqlalchemy.delete(UsersExamples).where(sqlalchemy.and_(
+                UsersExamples.ex_id.in_(examples_ids),
+                ~sqlalchemy.exists().where(UsersExamplesWords.example_id == UsersExamples.ex_id)
+            )).execution_options(synchronize_session=False)
+        )
+
+
+def bulk_add_examples(user_id: int, examples: list) -> list:
+    """
+    Adds the examples in one transaction (one insert for all new ones), the already added examples are returned as is
+    :param user_id: integer user id
+    :param examples: list of string examples (already validated)
+    :return: list of dicts {'ex_id', 'example', 'user_id'} in the same order
+    """
+    with session_scope() as s:
+        examples_ids = get_user_examples_ids(s, user_id, examples)
+        new_examples = list(dict.fromkeys(i for i in examples if i not in examples_ids))
+        if new_examples:
+            s.execute(sqlalchemy.insert(UsersExamples), [{'example': i, 'user_id': user_id} for i in new_examples])
+            examples_ids.update(get_user_examples_ids(s, user_id, new_examples))
+            bump_data_version(user_id, s)
+    logger.info(f'[{user_id}]: {len(new_examples)} of {len(examples)} examples added')
+    return [{'ex_id': examples_ids[i], 'example': i, 'user_id': user_id} for i in examples]
+
+
+def bulk_update_examples(user_id: int, examples: list) -> list:
+    """
+    Updates the examples in one transaction (one executemany)
+    :param user_id: integer user id
+    :param examples: list of dicts {'ex_id', 'example'} (already validated)
+    :return: list of dicts {'ex_id', 'example', 'user_id'} | {'error'} in the same order
+    """
+    with session_scope() as s:
+        owned = get_user_ids(s, user_id, UsersExamples, [i['ex_id'] for i in examples])
+        to_update = [i for i in examples if i['ex_id'] in owned]
+        if to_update:
+            s.execute(
+                sqlalchemy.update(UsersExamples).where(UsersExamples.ex_id == sqlalchemy.bindparam('b_ex_id')).values(
+                    example=sqlalchemy.bindparam('b_example')).execution_options(synchronize_session=False),
+                [{'b_ex_id': i['ex_id'], 'b_example': i['example']} for i in to_update]
+            )
+            touch_examples_words(s, [i['ex_id'] for i in to_update])
+            bump_data_version(user_id, s)
+    logger.info(f'[{user_id}]: {len(to_update)} of {len(examples)} examples updated')
+    return [
+        {'ex_id': i['ex_id'], 'example': i['example'], 'user_id': user_id} if i['ex_id'] in owned
+        else {'ex_id': i['ex_id'], 'error': 'There is no example with this id among yours'}
+        for i in examples
+    ]
+
+
+def bulk_delete_examples(user_id: int, examples_ids: list) -> list:
+    """
+    Deletes the examples with all their words in one transaction
+    :param user_id: integer user id
+    :param examples_ids: list of integer ex_id
+    :return: list of dicts {'ex_id', 'success'} | {'ex_id', 'error'} in the same order
+    """
+    with session_scope() as s:
+        owned = get_user_ids(s, user_id, UsersExamples, examples_ids)
+        if owned:
+            add_deleted_words(s, user_id, [i for i, in s.query(UsersExamplesWords.word_id).filter(
+                UsersExamplesWords.example_id.in_(owned))])
+            s.execute(sqlalchemy.delete(UsersExamplesWords).where(
+                UsersExamplesWords.example_id.in_(owned)).execution_options(synchronize_session=False))
+            s.execute(sqlalchemy.delete(UsersExamples).where(
+                UsersExamples.ex_id.in_(owned)).execution_options(synchronize_session=False))
+            bump_data_version(user_id, s)
+    logger.info(f'[{user_id}]: {len(owned)} of {len(examples_ids)} examples deleted')
+    return [
+        {'ex_id': i, 'success': 'Your data has been successfully deleted'} if i in owned
+        else {'ex_id': i, 'error': 'There is no example with this id among yours'}
+        for i in examples_ids
+    ]
+
+
+def bulk_add_words(user_id: int, words: list, without_category: list = None) -> list:
+    """
+    Adds the words in one transaction: the examples given by text are added first (one insert),
+    then all new words (one insert), the already added words are returned as is.
+    Categories are taken from memory | the 'categories' table at once, the unknown ones are left '-'
+    for the category worker
+    :param user_id: integer user id
+    :param words: list of dicts {'word', 'description', 'ex_id' | 'example'} (already validated)
+    :param without_category: list - (word_id, word) of the new words left with '-' are appended to it
+    :return: list of dicts {'word_id', 'word', 'description', 'example_id'} | {'error'} in the same order
+    """
+    categories = get_stored_words_categories([i['word'] for i in words])
+    with session_scope() as s:
+        owned = get_user_ids(s, user_id, UsersExamples, [i['ex_id'] for i in words if 'ex_id' in i])
+        examples_ids = get_user_examples_ids(s, user_id, [i['example'] for i in words if 'ex_id' not in i])
+        new_examples = list(dict.fromkeys(i['example'] for i in words if 'ex_id' not in i and
+                                          i['example'] not in examples_ids))
+        if new_examples:
+            s.execute(sqlalchemy.insert(UsersExamples), [{'example': i, 'user_id': user_id} for i in new_examples])
+            examples_ids.update(get_user_examples_ids(s, user_id, new_examples))
+
+        items = [
+            (i, i['ex_id'] if 'ex_id' in i else examples_ids[i['example']])
+            for i in words
+        ]
+        items_examples_ids = {ex_id for i, ex_id in items if 'ex_id' not in i or ex_id in owned}
+
+        def existing_words():
+            return {
+                (i.word, i.description, i.example_id): i.word_id
+                for i in s.query(
+                    UsersExamplesWords.word_id,
+                    UsersExamplesWords.word,
+                    UsersExamplesWords.description,
+                    UsersExamplesWords.example_id
+                ).filter(UsersExamplesWords.example_id.in_(items_examples_ids))
+            } if items_examples_ids else {}
+
+        words_ids = existing_words()
+        new_words = {}
+        for i, ex_id in items:
+            key = (i['word'], i['description'], ex_id)
+            if ex_id in items_examples_ids and key not in words_ids and key not in new_words:
+                category = categories.get(i['word'].strip().lower())
+                new_words[key] = {
+                    'word': i['word'], 'description': i['description'], 'category': category or '-', 'rating': 0,
+                    'example_id': ex_id
+                }
+        if new_words:
+            s.execute(sqlalchemy.insert(UsersExamplesWords), list(new_words.values()))
+            words_ids = existing_words()
+            if without_category is not None:
+                without_category.extend(
+                    (words_ids[key], i['word']) for key, i in new_words.items() if i['category'] == '-')
+        if new_words or new_examples:
+            bump_data_version(user_id, s)
+    logger.info(f'[{user_id}]: {len(new_words)} of {len(words)} words added')
+    return [
+        {'word_id': words_ids[(i['word'], i['description'], ex_id)], 'word': i['word'],
+         'description': i['description'], 'example_id': ex_id} if ex_id in items_examples_ids
+        else {'ex_id': ex_id, 'error': 'There is no example with this id among yours'}
+        for i, ex_id in items
+    ]
+
+
+def bulk_update_words(user_id: int, words: list) -> list:
+    """
+    Updates the words in one transaction (one executemany), the changed words get the known category | '-'
+    :param user_id: integer user id
+    :param words: list of dicts {'word_id', 'word', 'description'} (already validated)
+    :return: list of dicts {'word_id', 'word', 'description', 'example_id'} | {'error'} in the same order
+    """
+    categories = get_stored_words_categories([i['word'] for i in words])
+    with session_scope() as s:
+        owned = get_user_ids(s, user_id, UsersExamplesWords, [i['word_id'] for i in words])
+        to_update = [i for i in words if i['word_id'] in owned]
+        if to_update:
+            s.execute(
+                sqlalchemy.update(UsersExamplesWords).where(
+                    UsersExamplesWords.word_id == sqlalchemy.bindparam('b_word_id')
+                ).ordered_values(    # mysql sees the new word in the next assignments, so the category goes first
+                    (UsersExamplesWords.category, sqlalchemy.case(
+                        (UsersExamplesWords.word == sqlalchemy.bindparam('b_word'), UsersExamplesWords.category),
+                        else_=sqlalchemy.bindparam('b_category')
+                    )),
+                    (UsersExamplesWords.word, sqlalchemy.bindparam('b_word')),
+                    (UsersExamplesWords.description, sqlalchemy.bindparam('b_description')),
+                ).execution_options(synchronize_session=False),
+                [
+                    {
+                        'b_word_id': i['word_id'], 'b_word': i['word'], 'b_description': i['description'],
+                        'b_category': categories.get(i['word'].strip().lower()) or '-'
+                    }
+                    for i in to_update
+                ]
+            )
+            bump_data_version(user_id, s)
+    logger.info(f'[{user_id}]: {len(to_update)} of {len(words)} words updated')
+    return [
+        {'word_id': i['word_id'], 'word': i['word'], 'description': i['description'],
+         'example_id': owned[i['word_id']]} if i['word_id'] in owned
+        else {'word_id': i['word_id'], 'error': 'There is no word with this id among yours'}
+        for i in words
+    ]
+
+
+def bulk_delete_words(user_id: int, words_ids: list) -> list:
+    """
+    Deletes the words in one transaction, the examples left without words are deleted too
+    :param user_id: integer user id
+    :param words_ids: list of integer word_id
+    :return: list of dicts {'word_id', 'success'} | {'word_id', 'error'} in the same order
+    """
+    with session_scope() as s:
+        owned = get_user_ids(s, user_id, UsersExamplesWords, words_ids)
+        if owned:
+            s.execute(sqlalchemy.delete(UsersExamplesWords).where(
+                UsersExamplesWords.word_id.in_(owned)).execution_options(synchronize_session=False))
+            add_deleted_words(s, user_id, list(owned))
+            delete_empty_examples(s, set(owned.values()))
+            bump_data_version(user_id, s)
+    logger.info(f'[{user_id}]: {len(owned)} of {len(words_ids)} words deleted')
+    return [
+        {'word_id': i, 'success': 'Your data has been successfully deleted'} if i in owned
+        else {'word_id': i, 'error': 'There is no word with this id among yours'}
+        for i in words_ids
+    ]
+
+
 def generate_api_keys(user: Users):
     """
     Create new api-key to user
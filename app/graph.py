@@ -0,0 +1,112 @@
+"""
+Rendering of the user statistic graph.
+The module has no db | telegram imports, so it is cheap to import in the graph worker processes
+"""
+import hashlib
+import io
+import json
+import logging
+import sys
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg    # non-interactive backend, no gui | display needed
+from matplotlib.figure import Figure
+
+
+########################################################################################################################
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format='[%(asctime)s]:[%(levelname)s]:[%(filename)s]:[%(lineno)d]: %(message)s',
+    )
+
+
+########################################################################################################################
+def graph_key(days, total, mistakes, first_try) -> str:
+    """
+    :return: string hash of the graph data - equal data gives equal graphs
+    """
+    return hashlib.sha1(json.dumps([days, total, mistakes, first_try]).encode()).hexdigest()
+
+
+def build_graph(user_id: str | int, days, total, mistakes, first_try) -> bytes:
+    """
+    The function builds a graph from the received arrays and returns a png graph image
+    :param user_id: user_id use for logs
+    :param days: array with text data as example ['M', 'T', 'W']
+    :param total: array with first graph data. Ex:[10, 12, 6]
+    :param mistakes: array with second graph data Ex:[2, 0, 6]
+    :param first_try: array with third graph data Ex:[8, 12, 6]
+    :return: png image bytes (rendered in memory, no files)
+    """
+    logger.info(f'[{user_id}]: Start build graph with: \n\n{days}\n{total}\n{mistakes}\n{first_try}\n')
+
+    # object-oriented figure: not registered in pyplot, so nothing stays in memory after the call
+    picture = Figure(
+        figsize=(6.4, 4.8),
+        dpi=100,
+        facecolor='#1e262c',
+        edgecolor='#1e262c'
+    )
+    FigureCanvasAgg(picture)
+    graph = picture.add_subplot(1, 1, 1)
+
+    graph.grid(
+        visible=True,
+        which='major',
+        axis='both',
+        alpha=0.1,
+        antialiased=True,
+        dash_capstyle='butt'
+    )
+
+    graph.set_facecolor('#1e262c')
+
+    graph.tick_params(
+        axis='both',
+        color='#1e262c',
+        labelcolor='#c4c9cd'
+    )
+    graph.spines['bottom'].set_color('#1e262c')
+    graph.spines['top'].set_color('#1e262c')
+    graph.spines['right'].set_color('#1e262c')
+    graph.spines['left'].set_color('#1e262c')
+
+    graph.fill_between(
+        days, mistakes,
+        color='#43c4e3',
+        alpha=0.10
+    )
+    graph.fill_between(
+        days, first_try,
+        color='#43c4e3',
+        alpha=0.15
+    )
+    graph.fill_between(
+        days, total,
+        color='#43c4e3',
+        alpha=0.20
+    )
+
+    graph.plot(
+        days, total,
+        color='#43c4e3',
+        solid_capstyle='round',
+        linestyle='solid',
+        marker='.',
+        markerfacecolor='white',
+        markersize=4,
+        linewidth=1.5)
+
+    if total == [0] * 7:    # Display without negative numbers on the score axis
+        graph.plot(
+            days, [0] * 6 + [30],
+            linewidth=0)
+
+    buffer = io.BytesIO()
+    try:
+        picture.savefig(buffer, format='png')
+    finally:
+        picture.clear()
+    logger.info(f'[{user_id}]: Graph successfully rendered ({buffer.tell()} bytes)')
+    return buffer.getvalue()
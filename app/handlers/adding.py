@@ -1,4 +1,6 @@
+import io
 import logging
+import os
 import sys
 
 from aiogram import Dispatcher, types
@@ -8,9 +10,8 @@ from aiogram.utils.markdown import text, bold, italic
 from aiogram.utils.emoji import emojize
 from aiogram.types import ParseMode, ChatActions
 from aiogram.dispatcher.filters import Text
-from config.config import URL_OXF
 
-from .. import db_worker
+from .. import async_db_worker, category_worker, lesson_prefetch
 
 
 ########################################################################################################################
@@ -33,6 +34,17 @@ class AddingData(StatesGroup):
     waiting_for_next_move = State()
 
 
+class ImportData(StatesGroup):
+    """
+    Stateful class for waiting the file with words
+    """
+    waiting_for_file = State()
+
+
+IMPORT_FILE_TYPES = {'.xlsx', '.json', '.xml', '.csv'}
+IMPORT_MAX_FILE_SIZE = 20 * 1024 * 1024    # telegram does not give the bot bigger files
+
+
 ########################################################################################################################
 async def add_cmd(message: types.Message, state: FSMContext):
     """
@@ -253,25 +265,23 @@ async def ms_get_description_write_data_to_sql(message: types.Message, state: FS
     word = data.get('current_word')
     description = data.get('current_description')
 
-    db_worker.pending_rollback(username=message.from_user.username)
-
-    category = db_worker.get_word_category(
-        word=word,
-        default='-',
-        url=URL_OXF
-    )
+    # known category at once, otherwise '-' and the category worker back-fills it later
+    category = category_worker.cached_category(word=word, default='-')
     # work with sql tables 'examples' -> 'words'
-    user_example = db_worker.add_example(
+    user_example = await async_db_worker.add_example(
         example_text=example,
         user_tg_id=str(message.from_user.id)
     )
-    user_word = db_worker.add_word(
+    user_word = await async_db_worker.add_word(
         word=word,
         description=description,
         category=category,
         rating=0,
         example=user_example,
     )
+    if category == '-':
+        category_worker.resolve(word_id=user_word.word_id, word=word)
+    lesson_prefetch.invalidate(str(message.from_user.id))
 
     # finish, but saving data (we need last_example in the future)
     await state.update_data(last_example=example,     # told you about the switching
@@ -327,6 +337,91 @@ async def cb_cancel(call: types.CallbackQuery, state: FSMContext):
     await state.reset_state(with_data=False)
 
 
+async def import_cmd(message: types.Message, state: FSMContext):
+    """
+    0 action
+        send instruction to user
+    """
+    username = message.from_user.username
+    logger.info(f'[{username}]: Start /import command')
+    await state.reset_state(with_data=False)
+
+    answer = text(
+        emojize(r':inbox_tray: Send me a file with your words'), italic('(xlsx, json, xml or csv).'), '\n',
+        '\n',
+        r'The files made by /data fit as they are\, csv can also have just three columns\: '
+        r'word\, description\, example\.', '\n',
+        r'The words that are already added are skipped\.'
+    )
+    remove_keyboard = types.ReplyKeyboardRemove()
+    await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=remove_keyboard)
+
+    logger.info(f'[{username}]: Jump to file input')
+    await ImportData.waiting_for_file.set()
+
+
+async def ms_get_file_import_words(message: types.Message, state: FSMContext):
+    """
+    1 action
+        get file from user
+        add its words to sql tables by batches
+        send the result
+    """
+    username = message.from_user.username
+    document = message.document
+    file_type = os.path.splitext(document.file_name or '')[1].lower() if document else None
+    logger.info(f'[{username}]: Send file {document.file_name if document else None}')
+
+    if file_type not in IMPORT_FILE_TYPES:
+        answer = text(
+            emojize(':police_car: I need a file'), italic(f'({" | ".join(sorted(IMPORT_FILE_TYPES))})'),
+            r'\. Try again\, or use /cancel')
+        await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2)
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_FILE_SIZE:
+        answer = text(
+            emojize(':police_car: The file is too big'), italic('(max 20 MB)'), r'\. Try to split it')
+        await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2)
+        return
+
+    answer = text(
+        r'Adding your words to the database \- this may take some time', emojize(':hourglass_flowing_sand:'))
+    await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2)
+    await message.bot.send_chat_action(message.from_user.id, ChatActions.TYPING)
+
+    try:
+        file = io.BytesIO()
+        await document.download(destination_file=file)
+        result = await async_db_worker.import_user_words(
+            user_tg_id=str(message.from_user.id),
+            file_type=file_type[1:],
+            file=file
+        )
+    except Exception as e:
+        logger.error(f'[{username}]: Houston, we have got a problem {e, document.file_name}')
+        answer = text(
+            emojize(":man_mechanic:"), r"There was a big trouble when reading your file\, "
+                                       r"check that it is made as the /data files and try again\.")
+        await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2)
+        return
+
+    lesson_prefetch.invalidate(str(message.from_user.id))
+    for word_id, word in result.pop('without_category'):
+        category_worker.resolve(word_id=word_id, word=word)
+
+    answer = text(
+        bold('Done!'), emojize(':cake:'), '\n',
+        bold('\n\tAdded'), ' : ', italic(f'{result["added"]}'),
+        bold('\n\tAlready added'), ' : ', italic(f'{result["repeated"]}'),
+        bold('\n\tWrong'), ' : ', italic(f'{result["wrong"]}'), '\n',
+        '\n',
+        r'Wrong words are too long \| too short or have no word\, description or example\.'
+    )
+    await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2)
+    logger.info(f'[{username}]: Finish words import {result}')
+    await state.reset_state(with_data=False)
+
+
 ########################################################################################################################
 def register_adding_handlers(dp: Dispatcher):
     """
@@ -371,3 +466,8 @@ def register_adding_handlers(dp: Dispatcher):
         Text(equals='call_add'),
         state=AddingData.waiting_for_next_move
     )
+
+    dp.register_message_handler(import_cmd, commands=['import'], state='*')
+    dp.register_message_handler(ms_get_file_import_words,
+                                content_types=types.ContentTypes.ANY,
+                                state=ImportData.waiting_for_file)
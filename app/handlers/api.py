@@ -11,7 +11,7 @@ from aiogram.utils.emoji import emojize
 from aiogram.types import ParseMode, ChatActions
 from config.config import ADMIN_ID_TG, HOST, PORT
 
-from .. import db_worker
+from .. import async_db_worker
 
 
 ########################################################################################################################
@@ -42,11 +42,9 @@ async def api_cmd(message: types.Message, state: FSMContext):
     logger.info(fr'[{username}]: Start /api command')
     await state.reset_state(with_data=False)
 
-    db_worker.pending_rollback(username=message.from_user.username)
-
     try:
-        sql_user = db_worker.get_user(tg_id=message.from_user.id)
-        is_api = db_worker.is_api_keys(
+        sql_user = await async_db_worker.get_user(tg_id=message.from_user.id)
+        is_api = await async_db_worker.is_api_keys(
             user=sql_user
         )
     except Exception as e:
@@ -192,11 +190,9 @@ async def ms_get_phone_sql_admin_send(message: types.Message, state: FSMContext)
     phone_number = data.get('phone')
     purpose = data.get('purpose')
 
-    db_worker.pending_rollback(username=message.from_user.username)
-
     try:
-        sql_user = db_worker.get_user(tg_id=message.from_user.id)
-        db_worker.generate_api_keys(
+        sql_user = await async_db_worker.get_user(tg_id=message.from_user.id)
+        await async_db_worker.generate_api_keys(
             user=sql_user
         )
     except Exception as e:
@@ -208,22 +204,23 @@ async def ms_get_phone_sql_admin_send(message: types.Message, state: FSMContext)
         return
 
     try:
+        api_key = await async_db_worker.get_user_api_key(user=sql_user)
         answer = text(
             bold('API private key request'), '\n',
             r'Phone\:', code(f' {phone_number}'), '\n',
             r'Purpose\:', italic(f' {purpose}'), '\n',
-            r'Key to send\:', code(f' {db_worker.get_user_api_key(user=sql_user)}'), '\n',
+            r'Key to send\:', code(f' {api_key}'), '\n',
         )
         await message.bot.send_message(ADMIN_ID_TG, answer, parse_mode=ParseMode.MARKDOWN_V2)
     except PendingRollbackError as e:
         try:
             logger.error(f'[{username}]: Connection with db died {e}. Try to reconnect...')
-            db_worker.session.rollback()
+            api_key = await async_db_worker.get_user_api_key(user=sql_user)    # worker session is already rolled back
             answer = text(
                 bold('API private key request'), '\n',
                 r'Phone\:', code(f' {phone_number}'), '\n',
                 r'Purpose\:', italic(f' {purpose}'), '\n',
-                r'Key to send\:', code(f' {db_worker.get_user_api_key(user=sql_user)}'), '\n',
+                r'Key to send\:', code(f' {api_key}'), '\n',
             )
             await message.bot.send_message(ADMIN_ID_TG, answer, parse_mode=ParseMode.MARKDOWN_V2)
         except Exception as e:
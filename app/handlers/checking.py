@@ -1,6 +1,5 @@
 import logging
 import sys
-import os
 
 from aiogram import Dispatcher, types
 from aiogram.dispatcher import FSMContext
@@ -9,7 +8,7 @@ from aiogram.utils.markdown import text, bold, italic
 from aiogram.utils.emoji import emojize
 from aiogram.types import ParseMode, ChatActions
 
-from .. import db_worker
+from .. import async_db_worker
 
 
 ########################################################################################################################
@@ -171,8 +170,6 @@ async def ms_get_file_type_send_data(message: types.Message, state: FSMContext):
     remove_keyboard = types.ReplyKeyboardRemove()
     await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=remove_keyboard)
 
-    db_worker.pending_rollback(username=message.from_user.username)
-
     for file_type_answer in answers:
         await message.bot.send_chat_action(message.from_user.id, ChatActions.UPLOAD_DOCUMENT)
         if file_type_answer not in possible_answers:
@@ -190,9 +187,8 @@ async def ms_get_file_type_send_data(message: types.Message, state: FSMContext):
             file_type = possible_answers[file_type_answer]
             logger.info(f'[{username}]: Start working on a file with user data {file_type, filter_key, sort_key}')
             try:
-                document = db_worker.create_file_with_user_words(
+                document = await async_db_worker.get_user_words_file(
                     user_tg_id=str(message.from_user.id),
-                    file_path='temporary',
                     file_type=file_type,
                     sql_filter_key=filter_key,
                     sql_sort_key=sort_key
@@ -208,18 +204,16 @@ async def ms_get_file_type_send_data(message: types.Message, state: FSMContext):
                     answer = text(
                         r"Done\, here are your words\, enjoy", emojize(":cake:"))
                     await message.answer_document(
-                        document=types.InputFile(document),
+                        document=types.InputFile(document, filename=document.name),
                         caption=answer,
                         parse_mode=ParseMode.MARKDOWN_V2
                     )
                 except Exception as e:
-                    logger.error(f'[{username}]: Houston, we have got a problem {e, document}')
+                    logger.error(f'[{username}]: Houston, we have got a problem {e, document.name}')
                     answer = text(
                         emojize(":man_mechanic:"), r"There was a big trouble when sending your document\, "
                                                             r"please try again and then write to the administrator\.")
                     await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2)
-                finally:
-                    os.remove(document)
 
     logger.info(f'[{username}]: Finish data files sending')
     await state.reset_state(with_data=False)
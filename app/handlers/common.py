@@ -9,7 +9,7 @@ from aiogram.utils.emoji import emojize
 from aiogram.utils.markdown import text, bold, italic
 from aiogram.types import ParseMode, ChatActions
 
-from .. import db_worker
+from .. import async_db_worker, broadcast
 
 
 ########################################################################################################################
@@ -30,9 +30,7 @@ async def start_cmd(message: types.Message, state: FSMContext):
     """
     logger.info(f'[{message.from_user.username}]: Use start command')
 
-    db_worker.pending_rollback(username=message.from_user.username)
-
-    if not db_worker.is_user(str(message.from_user.id)):
+    if not await async_db_worker.is_user(str(message.from_user.id)):
         logger.info(f'[{message.from_user.username}]: adding new user to "users" table...')
         await message.bot.send_chat_action(message.from_user.id, ChatActions.TYPING)
         sql_nickname = message.from_user.username
@@ -40,16 +38,16 @@ async def start_cmd(message: types.Message, state: FSMContext):
             sql_nickname = f'user{message.from_user.id}'
             logger.warning(f'[{message.from_user.username}]: no username use {sql_nickname} instead')
         now = str(datetime.date.today())
-        db_worker.add_user(tg_id=str(message.from_user.id),
-                           nickname=sql_nickname,
-                           lang_code=message.from_user.language_code,
-                           shock_mode=0,
-                           points=0,
-                           is_blacklisted=False,
-                           is_bot=bool(message.from_user.is_bot),
-                           creation_time=now,
-                           last_use_time=now,
-                           current_use_time=now)
+        await async_db_worker.add_user(tg_id=str(message.from_user.id),
+                                       nickname=sql_nickname,
+                                       lang_code=message.from_user.language_code,
+                                       shock_mode=0,
+                                       points=0,
+                                       is_blacklisted=False,
+                                       is_bot=bool(message.from_user.is_bot),
+                                       creation_time=now,
+                                       last_use_time=now,
+                                       current_use_time=now)
         logger.info(f'[{message.from_user.username}]: New user added to "users" table')
 
     await state.reset_state(with_data=False)
@@ -93,6 +91,7 @@ async def help_cmd(message: types.Message, state: FSMContext):
         '\n',
         emojize(':blue_book: '), italic('Add your words:'), '\n'
         r'/add \- begin the process of adding a new word', '\n',
+        r'/import \- add all words from your file \(xlsx\, json\, xml\, csv\)', '\n',
         '\n',
         emojize(':lower_left_paintbrush: '), italic('Conduct a lesson:'), '\n'
         r'\(shows  an error  if you have less than 15 words\)', '\n',
@@ -163,7 +162,8 @@ async def admin_panel_cmd(message: types.Message, state: FSMContext):
     txt = text(
                 "/admin", italic(" >>> show admin panel"), '\n',
                 "/admin_show_bl", italic(" >>> send current black list"), '\n',
-                "/admintell", italic(" >>> sends to all users everything written after the command")
+                "/admintell", italic(" >>> sends to all users everything written after the command"), '\n',
+                "/admintellstop", italic(" >>> stops sending the /admintell messages")
     )
     remove_keyboard = types.ReplyKeyboardRemove()
     await message.answer(txt, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=remove_keyboard)
@@ -178,9 +178,7 @@ async def admin_show_bl_cmd(message: types.Message, state: FSMContext):
     logger.info(f'[{message.from_user.username}]: Show black list')
     await state.reset_state(with_data=False)
 
-    db_worker.pending_rollback(username=message.from_user.username)
-
-    black_list = db_worker.users_bl_list()
+    black_list = await async_db_worker.users_bl_list()
     if not black_list:
         txt = text(
             'Black list is empty'
@@ -197,31 +195,30 @@ async def admin_tell_users_cmd(message: types.Message, state: FSMContext):
     independent action
         Receives a command and a cue
         Separates the message
-        Announces to all users
+        Starts the announcement to all users in the background (the progress comes as a separate message)
     """
     logger.info(f'[{message.from_user.username}]: Tell users...')
     await state.reset_state(with_data=False)
-    db_worker.pending_rollback(username=message.from_user.username)
 
     speach = fr'{" ".join(message.text.split()[1:])}'
     if not speach:
         await message.answer(r'Message to users must be non-empty. Use /admintell <your message to all users>')
         return
-    users = db_worker.get_users()
-    logger.info(f'[{message.from_user.username}]: \nUsers count: "{len(users)}" \nSpeach to send "{speach}"')
+    broadcast_id = await broadcast.start(bot=message.bot, admin_tg_id=str(message.from_user.id), text=speach)
+    logger.info(f'[{message.from_user.username}]: \nBroadcast "{broadcast_id}" \nSpeach to send "{speach}"')
+    await message.answer(f'Broadcast {broadcast_id} is started. Use /admintellstop to stop it')
 
-    for user in users:
-        try:
-            await message.bot.send_message(
-                chat_id=user.tg_id,
-                text=speach,
-            )
-        except Exception as e:
-            logger.error(f'[{user.nickname}]: Houston, we have got a problem {e}')
-        finally:
-            logger.error(f'[{user.nickname}]: Notified successfully')
 
-    logger.info(f'[{message.from_user.username}]: Told users.')
+async def admin_tell_stop_cmd(message: types.Message, state: FSMContext):
+    """
+    independent action
+        Stops all running announcements to users
+    """
+    logger.info(f'[{message.from_user.username}]: Stop telling users...')
+    await state.reset_state(with_data=False)
+
+    count = await broadcast.stop_broadcasts()
+    await message.answer(f'Stopped broadcasts: {count}')
 
 
 ########################################################################################################################
@@ -238,3 +235,5 @@ def register_handlers_common(dp: Dispatcher, admin_id: int):
     dp.register_message_handler(admin_panel_cmd, IDFilter(user_id=admin_id), commands=['admin'], state='*')
     dp.register_message_handler(admin_show_bl_cmd, IDFilter(user_id=admin_id), commands=['adminshowbl'], state='*')
     dp.register_message_handler(admin_tell_users_cmd, IDFilter(user_id=admin_id), commands=['admintell'], state='*')
+    dp.register_message_handler(admin_tell_stop_cmd, IDFilter(user_id=admin_id), commands=['admintellstop'],
+                                state='*')
@@ -10,7 +10,7 @@ from aiogram.utils.emoji import emojize
 from aiogram.types import ParseMode, ChatActions
 from aiogram.dispatcher.filters import Text
 
-from .. import db_worker
+from .. import async_db_worker, lesson_prefetch, lesson_state
 from ..db_worker import MinLenError
 import config
 
@@ -51,10 +51,8 @@ async def lesson_cmd(message: types.Message, state: FSMContext):
 
     await message.bot.send_chat_action(message.from_user.id, ChatActions.TYPING)  # comfortable waiting
 
-    db_worker.pending_rollback(username=message.from_user.username)
-
     try:
-        lesson_data = db_worker.get_lesson_data(str(message.chat.id))
+        lesson_data = await lesson_prefetch.get_lesson_data(str(message.chat.id))
     except MinLenError as e:
         logger.info(f'[{username}]: Not enough words for lesson')
         answer = text(
@@ -107,7 +105,7 @@ async def lesson_cmd(message: types.Message, state: FSMContext):
     await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=inl_keyboard)
 
     await state.update_data(
-        lesson_data=lesson_data,
+        lesson_tasks=lesson_state.pack_lesson(lesson_data),    # only word ids and answer layout
         task_number=0,
         current_task=None,
         lesson_stats=[],
@@ -127,7 +125,7 @@ async def cb_get_task_number_issues_task(call: types.CallbackQuery, state: FSMCo
     await call.message.delete_reply_markup()
     username = call.from_user.username
     data = await state.get_data()
-    lesson_data = data['lesson_data']
+    lesson_tasks = data['lesson_tasks']
     task_number = data['task_number']
     lesson_stats = data['lesson_stats']
     logger.info(f'[{username}]: Lesson {task_number}')
@@ -146,51 +144,26 @@ async def cb_get_task_number_issues_task(call: types.CallbackQuery, state: FSMCo
         await call.message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=remove_keyboard)
         await call.message.bot.send_chat_action(call.from_user.id, ChatActions.TYPING)
 
-        db_worker.pending_rollback(username=call.from_user.username)
-
-        first_try = 0
-        mistakes = 0
-        for word_stat_data in lesson_stats:
-            # total first attempt
-            if word_stat_data['attempts'] == 1:
-                first_try += 1
-            # total mistakes
-            mistakes += word_stat_data['mistakes']
-            # change sql word rating
-            try:
-                db_worker.change_rating(
-                    word_id=word_stat_data['sql_id'],
-                    new_rating=word_stat_data['current_rating']
-                )
-            except KeyError as e:
-                logger.error(f'[{username}]: Sql error {e}')
-            except Exception as e:
-                logger.error(f'[{username}]: Unknown sql error {e}')
-
-        await call.message.bot.send_chat_action(call.from_user.id, ChatActions.TYPING)
+        # total first attempt
+        first_try = sum(1 for word_stat_data in lesson_stats if word_stat_data['attempts'] == 1)
         success_percentage = int((first_try / 15) * 100)
 
-        # daily statistics
+        # word ratings, daily statistics and shock mode in one transaction
         try:
-            db_worker.add_or_change_day_stat(
+            await async_db_worker.finish_lesson(
                 tg_id=str(call.message.chat.id),
-                first_try=first_try,
-                mistakes=mistakes,
-            )
-        except Exception as e:
-            logger.error(f'[{username}]: Unknown sql error {e}')
-
-        # shock mode
-        try:
-            db_worker.change_user_last_using(
-                user_tg_id=str(call.message.chat.id),
-                flag='change'
+                lesson_stats=lesson_stats
             )
         except Exception as e:
             logger.error(f'[{username}]: Unknown sql error {e}')
+            # the ratings are not saved, a lesson built now would repeat the old ratings
+            lesson_prefetch.invalidate(str(call.message.chat.id))
+        else:
+            # new ratings are saved, so the next lesson can be built while the user looks at the result
+            lesson_prefetch.prefetch(str(call.message.chat.id))
 
         await state.update_data(
-            lesson_data=lesson_data,
+            lesson_tasks=lesson_tasks,
             task_number=0,
             current_task=None,
             lesson_stats=[])
@@ -212,7 +185,7 @@ async def cb_get_task_number_issues_task(call: types.CallbackQuery, state: FSMCo
 
     ###########################################
     # user did not finish the lesson
-    current_lesson = lesson_data[task_number]
+    current_lesson = await lesson_state.unpack_task(lesson_tasks[task_number])
     main_correct_word = None
     for w in current_lesson.values():
         if w["is_main"]:
@@ -279,7 +252,7 @@ async def cb_get_task_number_issues_task(call: types.CallbackQuery, state: FSMCo
 
     await state.update_data(
         main_word_stat=statistic_data_main_correct_word,
-        current_task=current_lesson
+        current_task=lesson_tasks[task_number]
     )
 
     if task_flag == 'define the correct word':
@@ -307,7 +280,7 @@ async def ms_get_answer_set_task(message: types.Message, state: FSMContext):
     data = await state.get_data()
     task_number = data['task_number']
     task_type = data['task_type']
-    current_task = data['current_task']
+    current_task = await lesson_state.unpack_task(data['current_task'])
 
     main_word_stat = data['main_word_stat']
     lesson_stats = data['lesson_stats']
@@ -495,23 +468,14 @@ async def cb_get_call_to_add_init_words(call: types.CallbackQuery, state: FSMCon
     await call.message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=remove_keyboard)
     await call.message.bot.send_chat_action(call.from_user.id, ChatActions.TYPING)
 
-    db_worker.pending_rollback(username)
-
     try:
-        for word_data in config.config.INIT_WORDS:
-            user_example = db_worker.add_example(
-                example_text=word_data["example"],
-                user_tg_id=str(call.message.chat.id)
-            )
-            user_word = db_worker.add_word(
-                word=word_data["word"],
-                description=word_data["description"],
-                category=word_data["category"],
-                rating=0,
-                example=user_example,
-            )
-            logger.info(f'[{username}]: >>> {word_data["word"]}')
+        added_count = await async_db_worker.add_init_words(
+            user_tg_id=str(call.message.chat.id),
+            init_words=config.config.INIT_WORDS
+        )
+        logger.info(f'[{username}]: >>> {added_count} init words')
     except Exception as e:
+        lesson_prefetch.invalidate(str(call.message.chat.id))
         logger.error(f'[{username}]: Houston, we have got a problem {e}')
         answer = text(
                 emojize(":oncoming_police_car:"), r"There was a big trouble when add your initial words\, "
@@ -519,6 +483,7 @@ async def cb_get_call_to_add_init_words(call: types.CallbackQuery, state: FSMCon
         await call.message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2)
         return
 
+    lesson_prefetch.invalidate(str(call.message.chat.id))
     answer = text(
         emojize(r':ski: Done, now you have 15 starting words'), '\n')
 
@@ -1,8 +1,12 @@
 import logging
-import os
 import sys
 import datetime
-import matplotlib.pyplot as plt
+import asyncio
+import functools
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from aiogram import Dispatcher, types
 from aiogram.dispatcher import FSMContext
@@ -10,9 +14,11 @@ from aiogram.utils.markdown import text, bold
 from aiogram.utils.emoji import emojize
 from aiogram.types import ParseMode, ChatActions
 
-from config.config import BACKUP_GRAPH
+from config.config import BACKUP_GRAPH, GRAPH_WORKERS, GRAPH_CACHE_SIZE
 
-from .. import db_worker
+from .. import db_worker, async_db_worker
+from ..cache import LruCache
+from ..graph import build_graph, graph_key
 
 
 ########################################################################################################################
@@ -25,84 +31,58 @@ logging.basicConfig(
 
 
 ########################################################################################################################
-def build_graph(user_id: str | int, days, total, mistakes, first_try, path: str) -> str:
-    """
-    The function builds a graph from the received arrays and returns a place with a graph image
-    :param user_id: user_id use for logs
-    :param days: array with text data as example ['M', 'T', 'W']
-    :param total: array with first graph data. Ex:[10, 12, 6]
-    :param mistakes: array with second graph data Ex:[2, 0, 6]
-    :param first_try: array with third graph data Ex:[8, 12, 6]
-    :param path: string where func have to save result image file
-    :return: path with image file
-    """
-    logger.info(f'[{user_id}]: Start build graph with: \n\n{days}\n{total}\n{mistakes}\n{first_try}\n')
+# graphs are rendered in separate processes - the cpu work does not hold the event loop of the bot
+# (the processes are spawned, not forked: a fork of the bot process with the db | http threads may deadlock;
+# a spawned process imports the bot main module again as __mp_main__, so bot.py keeps its heavy imports in main())
+def new_graph_executor() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=GRAPH_WORKERS, mp_context=multiprocessing.get_context('spawn'))
 
-    picture = plt.figure(
-        figsize=(6.4, 4.8),
-        dpi=100,
-        facecolor='#1e262c',
-        edgecolor='#1e262c'
-    )
-    graph = picture.add_subplot(1, 1, 1)
-
-    graph.grid(
-        visible=True,
-        which='major',
-        axis='both',
-        alpha=0.1,
-        antialiased=True,
-        dash_capstyle='butt'
-    )
 
-    graph.set_facecolor('#1e262c')
+graph_executor = new_graph_executor()
+# the graph changes only with the statistic data, so it is cached by the data hash:
+# png bytes - no rendering, telegram file_id - no rendering and no uploading
+graphs_cache = LruCache(maxsize=GRAPH_CACHE_SIZE)
+file_ids_cache = LruCache(maxsize=GRAPH_CACHE_SIZE)
 
-    graph.tick_params(
-        axis='both',
-        color='#1e262c',
-        labelcolor='#c4c9cd'
-    )
-    graph.spines['bottom'].set_color('#1e262c')
-    graph.spines['top'].set_color('#1e262c')
-    graph.spines['right'].set_color('#1e262c')
-    graph.spines['left'].set_color('#1e262c')
-
-    graph.fill_between(
-        days, mistakes,
-        color='#43c4e3',
-        alpha=0.10
-    )
-    graph.fill_between(
-        days, first_try,
-        color='#43c4e3',
-        alpha=0.15
-    )
-    graph.fill_between(
-        days, total,
-        color='#43c4e3',
-        alpha=0.20
-    )
 
-    graph.plot(
-        days, total,
-        color='#43c4e3',
-        solid_capstyle='round',
-        linestyle='solid',
-        marker='.',
-        markerfacecolor='white',
-        markersize=4,
-        linewidth=1.5)
+async def render_graph(**graph_data) -> bytes:
+    """
+    Renders the graph in the graph process, a crashed process breaks the whole pool - it is replaced by a new one
+    (the current graph fails, the next ones are rendered by the new pool)
+    :param graph_data: keyword arguments of build_graph
+    :return: png bytes
+    """
+    global graph_executor
+    executor = graph_executor
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(build_graph, **graph_data))
+    except BrokenProcessPool:
+        if executor is graph_executor:    # the same broken pool is not replaced twice
+            logger.error('Graph process pool is broken, start a new one')
+            graph_executor = new_graph_executor()
+            executor.shutdown(wait=False)
+        raise
 
-    if total == [0] * 7:    # Display without negative numbers on the score axis
-        graph.plot(
-            days, [0] * 6 + [30],
-            linewidth=0)
 
-    logger.info(f"[{user_id}]: Here f'{path}statistic_{user_id}_{str(datetime.date.today())}.png'")
-    pic_name = path + f'statistic{user_id}.png'
-    picture.savefig(pic_name)
-    logger.info(f'[{user_id}]: Graph successfully saved to {pic_name}')
-    return pic_name
+async def get_graph(user_id: str, days, total, mistakes, first_try) -> tuple:
+    """
+    Takes the graph from the cache or renders it in the graph process
+    :param user_id: user_id use for logs and the file name
+    :return: (string graph key, string telegram file_id | types.InputFile with png graph)
+    """
+    key = graph_key(days, total, mistakes, first_try)
+    file_id = file_ids_cache.get(key)
+    if file_id:
+        logger.info(f'[{user_id}]: Graph {key} is already uploaded')
+        return key, file_id
+
+    png = graphs_cache.get(key)
+    if png is None:
+        png = await render_graph(user_id=user_id, days=days, total=total, mistakes=mistakes, first_try=first_try)
+        graphs_cache.put(key, png)
+    else:
+        logger.info(f'[{user_id}]: Graph {key} is already rendered')
+    return key, types.InputFile(io.BytesIO(png), filename=f'statistic{user_id}.png')
 
 
 def get_seven_day() -> list:
@@ -134,10 +114,8 @@ async def statistic_cmd(message: types.Message, state: FSMContext):
     await message.answer(answer, parse_mode=ParseMode.MARKDOWN_V2, reply_markup=remove_keyboard)
     await message.bot.send_chat_action(message.from_user.id, ChatActions.TYPING)
 
-    db_worker.pending_rollback(username=message.from_user.username)
-
     try:
-        db_worker.change_user_last_using(
+        await async_db_worker.change_user_last_using(
             user_tg_id=str(message.from_user.id),
             flag='check'
         )
@@ -145,7 +123,7 @@ async def statistic_cmd(message: types.Message, state: FSMContext):
         logger.error(f'[{username}]: Unknown sql error {e}')
 
     try:
-        user = db_worker.get_user(tg_id=message.from_user.id)
+        user = await async_db_worker.get_user(tg_id=message.from_user.id)
     except Exception as e:
         logger.error(f'[{username}]: Houston, we have got a problem {e, message.from_user.id}')
         answer = text(
@@ -155,7 +133,7 @@ async def statistic_cmd(message: types.Message, state: FSMContext):
         return
 
     try:
-        total_words_count = db_worker.word_count(user_tg_id=message.from_user.id)
+        total_words_count = await async_db_worker.word_count(user_tg_id=message.from_user.id)
     except Exception as e:
         logger.error(f'[{username}]: Houston, we have got a problem {e, message.from_user.id}')
         total_words_count = 'error, please try again and then write to the admin'
@@ -174,8 +152,9 @@ async def statistic_cmd(message: types.Message, state: FSMContext):
         bold(f'{total_words_count} words\n'),
         '\n')
 
+    key = None
     try:
-        last_seven_user_log_list = db_worker.get_user_stat(
+        last_seven_user_log_list = await async_db_worker.get_user_stat(
             user_tg_id=message.from_user.id,
             limit=7
         )
@@ -184,32 +163,35 @@ async def statistic_cmd(message: types.Message, state: FSMContext):
         )
     except Exception as e:
         logger.error(f'[{username}]: Houston, we have got a unknown sql problem {e}')
-        photo = BACKUP_GRAPH
+        photo = types.InputFile(BACKUP_GRAPH)
     else:
-        photo = build_graph(
-            user_id=str(message.from_user.id),
-            days=get_seven_day(),
-            total=graph_data["total"],
-            mistakes=graph_data["mistakes"],
-            first_try=graph_data["first_try"],
-            path='temporary/'
-        )
+        try:
+            key, photo = await get_graph(
+                user_id=str(message.from_user.id),
+                days=get_seven_day(),
+                total=graph_data["total"],
+                mistakes=graph_data["mistakes"],
+                first_try=graph_data["first_try"]
+            )
+        except Exception as e:
+            logger.error(f'[{username}]: Houston, we have got a graph problem {e}')
+            photo = types.InputFile(BACKUP_GRAPH)
     try:
-        await message.answer_photo(
-            photo=open(photo, 'rb'),
+        sent_message = await message.answer_photo(
+            photo=photo,
             caption=answer,
             parse_mode=ParseMode.MARKDOWN_V2,
         )
+        if key:
+            file_ids_cache.put(key, sent_message.photo[-1].file_id)
     except Exception as e:
         logger.error(f'[{username}]: Houston, we have got a problem {e, photo}')
+        if key:
+            file_ids_cache.pop(key)
         await message.answer(
             text=answer,
             parse_mode=ParseMode.MARKDOWN_V2,
         )
-    finally:
-        if photo != BACKUP_GRAPH:
-            os.remove(photo)
-            logger.info(f'[{username}]: Graph {photo} successfully removed')
     logger.info(f'[{username}]: Statistical data successfully sent to the user')
 
 
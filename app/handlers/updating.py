@@ -9,7 +9,7 @@ from aiogram.utils.emoji import emojize
 from aiogram.types import ParseMode, ChatActions
 from aiogram.dispatcher.filters import Text
 
-from .. import db_worker
+from .. import async_db_worker, category_worker, lesson_prefetch
 
 
 ########################################################################################################################
@@ -165,18 +165,17 @@ async def ms_get_id_set_action(message: types.Message, state: FSMContext):
     user_data_type = data.get("user_data_type")
     user_data_action = data.get("user_data_action")
     logger.info(f'[{username}]: Catch id | data: "{user_text}"')
-    db_worker.pending_rollback(username=message.from_user.username)
 
     # example
     if user_data_type == 'example':
         example_obj = None
         try:
             await message.bot.send_chat_action(message.from_user.id, ChatActions.TYPING)
-            user = db_worker.get_user(tg_id=message.from_user.id)
+            user = await async_db_worker.get_user(tg_id=message.from_user.id)
             if user_text.isdigit():
-                example_obj = db_worker.get_user_example(user=user, example_id=int(user_text))
+                example_obj = await async_db_worker.get_user_example(user=user, example_id=int(user_text))
             if not example_obj:     # the specified numbers are not correct id or the user has entered text
-                example_obj = db_worker.get_user_example(user=user, example=user_text)
+                example_obj = await async_db_worker.get_user_example(user=user, example=user_text)
         except Exception as e:
             logger.error(f'[{username}]: Houston, we have got a unknown sql problem {e}')
             answer = text(
@@ -236,17 +235,17 @@ async def ms_get_id_set_action(message: types.Message, state: FSMContext):
         try:
             flag = 'word_id'
             await message.bot.send_chat_action(message.from_user.id, ChatActions.TYPING)
-            user = db_worker.get_user(tg_id=message.from_user.id)
+            user = await async_db_worker.get_user(tg_id=message.from_user.id)
 
             if user_text.isdigit():
-                word_obj = db_worker.get_user_word(user=user, word_id=int(user_text))
+                word_obj = await async_db_worker.get_user_word(user=user, word_id=int(user_text))
             if not word_obj:     # the specified numbers are not correct id or the user has entered text
                 if user_data_type == 'description':
                     flag = 'desc_text'
-                    word_obj = db_worker.get_user_word(user=user, description=user_text)
+                    word_obj = await async_db_worker.get_user_word(user=user, description=user_text)
                 else:
                     flag = 'word_text'
-                    word_obj = db_worker.get_user_word(user=user, word=user_text)
+                    word_obj = await async_db_worker.get_user_word(user=user, word=user_text)
         except Exception as e:
             logger.error(f'[{username}]: Houston, we have got a unknown sql problem {e}')
             answer = text(
@@ -266,7 +265,7 @@ async def ms_get_id_set_action(message: types.Message, state: FSMContext):
 
         word = word_obj.word
         description = word_obj.description
-        example_obj = db_worker.get_user_example(user=user, example_id=word_obj.example_id)
+        example_obj = await async_db_worker.get_user_example(user=user, example_id=word_obj.example_id)
         example = example_obj.example
         await state.update_data(user_word_id=word_obj.word_id)     # need for next step (deleting | editing)
 
@@ -318,7 +317,6 @@ async def ms_get_new_data_set_finish(message: types.Message, state: FSMContext):
     data = await state.get_data()
     user_data_type = data.get("user_data_type")
     logger.info(f'[{username}]: New {user_data_type} data: "{user_text}"')
-    db_worker.pending_rollback(username=message.from_user.username)
 
     if user_data_type == 'example':
         user_data_id = data.get("user_example_id")
@@ -348,10 +346,18 @@ async def ms_get_new_data_set_finish(message: types.Message, state: FSMContext):
     await message.bot.send_chat_action(message.from_user.id, ChatActions.TYPING)
 
     try:
-        db_worker.update_data(data_type=user_data_type, data_id=user_data_id, new_data=user_text)
-        user = db_worker.get_user(tg_id=message.from_user.id)
+        if user_data_type == 'word':    # the category is back-filled by the category worker
+            category = category_worker.cached_category(user_text)
+            await async_db_worker.update_data(
+                data_type=user_data_type, data_id=user_data_id, new_data=user_text, category=category)
+            if category == '-':
+                category_worker.resolve(user_data_id, user_text)
+        else:
+            await async_db_worker.update_data(data_type=user_data_type, data_id=user_data_id, new_data=user_text)
+        lesson_prefetch.invalidate(str(message.from_user.id))
+        user = await async_db_worker.get_user(tg_id=message.from_user.id)
         if user_data_type == 'example':
-            example_obj = db_worker.get_user_example(
+            example_obj = await async_db_worker.get_user_example(
                 user=user,
                 example_id=user_data_id
             )
@@ -361,11 +367,11 @@ async def ms_get_new_data_set_finish(message: types.Message, state: FSMContext):
                 bold('\n\tExample'), ' : ', italic(rf'"{example_obj.example}"'),
                 bold(f"\n\tWord{'s' if len(words) > 1 else ''} : "), r' \: ', italic(fr'"{",".join(words)}"'))
         else:     # word | description
-            word_obj = db_worker.get_user_word(
+            word_obj = await async_db_worker.get_user_word(
                 user=user,
                 word_id=user_data_id
             )
-            example = db_worker.get_user_example(user=user, example_id=word_obj.example_id).example
+            example = (await async_db_worker.get_user_example(user=user, example_id=word_obj.example_id)).example
             answer = text(
                 bold('Congratulate'), r'your data have been successfully updating to\:', '\n',
                 bold('\n\tExample'), ' : ', italic(rf'"{example}"'),
@@ -403,7 +409,6 @@ async def cb_get_delete_data_set_finish(call: types.CallbackQuery, state: FSMCon
     else:    # word | description
         user_data_id = data.get("user_word_id")
     logger.info(f'[{username}]: {user_data_type} to delete: "{user_data_id}"')
-    db_worker.pending_rollback(username=call.from_user.username)
 
     answer = text(
         rf'Please wait while we delete your {user_data_type} \- this may take some time\.\.\.', '\n')
@@ -412,15 +417,16 @@ async def cb_get_delete_data_set_finish(call: types.CallbackQuery, state: FSMCon
     await call.message.bot.send_chat_action(call.message.from_user.id, ChatActions.TYPING)
 
     try:
-        db_worker.delete_data(data_type=user_data_type, data_id=user_data_id)
-        user = db_worker.get_user(tg_id=call.message.chat.id)
+        await async_db_worker.delete_data(data_type=user_data_type, data_id=user_data_id)
+        lesson_prefetch.invalidate(str(call.message.chat.id))
+        user = await async_db_worker.get_user(tg_id=call.message.chat.id)
         if user_data_type == 'example':
-            example_obj = db_worker.get_user_example(
+            example_obj = await async_db_worker.get_user_example(
                 user=user,
                 example_id=user_data_id
             )
         else:
-            example_obj = db_worker.get_user_example(
+            example_obj = await async_db_worker.get_user_example(
                 user=user,
                 example_id=user_data_id
             )
@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import sys
+import time
+
+from config.config import LESSON_PREFETCH_SIZE, LESSON_PREFETCH_TTL
+
+from . import async_db_worker
+from .cache import LruCache
+
+
+########################################################################################################################
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format='[%(asctime)s]:[%(levelname)s]:[%(filename)s]:[%(lineno)d]: %(message)s',
+    )
+
+
+########################################################################################################################
+# basic
+# the next lesson is built in the background right after the current one is finished,
+# so "Once again" takes the ready lesson without any db work
+# tg_id -> (creation time, task with lesson_data)
+lessons_cache = LruCache(maxsize=LESSON_PREFETCH_SIZE)
+
+
+def _mark_retrieved(task: asyncio.Task):
+    """
+    The lesson may be never taken (invalidated | forgotten by the cache), so its error is logged here
+    """
+    if not task.cancelled() and task.exception() is not None:
+        logger.info(f'Prefetched lesson failed {task.exception()!r}')
+
+
+########################################################################################################################
+# work with
+def prefetch(tg_id: str):
+    """
+    Starts building the next lesson of the user in the background (call it inside the running event loop)
+    :param tg_id: string telegram user id
+    """
+    tg_id = str(tg_id)
+    task = asyncio.ensure_future(async_db_worker.get_lesson_data(tg_id))
+    task.add_done_callback(_mark_retrieved)
+    old = lessons_cache.get(tg_id)
+    lessons_cache.put(tg_id, (time.monotonic(), task))
+    if old:
+        old[1].cancel()
+    logger.info(f'[{tg_id}]: Prefetch next lesson')
+
+
+def invalidate(tg_id: str):
+    """
+    Forgets the prefetched lesson, call it when the user words are added | changed | deleted
+    :param tg_id: string telegram user id
+    """
+    old = lessons_cache.pop(str(tg_id))
+    if old:
+        old[1].cancel()
+        logger.info(f'[{tg_id}]: Prefetched lesson is invalidated')
+
+
+async def get_lesson_data(tg_id: str) -> list:
+    """
+    Takes the prefetched lesson once (waits for it if it is still being built) or builds a new one
+    :param tg_id: string telegram user id
+    :return: lesson_data as db_worker.get_lesson_data
+    :raise: MinLenError if the user has less than 15 words
+    """
+    tg_id = str(tg_id)
+    prefetched = lessons_cache.pop(tg_id)
+    if prefetched:
+        creation_time, task = prefetched
+        if time.monotonic() - creation_time < LESSON_PREFETCH_TTL:
+            try:
+                lesson_data = await task
+                logger.info(f'[{tg_id}]: Take prefetched lesson')
+                return lesson_data
+            except asyncio.CancelledError:
+                if not task.cancelled():    # the handler itself is cancelled
+                    raise
+            except Exception:
+                pass
+        else:
+            task.cancel()
+    return await async_db_worker.get_lesson_data(tg_id)
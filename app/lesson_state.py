@@ -0,0 +1,74 @@
+import logging
+import sys
+
+from config.config import LESSON_WORDS_CACHE_SIZE
+
+from . import async_db_worker
+from .cache import LruCache
+
+
+########################################################################################################################
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stdout,
+        format='[%(asctime)s]:[%(levelname)s]:[%(filename)s]:[%(lineno)d]: %(message)s',
+    )
+
+
+########################################################################################################################
+# basic
+# the fsm storage (redis) keeps only the word ids and the answer layout of every task,
+# the word texts are kept once here: word_id -> {'word', 'description', 'example'}
+# packed task: [[word_id_a, word_id_b, word_id_c, word_id_d], main_index, [correct_indexes], main_rating]
+LETTERS = ('a', 'b', 'c', 'd')
+words_cache = LruCache(maxsize=LESSON_WORDS_CACHE_SIZE)
+
+
+def pack_lesson(lesson_data: list) -> list:
+    """
+    Keeps the word texts in the shared cache
+    :param lesson_data: list of tasks {a: json-word, b: .., c: .., d: ..} (db_worker.get_lesson_data)
+    :return: list of packed tasks
+    """
+    lesson = []
+    for task in lesson_data:
+        words = [task[letter] for letter in LETTERS]
+        for w in words:
+            words_cache.put(w['word_id'], {'word': w['word'], 'description': w['description'], 'example': w['example']})
+        main_index = next(i for i, w in enumerate(words) if w['is_main'])
+        lesson.append([
+            [w['word_id'] for w in words],
+            main_index,
+            [i for i, w in enumerate(words) if w['is_correct']],
+            words[main_index]['rating']
+        ])
+    return lesson
+
+
+async def unpack_task(packed_task: list) -> dict:
+    """
+    Takes the word texts from the shared cache (from the db only after the bot restart | cache eviction)
+    :param packed_task: one task of pack_lesson
+    :return: dict {a: json-word, b: .., c: .., d: ..} with keys 'word', 'description', 'example', 'word_id',
+     'is_main', 'is_correct', 'rating' (main word only)
+    """
+    word_ids, main_index, correct_indexes, main_rating = packed_task
+    texts = {word_id: words_cache.get(word_id) for word_id in word_ids}
+    missing_ids = [word_id for word_id, text in texts.items() if text is None]
+    if missing_ids:
+        logger.info(f'Load lesson words {missing_ids}')
+        for w in await async_db_worker.get_words_texts(missing_ids):
+            texts[w['word_id']] = {'word': w['word'], 'description': w['description'], 'example': w['example']}
+            words_cache.put(w['word_id'], texts[w['word_id']])
+
+    return {
+        letter: dict(
+            texts[word_id] or {'word': '-', 'description': '-', 'example': '-'},    # deleted during the lesson
+            word_id=word_id,
+            is_main=i == main_index,
+            is_correct=i in correct_indexes,
+            rating=main_rating if i == main_index else None
+        )
+        for i, (letter, word_id) in enumerate(zip(LETTERS, word_ids))
+    }
@@ -2,31 +2,23 @@ import asyncio
 import logging
 import sys
 import time
-from sqlalchemy import exc
-
-import aiogram.utils.exceptions
-from aiogram import Bot, Dispatcher
-from aiogram.types import BotCommand
-from aiogram.contrib.fsm_storage.redis import RedisStorage2
 
 from config import config
-from app.handlers.common import register_handlers_common
-from app.handlers.adding import register_adding_handlers
-from app.handlers.lessons import register_lesson_handlers
-from app.handlers.statistic import register_statistic_handlers
-from app.handlers.checking import register_checking_handlers
-from app.handlers.updating import register_updating_handlers
-from app.handlers.api import register_api_handlers
+# the graph processes are spawned and import this module again as __mp_main__,
+# so the telegram | db modules are imported only in main() and under __main__ (the db is migrated at import)
 
 
 logger = logging.getLogger(__name__)
 
 
 ########################################################################################################################
-async def set_commands(bot: Bot):
+async def set_commands(bot):
     """
     Sets valid bot hint commands
+    :param bot: aiogram.Bot object
     """
+    from aiogram.types import BotCommand
+
     commands = [
         BotCommand(command="/start", description="Greetings"),
         BotCommand(command="/help", description="View commands"),
@@ -39,6 +31,18 @@ async def main():
     """
     Assembly and launch of all functions of the part of the telegram bot
     """
+    from aiogram import Bot, Dispatcher
+    from aiogram.contrib.fsm_storage.redis import RedisStorage2
+
+    from app import category_worker, broadcast
+    from app.handlers.common import register_handlers_common
+    from app.handlers.adding import register_adding_handlers
+    from app.handlers.lessons import register_lesson_handlers
+    from app.handlers.statistic import register_statistic_handlers
+    from app.handlers.checking import register_checking_handlers
+    from app.handlers.updating import register_updating_handlers
+    from app.handlers.api import register_api_handlers
+
     # Setting up logging to stdout
     logging.basicConfig(
         level=logging.INFO,
@@ -67,13 +71,26 @@ async def main():
     # Setting commands
     await set_commands(bot)
 
+    # Background category lookups for the added words
+    await category_worker.start()
+
+    # The /admintell broadcasts interrupted by the previous run
+    await broadcast.resume(bot)
+
     # Start pooling after skipping the updates
-    await dp.skip_updates()
-    await dp.start_polling()
+    try:
+        await dp.skip_updates()
+        await dp.start_polling()
+    finally:
+        await broadcast.stop()
+        await category_worker.stop()
 
 
 ########################################################################################################################
 if __name__ == '__main__':     # You can run separately only the telegram part from this module
+    from sqlalchemy import exc
+    import aiogram.utils.exceptions
+
     while True:
         try:
             asyncio.run(main())
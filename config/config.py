@@ -12,18 +12,66 @@ REDIS_PASSWORD = 'pws'
 
 # SQL part:
 MY_SQL = 'mysql+mysqlconnector://login:psw@ip/db'   # hetzner 1111
+SQL_POOL_SIZE = 10          # connections kept open in the pool
+SQL_MAX_OVERFLOW = 20       # extra connections allowed under a load spike
+SQL_POOL_TIMEOUT = 30       # seconds to wait for a free connection
+SQL_POOL_RECYCLE = 3600     # seconds before a connection is reopened
+SQL_POOL_PRE_PING = True    # check the connection before every checkout
+SQL_QUERY_CACHE_SIZE = 500  # compiled sql statements kept by the engine
 
 # Category part:
 APP_ID_OXF = '111111'
 APP_KEY_OXF = '111111111111111111111111'    # "App" oxforddictionaries
 URL_OXF = 'https://od-api.oxforddictionaries.com/api/v2/entries/en-gb/'
+OXF_TIMEOUT = (3.05, 10)          # seconds to connect, seconds to read the answer
+OXF_POOL_SIZE = 10                # keep-alive connections to the dictionary api
+OXF_CACHE_SIZE = 10000            # word categories kept in memory
+OXF_MISS_TTL_DAYS = 30            # days before a word without an entry is asked again
+OXF_WORKERS = 4                   # categories resolved at the same time in the background
+OXF_RETRIES = 3                   # attempts per word on the request errors
+OXF_BACKOFF = 1                   # seconds before the first retry, doubled every next one
+OXF_RESCAN_INTERVAL = 600         # seconds between the searches of the words left without category
+
+# Lesson part:
+LESSON_PREFETCH_SIZE = 1000       # users with the next lesson built in advance
+LESSON_PREFETCH_TTL = 600         # seconds before the built lesson is too old (words may be changed through the api)
+LESSON_WORDS_CACHE_SIZE = 100000  # word texts of the running lessons kept in memory
 
 # Graph part:
 BACKUP_GRAPH = r'config\backup_graph.png'
+GRAPH_WORKERS = 2                 # processes rendering the statistic graphs
+GRAPH_CACHE_SIZE = 500            # rendered graphs (and their telegram file ids) kept in memory
+
+# Export part:
+EXPORT_CHUNK_SIZE = 1000          # rows of one export page query
+EXPORT_CHUNK_BYTES = 64 * 1024    # bytes sent in one chunk of the streamed export
+EXPORT_CACHE_SIZE = 200           # ready exports kept in memory (by user data version)
+EXPORT_CACHE_MAX_BYTES = 2 * 1024 * 1024    # bigger exports are not cached
+IMPORT_BATCH_SIZE = 500           # imported words added in one transaction
 
 # API part:
 HOST = '111.1.1.1'
 PORT = 1111
+API_DEV_SERVER = False            # flask single-process server instead of gunicorn (always used on windows)
+API_WORKERS = 4                   # gunicorn worker processes (about one per core)
+API_THREADS = 8                   # request threads of every worker (keep it below the sql pool size + overflow)
+API_PRELOAD = True                # build the flask app once in the master, not in every worker after the fork
+API_GRACEFUL_TIMEOUT = 30         # seconds for the old workers to finish their requests on reload | stop
+API_MAX_REQUESTS = 10000          # requests before the worker is replaced by a new one
+API_PAGE_SIZE = 100               # words on the page of the paginated words listing by default
+API_MAX_PAGE_SIZE = 1000          # maximum words on one page
+API_MAX_BULK_SIZE = 2000          # maximum objects in one bulk request
+API_KEYS_CACHE_SIZE = 10000       # api key owners kept in memory
+API_KEYS_CACHE_TTL = 300          # seconds before the key owner is checked in the db again (the only expiry)
+
+# Broadcast part:
+BROADCAST_RATE = 25               # messages per second, below the telegram limit of about 30
+BROADCAST_BURST = 5               # messages that may be sent at once after a pause
+BROADCAST_CONCURRENCY = 10        # messages waiting for the telegram answer at the same time
+BROADCAST_PAGE_SIZE = 500         # users sent between two progress checkpoints
+BROADCAST_FETCH_SIZE = 100        # users fetched from the db cursor at once
+BROADCAST_RETRIES = 3             # attempts per user on the flood | network errors
+BROADCAST_PROGRESS_INTERVAL = 30  # seconds between the progress messages to the admin
 
 # Teleword part:
 PYTHON_PATH = r'C:\python.exe'
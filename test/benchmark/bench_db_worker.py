@@ -0,0 +1,132 @@
+"""
+Micro-benchmarks for the sql part of 'db_worker.py'.
+They run on a separate in-memory database with the same tables, so real data is never touched
+(db_worker itself is imported with an in-memory database too - it migrates its database at import):
+PYTHONPATH=. python test/benchmark/bench_db_worker.py
+"""
+import logging
+import timeit
+
+import sqlalchemy
+
+from config import config
+config.MY_SQL = 'sqlite://'    # before the db_worker import
+from app import db_worker    # noqa: E402
+from config.config import SQL_QUERY_CACHE_SIZE    # noqa: E402
+
+
+########################################################################################################################
+USERS_COUNT = 2000    # more users than the compiled statements cache holds, as in production
+CALLS = 2000
+WORDS_PER_USER = 50
+WORDS_USERS_COUNTS = (50, 200, 800)    # the words table grows, the exported user stays the same
+EXPORT_CALLS = 20
+OLD_IMPORTANT_WORDS_SQL = """
+    SELECT words.word_id, words.word, words.description, examples.ex_id, examples.example
+    FROM users
+    LEFT JOIN examples ON examples.user_id = users.user_id
+    LEFT JOIN words ON words.example_id = examples.ex_id
+    WHERE users.tg_id = :tg_id
+    AND words.rating > (SELECT AVG(rating) FROM words WHERE users.tg_id = :tg_id)
+    ORDER BY words.word_id ASC
+"""
+
+
+def make_engine() -> sqlalchemy.engine.Engine:
+    """
+    :return: in-memory engine with teleword tables and users 'bench0'...'bench{USERS_COUNT}'
+    """
+    bench_engine = sqlalchemy.create_engine('sqlite://', query_cache_size=SQL_QUERY_CACHE_SIZE)
+    db_worker.Base.metadata.create_all(bench_engine)
+    bench_engine.execute(
+        db_worker.Users.__table__.insert(),
+        [
+            {
+                'tg_id': f'bench{i}', 'nickname': f'bench{i}', 'lang_code': 'en', 'shock_mode': 0, 'points': 0,
+                'is_blacklisted': False, 'is_bot': False, 'creation_time': '2022-01-01',
+                'last_use_time': '2022-01-01', 'current_use_time': '2022-01-01'
+            }
+            for i in range(USERS_COUNT)
+        ]
+    )
+    return bench_engine
+
+
+def bench_word_count(bench_engine: sqlalchemy.engine.Engine) -> dict:
+    """
+    Per-call time of word_count sql: formatted string (old way) vs precompiled bound statement
+    (no speedup is expected - the bound statement must only not be slower, it is used to keep user data out of sql)
+    :return: dict {'formatted': seconds, 'bound': seconds}
+    """
+    formatted_sql = db_worker.WORD_COUNT_SQL.text.replace(':tg_id', "'{}'")
+    counter = iter(range(10 ** 9))
+
+    def formatted():
+        bench_engine.execute(formatted_sql.format(f'bench{next(counter) % USERS_COUNT}')).scalar()
+
+    def bound():
+        bench_engine.execute(db_worker.WORD_COUNT_SQL, {'tg_id': f'bench{next(counter) % USERS_COUNT}'}).scalar()
+
+    return {
+        'formatted': min(timeit.repeat(formatted, number=CALLS, repeat=3)) / CALLS,
+        'bound': min(timeit.repeat(bound, number=CALLS, repeat=3)) / CALLS,
+    }
+
+
+def add_words(bench_engine: sqlalchemy.engine.Engine, users_count: int):
+    """
+    Gives WORDS_PER_USER words (one example for 5 words) to users 'bench0'...'bench{users_count}',
+    the ratings of every user are shifted by its number, so the users averages are different
+    """
+    examples, words = [], []
+    for user_id in range(1, users_count + 1):
+        for i in range(WORDS_PER_USER // 5):
+            ex_id = len(examples) + 1
+            examples.append({'ex_id': ex_id, 'example': f'example{ex_id}', 'user_id': user_id})
+            words.extend(
+                {
+                    'word': f'word{ex_id}_{j}', 'description': f'description{ex_id}_{j}', 'category': '-',
+                    'rating': (i * 5 + j) % 10 + user_id % 7, 'example_id': ex_id
+                }
+                for j in range(5)
+            )
+    bench_engine.execute(db_worker.UsersExamples.__table__.insert(), examples)
+    bench_engine.execute(db_worker.UsersExamplesWords.__table__.insert(), words)
+
+
+def bench_important_words() -> dict:
+    """
+    Per-call time of the 'most important words' export sql of one user while the words table grows:
+    correlated average over the whole table (old way) vs the average of the user own words aggregated once
+    :return: dict {total words count: {'correlated': seconds, 'aggregated': seconds}}
+    """
+    aggregated_sql = db_worker.user_words_statement(sql_filter_key='most important words', sql_sort_key='default')
+    params = {'tg_id': 'bench0', 'limit': WORDS_PER_USER}
+    result = {}
+    for users_count in WORDS_USERS_COUNTS:
+        bench_engine = make_engine()
+        add_words(bench_engine, users_count)
+
+        def correlated():
+            bench_engine.execute(sqlalchemy.text(OLD_IMPORTANT_WORDS_SQL), params).fetchall()
+
+        def aggregated():
+            bench_engine.execute(aggregated_sql, params).fetchall()
+
+        result[users_count * WORDS_PER_USER] = {
+            'correlated': min(timeit.repeat(correlated, number=EXPORT_CALLS, repeat=3)) / EXPORT_CALLS,
+            'aggregated': min(timeit.repeat(aggregated, number=EXPORT_CALLS, repeat=3)) / EXPORT_CALLS,
+        }
+    return result
+
+
+########################################################################################################################
+if __name__ == '__main__':
+    logging.disable(logging.INFO)
+    result = bench_word_count(make_engine())
+    print(f"word_count formatted: {result['formatted'] * 10 ** 6:.1f} us/call")
+    print(f"word_count bound:     {result['bound'] * 10 ** 6:.1f} us/call")
+    for words_count, result in bench_important_words().items():
+        print(f"most important words of {words_count} words: "
+              f"correlated {result['correlated'] * 10 ** 3:.2f} ms/call, "
+              f"aggregated {result['aggregated'] * 10 ** 3:.2f} ms/call")
@@ -0,0 +1,42 @@
+import unittest
+import unittest.mock
+from types import SimpleNamespace
+
+import api
+
+
+########################################################################################################################
+class ApiTestCase(unittest.TestCase):
+    """
+    Smoke tests for the api server assembly
+    """
+
+    def test_create_app(self):
+        """
+        Test is the func create_app returns the wsgi app with all query interfaces
+        """
+        rules = {rule.rule for rule in api.create_app().url_map.iter_rules()}
+        for expected in ('/api/words/<string:token>', '/api/words/<string:token>/page', '/api/lesson/<string:token>',
+                         '/api/examples/<string:token>', '/api/example/<string:token>/<int:example_id>',
+                         '/api/word/<string:token>/<int:word_id>'):
+            self.assertIn(expected, rules)
+
+    def test_create_app_unknown_key(self):
+        """
+        Test is the app created by the func create_app answers 404 to the unknown api key
+        """
+        response = api.create_app().test_client().get('/api/words/unknown_api_key')
+        self.assertEqual(404, response.status_code)
+
+    def test_post_fork(self):
+        """
+        Test is the gunicorn hook post_fork drops the inherited pool connections without closing them
+        """
+        with unittest.mock.patch.object(api.db_worker.engine, 'dispose') as dispose:
+            api.post_fork(server=None, worker=SimpleNamespace(pid=0))
+        dispose.assert_called_once_with(close=False)
+
+
+########################################################################################################################
+if __name__ == "__main__":    # coverage run -m unittest module | coverage run -m unittest module
+    unittest.main()
@@ -1,9 +1,11 @@
+import asyncio
 import unittest
+import unittest.mock
 import datetime
-import os
-import pathlib
+import io
+import json
 
-from app import db_worker
+from app import db_worker, async_db_worker
 from config import config
 
 
@@ -18,9 +20,6 @@ class DbWorkerTestCase(unittest.TestCase):
         Cleans up anything that might interfere with correct testing
         """
         self.admin = db_worker.get_user(tg_id=str(config.ADMIN_ID_TG))
-        self.path = '../../../temporary'
-        for i in pathlib.Path(self.path).rglob('*'):
-            os.remove(i)
         db_worker.engine.execute(
             """
             DELETE FROM words 
@@ -80,6 +79,10 @@ class DbWorkerTestCase(unittest.TestCase):
             """
             DELETE FROM users WHERE tg_id='TEST00002'
             """)
+        db_worker.engine.execute(
+            """
+            DELETE FROM broadcasts WHERE admin_tg_id='TEST00001'
+            """)
         db_worker.pending_rollback(username='test')
 
     def tearDown(self) -> None:
@@ -93,7 +96,8 @@ class DbWorkerTestCase(unittest.TestCase):
         Checking if there are tables in the database after module import
         """
         actual_tables_data = db_worker.engine.execute('SHOW TABLES;')
-        expected_table_data = [('apikeys',), ('examples',), ('statistics',), ('users',), ('words',)]
+        expected_table_data = [('apikeys',), ('broadcasts',), ('categories',), ('deleted_words',), ('examples',),
+                               ('schema_migrations',), ('statistics',), ('users',), ('words',)]
         self.assertEqual(expected_table_data, list(actual_tables_data))
 
     def test_is_user(self):
@@ -143,7 +147,9 @@ class DbWorkerTestCase(unittest.TestCase):
         )
         actual_user_data = db_worker.engine.execute(
             """
-            SELECT * FROM users 
+            SELECT tg_id, nickname, lang_code, shock_mode, points, is_blacklisted, is_bot,
+            creation_time, last_use_time, current_use_time
+            FROM users
             WHERE nickname = 'test'
             AND lang_code = 'ru'
             AND tg_id='TEST00000'
@@ -155,7 +161,8 @@ class DbWorkerTestCase(unittest.TestCase):
             AND last_use_time = '{0}'
             AND current_use_time = '{0}'
             """.format(today))
-        self.assertIn(('TEST00000', 'test', 'ru', 0, 0, 0, 0, today, today, today), [i[1:] for i in actual_user_data])
+        expected = ('TEST00000', 'test', 'ru', 0, 0, 0, 0, today, today, today)
+        self.assertIn(expected, [tuple(i) for i in actual_user_data])
 
     def test_users_bl_list(self):
         """
@@ -275,13 +282,13 @@ class DbWorkerTestCase(unittest.TestCase):
         )
         actual = db_worker.engine.execute(
             """
-            SELECT * FROM words 
+            SELECT word, description, category, rating FROM words
             WHERE word = 'testword'
             AND description  = 'testdescription'
             AND example_id = {}
             """.format(test_example.ex_id))
         expected = ('testword', 'testdescription', 'testcategory', 0)
-        self.assertIn(expected, [i[1:-1] for i in actual])
+        self.assertIn(expected, [tuple(i) for i in actual])
 
     def test_get_word(self):
         """
@@ -433,22 +440,130 @@ class DbWorkerTestCase(unittest.TestCase):
         actual = [len(i) for i in stat_data.values()]
         self.assertEqual(expected, actual)
 
-    def test_create_file_with_user_words(self):
+    def test_get_user_words_file(self):
         """
-        Test is the func create_file_with_user_words returns correct file path
+        Test is the func get_user_words_file returns in-memory json file with all user words
         """
-        path = self.path
-        for i in pathlib.Path(path).rglob('*'):
-            os.remove(i)
-        actual = os.path.isfile(db_worker.create_file_with_user_words(
+        file = db_worker.get_user_words_file(
             user_tg_id=str(config.ADMIN_ID_TG),
-            file_path=path,
             file_type='json',
             sql_filter_key='default',
-            sql_sort_key='default')
+            sql_sort_key='default'
         )
-        expected = True
+        expected = db_worker.word_count(user_tg_id=config.ADMIN_ID_TG)
+        actual = len(json.load(file))
         self.assertEqual(expected, actual)
+        self.assertEqual(f'words{config.ADMIN_ID_TG}.json', file.name)
+
+    def test_iter_user_words_pages(self):
+        """
+        Test is the func iter_user_words reads all user words page by page in the sort order without repeats
+        """
+        for sql_sort_key in ('default', 'by importance', 'in alphabetical order'):
+            with unittest.mock.patch.object(db_worker, 'EXPORT_CHUNK_SIZE', 7):
+                actual = [i.word_id for i in db_worker.iter_user_words(
+                    user_tg_id=config.ADMIN_ID_TG, sql_filter_key='default', sql_sort_key=sql_sort_key)]
+            with unittest.mock.patch.object(db_worker, 'EXPORT_CHUNK_SIZE', 10 ** 6):
+                expected = [i.word_id for i in db_worker.iter_user_words(
+                    user_tg_id=config.ADMIN_ID_TG, sql_filter_key='default', sql_sort_key=sql_sort_key)]
+            self.assertEqual(expected, actual)
+            self.assertEqual(len(set(actual)), len(actual))
+            self.assertEqual(db_worker.word_count(user_tg_id=config.ADMIN_ID_TG), len(actual))
+
+    def test_get_user_data_version(self):
+        """
+        Test is the user data version grows with the new words (so the cached exports are not taken)
+        """
+        old_version = db_worker.get_user_data_version(user_tg_id=config.ADMIN_ID_TG)
+        example = db_worker.add_example(
+            example_text='testexample',
+            user_tg_id=config.ADMIN_ID_TG
+        )
+        db_worker.add_word(
+            word='testword',
+            description='testdescription',
+            category='-',
+            rating=0,
+            example=example
+        )
+        actual = db_worker.get_user_data_version(user_tg_id=config.ADMIN_ID_TG)
+        self.assertGreater(actual, old_version)
+
+    def test_get_user_words_page(self):
+        """
+        Test is the func get_user_words_page pages through all user words without repeats
+        """
+        pages, since_word_id = [], 0
+        while True:
+            page = db_worker.get_user_words_page(user_id=self.admin.user_id, since_word_id=since_word_id, limit=7)
+            if not page:
+                break
+            pages.extend(i['word_id'] for i in page)
+            since_word_id = page[-1]['word_id']
+        self.assertEqual(sorted(set(pages)), pages)
+        self.assertEqual(db_worker.word_count(user_tg_id=config.ADMIN_ID_TG), len(pages))
+
+    def test_get_user_words_page_updated_since(self):
+        """
+        Test is the func get_user_words_page returns only the words changed since the time
+        """
+        updated_since = db_worker.now_time()
+        example = db_worker.add_example(
+            example_text='testexample',
+            user_tg_id=config.ADMIN_ID_TG
+        )
+        word = db_worker.add_word(
+            word='testword',
+            description='testdescription',
+            category='-',
+            rating=0,
+            example=example
+        )
+        actual = db_worker.get_user_words_page(user_id=self.admin.user_id, updated_since=updated_since)
+        self.assertEqual([word.word_id], [i['word_id'] for i in actual])
+
+    def test_get_user_words_page_updated_example(self):
+        """
+        Test is the func get_user_words_page returns the words of the example changed since the time
+        """
+        example = db_worker.add_example(
+            example_text='testexample',
+            user_tg_id=config.ADMIN_ID_TG
+        )
+        word = db_worker.add_word(
+            word='testword',
+            description='testdescription',
+            category='-',
+            rating=0,
+            example=example
+        )
+        updated_since = db_worker.now_time()
+        db_worker.bulk_update_examples(user_id=self.admin.user_id,
+                                       examples=[{'ex_id': example.ex_id, 'example': 'testexample'}])
+        actual = db_worker.get_user_words_page(user_id=self.admin.user_id, updated_since=updated_since)
+        self.assertEqual([(word.word_id, 'testexample')], [(i['word_id'], i['example']) for i in actual])
+
+    def test_get_deleted_words_ids(self):
+        """
+        Test is the func get_deleted_words_ids returns the ids of the user words deleted since the time
+        """
+        example = db_worker.add_example(
+            example_text='testexample',
+            user_tg_id=config.ADMIN_ID_TG
+        )
+        words_ids = [
+            db_worker.add_word(word=word, description='testdescription', category='-', rating=0,
+                               example=example).word_id
+            for word in ('testword', 'testword3', 'testword4')
+        ]
+        deleted_since = db_worker.now_time()
+        db_worker.delete_data(data_type='word', data_id=words_ids[0])
+        db_worker.bulk_delete_words(user_id=self.admin.user_id, words_ids=[words_ids[1]])
+        actual = db_worker.get_deleted_words_ids(user_id=self.admin.user_id, deleted_since=deleted_since)
+        self.assertEqual(words_ids[:2], actual)
+        db_worker.bulk_delete_examples(user_id=self.admin.user_id, examples_ids=[example.ex_id])
+        actual = db_worker.get_deleted_words_ids(user_id=self.admin.user_id, deleted_since=deleted_since)
+        self.assertEqual(words_ids, actual)
 
     def test_get_user_example_id(self):
         """
@@ -577,6 +692,19 @@ class DbWorkerTestCase(unittest.TestCase):
         )
         self.assertEqual(expected, actual)
 
+    def test_get_word_category_cached(self):
+        """
+        Test is the func get_word_category takes the stored answers (also no entry ones) without the api request
+        """
+        db_worker.store_word_category(word='testcachedword', category='Noun')
+        db_worker.store_word_category(word='testcachedmiss', category=None)
+        db_worker.categories_cache.clear()
+        self.assertEqual('Noun', db_worker.get_word_category(word='TestCachedWord', url='http://0.0.0.0/'))
+        self.assertEqual('-', db_worker.get_word_category(word='testcachedmiss', url='http://0.0.0.0/'))
+        self.assertEqual('Noun', db_worker.categories_cache.get('testcachedword'))
+        self.assertIs(db_worker.NOT_CACHED, db_worker.categories_cache.get('testcachedmiss', db_worker.NOT_CACHED))
+        db_worker.engine.execute("DELETE FROM categories WHERE word IN ('testcachedword', 'testcachedmiss')")
+
     def test_update_data_word(self):
         """
         Test is the func update_data success updates word data
@@ -749,6 +877,294 @@ class DbWorkerTestCase(unittest.TestCase):
         actual = db_worker.get_user_by_api_key(token=db_worker.get_user_api_key(user=expected))
         self.assertEqual(expected, actual)
 
+    def test_get_api_user(self):
+        """
+        Test is func get_api_user returns the key owner and caches it
+        """
+        token = db_worker.get_user_api_key(user=self.admin)
+        db_worker.api_keys_cache.clear()
+        actual = db_worker.get_api_user(token=token)
+        self.assertEqual(self.admin.user_id, actual.user_id)
+        self.assertEqual(self.admin.tg_id, actual.tg_id)
+        self.assertIs(actual, db_worker.get_api_user(token=token))
+
+    def test_get_api_user_unknown(self):
+        """
+        Test is func get_api_user raises LookupError by unknown key
+        """
+        with self.assertRaises(LookupError):
+            db_worker.get_api_user(token='unknown api key')
+
+    def test_session_scope_commit(self):
+        """
+        Test is the unit of work commits its data
+        """
+        with db_worker.session_scope() as s:
+            test_user = db_worker.Users(
+                tg_id='TEST00001', nickname='test', lang_code='ru', shock_mode=0, points=0,
+                is_blacklisted=False, is_bot=False, creation_time='2022-01-01',
+                last_use_time='2022-01-01', current_use_time='2022-01-01'
+            )
+            s.add(test_user)
+        actual = db_worker.get_user(tg_id='TEST00001')
+        self.assertIsNotNone(actual)
+
+    def test_session_scope_rollback(self):
+        """
+        Test is the unit of work rolls back its data on error
+        """
+        with self.assertRaises(RuntimeError):
+            with db_worker.session_scope() as s:
+                s.add(db_worker.Users(
+                    tg_id='TEST00002', nickname='test', lang_code='ru', shock_mode=0, points=0,
+                    is_blacklisted=False, is_bot=False, creation_time='2022-01-01',
+                    last_use_time='2022-01-01', current_use_time='2022-01-01'
+                ))
+                s.flush()
+                raise RuntimeError('rollback')
+        actual = db_worker.get_user(tg_id='TEST00002')
+        self.assertIsNone(actual)
+
+    def test_async_get_user(self):
+        """
+        Does the awaitable twin of get_user run in the worker thread and return a full Python object
+        """
+        actual_obj = asyncio.run(async_db_worker.get_user(tg_id=str(config.ADMIN_ID_TG)))
+        self.assertEqual(str(config.ADMIN_ID_TG), actual_obj.tg_id)
+
+    def test_finish_lesson(self):
+        """
+        Test is the func finish_lesson writes ratings, daily log and points in one call
+        """
+        test_example = db_worker.add_example(
+            example_text='testexample',
+            user_tg_id=config.ADMIN_ID_TG
+        )
+        test_word = db_worker.add_word(
+            word='testword',
+            description='testdescription',
+            category='testcategory',
+            rating=0,
+            example=test_example
+        )
+        expected_points = db_worker.get_user(tg_id=str(config.ADMIN_ID_TG)).points + 15
+        actual = db_worker.finish_lesson(
+            tg_id=str(config.ADMIN_ID_TG),
+            lesson_stats=[{'sql_id': test_word.word_id, 'current_rating': 5, 'attempts': 1, 'mistakes': 0}]
+        )
+        self.assertEqual({'first_try': 1, 'mistakes': 0}, actual)
+        db_worker.session.commit()    # end the read transaction of the test thread as the bot | api calls do
+        self.assertEqual(5, db_worker.get_word(word_id=test_word.word_id).rating)
+        self.assertEqual(expected_points, db_worker.get_user(tg_id=str(config.ADMIN_ID_TG)).points)
+
+    def test_finish_lesson_concurrent_day_stat(self):
+        """
+        Test is the day log added by the concurrent lesson (the insert breaks the unique index) gets the results too
+        """
+        db_worker.add_or_change_day_stat(tg_id=str(config.ADMIN_ID_TG), first_try=0, mistakes=0, points=0)
+        expected = db_worker.get_user_stat(user_tg_id=str(config.ADMIN_ID_TG))[0].total + 15
+        # the concurrent lesson has added the log after this one looked for it
+        with unittest.mock.patch.object(db_worker.sqlalchemy.orm.Query, 'first', return_value=None):
+            db_worker.finish_lesson(tg_id=str(config.ADMIN_ID_TG), lesson_stats=[])
+        db_worker.session.commit()    # end the read transaction of the test thread as the bot | api calls do
+        actual = db_worker.session.query(db_worker.UsersStatistics.total).filter_by(
+            user_id=self.admin.user_id, day=str(datetime.date.today())).all()
+        self.assertEqual([(expected,)], actual)
+
+    def test_get_lesson_data_tasks(self):
+        """
+        Test is every lesson task made of 4 different words with only one main correct word
+        """
+        for task in db_worker.get_lesson_data(tg_id=config.ADMIN_ID_TG):
+            task_words = list(task.values())
+            self.assertEqual(4, len({w['word_id'] for w in task_words}))
+            self.assertEqual(1, sum(w['is_main'] for w in task_words))
+            self.assertTrue(all(w['is_correct'] for w in task_words if w['is_main']))
+
+    def test_get_lesson_data_deleted_words(self):
+        """
+        Test is the lesson words deleted in between are refilled by the wrong answers (or MinLenError if they are few)
+        """
+        words = [
+            {'tg_id': 1, 'word': f'word{i}', 'description': 'description', 'example': 'example', 'category': '-',
+             'rating': 0, 'word_id': i, 'is_main': False}
+            for i in range(22)
+        ]
+        with unittest.mock.patch.object(db_worker, 'get_lesson_words_data', return_value=(40, words[:12], words[12:])):
+            actual = db_worker.get_lesson_data(tg_id=config.ADMIN_ID_TG)
+        self.assertEqual(15, len(actual))
+        self.assertEqual(set(range(15)), {w['word_id'] for task in actual for w in task.values() if w['is_main']})
+        with unittest.mock.patch.object(db_worker, 'get_lesson_words_data', return_value=(40, words[:12], words[12:14])):
+            self.assertRaises(db_worker.MinLenError, db_worker.get_lesson_data, tg_id=config.ADMIN_ID_TG)
+
+    def test_get_lesson_words_data(self):
+        """
+        Test is the func get_lesson_words_data returns the word count and only 15 lesson words
+        """
+        words_count, lesson_words, wrong_words = db_worker.get_lesson_words_data(user_tg_id=config.ADMIN_ID_TG)
+        self.assertEqual(db_worker.word_count(user_tg_id=config.ADMIN_ID_TG), words_count)
+        self.assertEqual(15, len(lesson_words))
+        self.assertEqual(
+            sorted(w['rating'] for w in lesson_words)[-5:],
+            sorted(w['rating'] for w in lesson_words[:5])
+        )
+
+    def test_get_words_texts(self):
+        """
+        Test is the func get_words_texts returns the texts of the lesson words by their ids
+        """
+        _, lesson_words, _ = db_worker.get_lesson_words_data(user_tg_id=config.ADMIN_ID_TG)
+        expected = {w['word_id']: (w['word'], w['description'], w['example']) for w in lesson_words}
+        actual = {
+            w['word_id']: (w['word'], w['description'], w['example'])
+            for w in db_worker.get_words_texts(list(expected))
+        }
+        self.assertEqual(expected, actual)
+
+    def test_migrate(self):
+        """
+        Checking if all migrations are applied and the repeated migration changes nothing
+        """
+        db_worker.migrate()
+        actual = [i[0] for i in db_worker.engine.execute('SELECT version FROM schema_migrations ORDER BY version')]
+        expected = [i[0] for i in db_worker.MIGRATIONS]
+        self.assertEqual(expected, actual)
+
+    def test_migration_1_duplicates(self):
+        """
+        Test is the migration merges the duplicated users, api keys and daily logs before the unique indexes
+        """
+        engine = db_worker.sqlalchemy.create_engine('sqlite://')
+        db_worker.Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            for index in ('ux_users_tg_id', 'ux_apikeys_key', 'ux_statistics_user_id_day'):
+                connection.execute(f'DROP INDEX {index}')
+            user = {'tg_id': 'TEST00001', 'nickname': 'test', 'lang_code': 'ru', 'points': 10, 'creation_time': '-',
+                    'last_use_time': '-', 'current_use_time': '-'}
+            connection.execute(db_worker.Users.__table__.insert(), [dict(user, user_id=1), dict(user, user_id=2)])
+            connection.execute(db_worker.UsersApiKeys.__table__.insert(), [{'key': 'key', 'user_id': 1},
+                                                                          {'key': 'key', 'user_id': 2}])
+            connection.execute(db_worker.UsersStatistics.__table__.insert(), [
+                {'day': '2022-01-01', 'firs_try_success': 1, 'mistake': 1, 'total': 15, 'user_id': user_id}
+                for user_id in (1, 2)
+            ])
+            connection.execute(db_worker.UsersExamples.__table__.insert(), [{'example': 'testexample', 'user_id': 2}])
+            db_worker.migration_1(connection)
+
+            self.assertEqual([(1, 20)], connection.execute('SELECT user_id, points FROM users').fetchall())
+            self.assertEqual([(1,)], connection.execute('SELECT user_id FROM apikeys').fetchall())
+            self.assertEqual([(1, 2, 2, 30)], connection.execute(
+                'SELECT user_id, firs_try_success, mistake, total FROM statistics').fetchall())
+            self.assertEqual([(1,)], connection.execute('SELECT user_id FROM examples').fetchall())
+        index_names = {i['name'] for i in db_worker.sqlalchemy.inspect(engine).get_indexes('users')}
+        self.assertIn('ux_users_tg_id', index_names)
+
+    def test_bulk_add_words(self):
+        """
+        Test is the func bulk_add_words adds new words once and returns the errors of the foreign examples
+        """
+        words = [
+            {'word': 'testword', 'description': 'testdescription', 'example': 'testexample'},
+            {'word': 'testword2', 'description': 'testdescription2', 'example': 'testexample'},
+            {'word': 'testword', 'description': 'testdescription', 'ex_id': -1},
+        ]
+        expected = db_worker.word_count(user_tg_id=config.ADMIN_ID_TG) + 2
+        results = db_worker.bulk_add_words(user_id=self.admin.user_id, words=words)
+        self.assertEqual(expected, db_worker.word_count(user_tg_id=config.ADMIN_ID_TG))
+        self.assertIn('error', results[2])
+        self.assertEqual(results[:2], db_worker.bulk_add_words(user_id=self.admin.user_id, words=words[:2]))
+        self.assertEqual(expected, db_worker.word_count(user_tg_id=config.ADMIN_ID_TG))
+
+    def test_bulk_delete_words(self):
+        """
+        Test is the func bulk_delete_words deletes the user words with their empty example
+        """
+        expected = db_worker.word_count(user_tg_id=config.ADMIN_ID_TG)
+        results = db_worker.bulk_add_words(
+            user_id=self.admin.user_id,
+            words=[{'word': 'testword', 'description': 'testdescription', 'example': 'testexample'}]
+        )
+        db_worker.bulk_delete_words(user_id=self.admin.user_id, words_ids=[results[0]['word_id']])
+        self.assertEqual(expected, db_worker.word_count(user_tg_id=config.ADMIN_ID_TG))
+        self.assertIsNone(db_worker.get_example(results[0]['example_id']))
+
+    def test_import_user_words(self):
+        """
+        Test is the func import_user_words reads the file made by /data and skips the already added words
+        """
+        for file_type in ('xlsx', 'json', 'xml', 'csv'):
+            expected = db_worker.word_count(user_tg_id=config.ADMIN_ID_TG)
+            file = db_worker.get_user_words_file(
+                user_tg_id=str(config.ADMIN_ID_TG),
+                file_type=file_type,
+                sql_filter_key='default',
+                sql_sort_key='default'
+            )
+            actual = db_worker.import_user_words(user_tg_id=str(config.ADMIN_ID_TG), file_type=file_type, file=file)
+            self.assertEqual({'read': expected, 'wrong': 0, 'repeated': expected, 'added': 0, 'without_category': []},
+                             actual)
+
+    def test_import_user_words_without_category(self):
+        """
+        Test is the func import_user_words returns the added words left without category (and only them)
+        """
+        file = io.BytesIO(
+            b'word,description,example\n'
+            b'testword,testdescription,testexample\n'
+            b'testword,testdescription,testexample\n'
+        )
+        actual = db_worker.import_user_words(user_tg_id=str(config.ADMIN_ID_TG), file_type='csv', file=file)
+        expected = db_worker.get_user_word(user=self.admin, word='testword')
+        self.assertEqual([(expected.word_id, 'testword')], actual['without_category'])
+
+    def test_add_init_words(self):
+        """
+        Test is the func add_init_words adds all starter words once
+        """
+        init_words = [
+            {'example': 'testexample', 'word': 'testword', 'description': 'testdescription', 'category': 'Noun'},
+            {'example': 'testexample', 'word': 'testword2', 'description': 'testdescription2', 'category': 'Verb'},
+        ]
+        expected = db_worker.word_count(user_tg_id=config.ADMIN_ID_TG) + 2
+        self.assertEqual(2, db_worker.add_init_words(user_tg_id=str(config.ADMIN_ID_TG), init_words=init_words))
+        self.assertEqual(0, db_worker.add_init_words(user_tg_id=str(config.ADMIN_ID_TG), init_words=init_words))
+        self.assertEqual(expected, db_worker.word_count(user_tg_id=config.ADMIN_ID_TG))
+
+    def test_broadcast_progress(self):
+        """
+        Test is the broadcast pages through all users once and is not resumed after it is done | stopped
+        """
+        broadcast = db_worker.add_broadcast(text='testtext', admin_tg_id='TEST00001')
+        self.assertIn(broadcast.broadcast_id, [i.broadcast_id for i in db_worker.get_running_broadcasts()])
+        last_user_id, tg_ids = broadcast.last_user_id, []
+        while page := db_worker.get_users_page(after_user_id=last_user_id, limit=1):
+            tg_ids.extend(tg_id for _, tg_id in page)
+            last_user_id = page[-1][0]
+            db_worker.save_broadcast_progress(broadcast.broadcast_id, last_user_id, sent=len(tg_ids), failed=0)
+        self.assertEqual(sorted(user.tg_id for user in db_worker.get_users()), sorted(tg_ids))
+        self.assertEqual(0, db_worker.count_users_after(last_user_id))
+        db_worker.save_broadcast_progress(broadcast.broadcast_id, last_user_id, len(tg_ids), 0, status='done')
+        self.assertNotIn(broadcast.broadcast_id, [i.broadcast_id for i in db_worker.get_running_broadcasts()])
+
+        broadcast = db_worker.add_broadcast(text='testtext', admin_tg_id='TEST00001')
+        self.assertGreaterEqual(db_worker.stop_broadcasts(), 1)
+        self.assertEqual([], db_worker.get_running_broadcasts())
+
+    def test_get_words_without_category(self):
+        """
+        Test is the func get_words_without_category pages through the words with the '-' category
+        """
+        test_example = db_worker.add_example(example_text='testexample', user_tg_id=config.ADMIN_ID_TG)
+        test_word = db_worker.add_word(
+            word='testword', description='testdescription', category='-', rating=0, example=test_example
+        )
+        word_ids, after_word_id = [], 0
+        while page := db_worker.get_words_without_category(after_word_id=after_word_id, limit=2):
+            word_ids.extend(word_id for word_id, _ in page)
+            after_word_id = page[-1][0]
+        self.assertIn(test_word.word_id, word_ids)
+        self.assertEqual(sorted(set(word_ids)), word_ids)
+
 
 ########################################################################################################################
 if __name__ == "__main__":    # coverage run -m unittest module | coverage run -m unittest module
@@ -1,7 +1,8 @@
 import unittest
-import pathlib
-import os
 import datetime
+import pathlib
+import subprocess
+import sys
 
 from app.handlers import statistic
 
@@ -14,21 +15,17 @@ class HandlersTestCase(unittest.TestCase):
 
     def test_build_graph(self):
         """
-        Test is the func test_build_graph returns correct file path
+        Test is the func test_build_graph returns png image bytes
         """
-        path = '../../../temporary/'
-        for i in pathlib.Path(path).rglob('*'):
-            os.remove(i)
-        actual = os.path.isfile(statistic.build_graph(
+        actual = statistic.build_graph(
             user_id='test',
             days=['M', 'T', 'W'],
             total=[100, 1000, 0],
             mistakes=[98, 1, 0],
-            first_try=[2, 9999, 0],
-            path=path
-        ))
-        expected = True
-        self.assertEqual(expected, actual)
+            first_try=[2, 9999, 0]
+        )
+        expected = b'\x89PNG\r\n\x1a\n'
+        self.assertEqual(expected, actual[:8])
 
     def test_get_seven_day(self):
         """
@@ -38,6 +35,20 @@ class HandlersTestCase(unittest.TestCase):
         actual = ['Mo', 'Tu', 'We', 'Th', 'Fr', 'Sr', 'Su'][datetime.datetime.today().weekday()]
         self.assertEqual(expected, actual)
 
+    def test_graph_worker_main_import(self):
+        """
+        Test is the bot module imported as __mp_main__ (like in every spawned graph process) imports no db | telegram
+        """
+        code = (
+            "import runpy, sys\n"
+            "runpy.run_path('bot.py', run_name='__mp_main__')\n"
+            "import app.graph\n"
+            "print(sorted(m for m in ('app.db_worker', 'sqlalchemy', 'aiogram', 'aiohttp') if m in sys.modules))\n"
+        )
+        root = pathlib.Path(__file__).resolve().parents[3]
+        actual = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+        self.assertEqual('[]', actual.stdout.strip())
+
 
 ########################################################################################################################
 if __name__ == "__main__":    # coverage run -m unittest module | coverage run -m unittest module